@@ -0,0 +1,121 @@
+# -------------------------------------
+# 같은 게임에 동시에 들어오는 이벤트 부하 테스트 (게임별 잠금 + turn_token 중복 제거)
+#   python bench_concurrency.py --games 50 --rounds 10
+# -------------------------------------
+# 라운드마다 게임별로 [다음 턴] 더블 클릭(같은 turn_token 두 개)과 토큰 없는 재시도 하나를 동시에 보냅니다.
+# 끝나면 게임마다 아래 불변식을 확인합니다.
+#   - 로그의 명령 수 == 받아들여진 이벤트 수 (유실 없음). 더블 클릭이 두 번 처리된 수는 따로 셉니다
+#   - 명령 사이에는 반드시 '[X의 턴 시작]'이 하나 있고, 명령한 플레이어가 그 X (턴 순서가 섞이지 않음)
+#   - turn == 턴을 넘긴 이벤트(증거 확인, 대화 종료) 수
+# 잠금을 켠 경우 불변식이 깨진 게임이 하나라도 있으면 종료 코드 1로 끝납니다.
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SPECULATIVE_NPC"] = "0"
+os.environ["RESPONSE_CACHE"] = "0"
+os.environ["SNAPSHOTS"] = "0"
+os.environ.setdefault("FAKE_LLM_LATENCY", "0.01")
+
+import gui
+
+COMMANDS = ["깨진조각상 확인", "음악실로 이동", "미술실로 이동", "미술물통 조사"]
+TURN_START = re.compile(r"\[(.+?)의 턴 시작\]")
+COMMAND = re.compile(r"^(.+?)의 명령: ", re.MULTILINE)
+
+
+def violations(game_id, accepted):
+    session = gui.game_db[game_id]
+    problems = []
+    commands = 0
+    last_start = None
+    for chunk in session["log_history"].chunks:
+        start = TURN_START.search(chunk)
+        if start:
+            last_start = start.group(1)
+        command = COMMAND.match(chunk)
+        if command:
+            commands += 1
+            if last_start != command.group(1):
+                problems.append(f"{command.group(1)} acted without its own turn start (last: {last_start})")
+            last_start = None
+    if commands != accepted:
+        problems.append(f"{commands} commands logged for {accepted} accepted events")
+    turn_events = sum(1 for event in session["event_log"].events if event.kind in ("evidence", "talk_end"))
+    if session["turn"] != turn_events:
+        problems.append(f"turn {session['turn']} != {turn_events} turn-ending events")
+    return problems
+
+
+async def play(args, use_tokens):
+    game_id, player_list, *_ = gui.game_start(args.story)
+    person_player = player_list[0]
+    await gui.select_character(person_player, game_id, "")
+    accepted = 0
+    for i in range(args.rounds):
+        token = gui.current_turn_token(game_id) if use_tokens else None
+        command = COMMANDS[i % len(COMMANDS)]
+        before = gui.current_turn_token(game_id)
+        # 더블 클릭 두 번 + 토큰 없는 재시도 한 번
+        await asyncio.gather(
+            gui.advance_turn(command, game_id, "", person_player, 0, token),
+            gui.advance_turn(command, game_id, "", person_player, 0, token),
+            gui.advance_turn(command, game_id, "", person_player, 0, None),
+        )
+        accepted += gui.current_turn_token(game_id) - before
+    return game_id, accepted
+
+
+async def run(args, use_tokens):
+    gui.stale_events = 0
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play(args, use_tokens) for _ in range(args.games)))
+    elapsed = time.perf_counter() - start
+    broken = {game_id: problems for game_id, accepted in results if (problems := violations(game_id, accepted))}
+    accepted = sum(accepted for _, accepted in results)
+    return elapsed, accepted, broken
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    sent = args.games * args.rounds * 3
+    print(f"games: {args.games}, rounds: {args.rounds}, events sent: {sent}, model latency: {os.environ['FAKE_LLM_LATENCY']}s")
+    broken_with_locks = 0
+    for label, locks, use_tokens in [
+        ("locks + turn_token", True, True),
+        ("locks, no token", True, False),
+        ("no locks + turn_token", False, True),
+        ("no locks, no token", False, False),
+    ]:
+        gui.GAME_LOCKS = locks
+        elapsed, accepted, broken = asyncio.run(run(args, use_tokens))
+        line = (
+            f"{label:<22}: {elapsed:>6.2f}s | accepted {accepted:>5}, stale dropped {gui.stale_events:>5}, "
+            f"double-click processed twice {accepted - args.games * args.rounds * 2:>4} | "
+            f"games with broken invariants {len(broken):>3}/{args.games}"
+        )
+        print(line)
+        if locks:
+            broken_with_locks += len(broken)
+        if broken:
+            game_id, problems = next(iter(broken.items()))
+            print(f"{'':<24}e.g. {problems[0]}")
+
+    # 다른 게임끼리는 막지 않아야 합니다: 게임 하나와 여러 개의 걸린 시간이 비슷해야 합니다
+    gui.GAME_LOCKS = True
+    single = asyncio.run(run(argparse.Namespace(story=args.story, games=1, rounds=args.rounds), True))[0]
+    many = asyncio.run(run(args, True))[0]
+    print(f"1 game: {single:.2f}s, {args.games} games: {many:.2f}s (per-game locks only; x{single * args.games / many:.1f} parallel)")
+    print(f"lock stats: {gui.game_locks.stats()}")
+    # 잠금을 켠 경우에는 불변식이 깨진 게임이 하나도 없어야 합니다
+    print(f"games broken with locks: {broken_with_locks} -> {'ok' if not broken_with_locks else 'FAILED'}")
+    sys.exit(0 if not broken_with_locks else 1)
@@ -0,0 +1,100 @@
+# -------------------------------------
+# 게임 맥락 프롬프트 생성 벤치마크 (NPC 한 명의 턴마다 드는 프롬프트 조립 비용)
+#   python bench_context.py --turns 2000 --max-tokens 1500
+#   python bench_context.py --summary   (가짜 summarizer로 요약 단계까지, 처음 사실이 남는지 확인)
+# -------------------------------------
+import argparse
+import os
+import tempfile
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SPECULATIVE_NPC"] = "0"
+os.environ["SNAPSHOTS"] = "0"
+os.environ.setdefault("GAME_LOG_DIR", tempfile.mkdtemp())
+
+from context_buffer import ConversationContext
+import gui
+
+FIRST_FACTS = ["피해자는 미술 선생님이다.", "용의자는 톰, 매기, 잭, 존, 제인이다."]
+SAMPLE_LINES = [
+    "톰이(가) 미술실에서 깨진조각상를 확인했습니다.",
+    "매기: 그 시간에 너는 어디에 있었어? 음악실에서 플루트 소리가 들렸다던데.",
+    "톰: 나는 음악실에서 연습하고 있었어. CD 플레이어는 건드린 적 없어.",
+    "잭와 존가 대화를 마쳤습니다.",
+    "제인이(가) 양호실에서 양호실 사용기록를 확인했습니다.",
+]
+
+
+def fake_summarizer(summary, lines):
+    """이전 요약 뒤에 이번에 밀려난 줄들을 한 문장씩 덧붙입니다 (모델처럼 요약이 계속 길어짐)."""
+    return " ".join([summary, *(line.rstrip(".") + "." for line in lines)]).strip()
+
+
+def old_prompt(game_id, player, conversation_log):
+    """변경 전 get_player2_action: 매 턴 플레이어의 conversation_log 전체를 이어 붙여 프롬프트에 넣습니다."""
+    session = gui.game_db[game_id]
+    position = session["player_db"][player]["position"]
+    return session["game_play_prompt"].format(
+        position=position,
+        player=player,
+        player_story=session["story"].player_stories[player],
+        evidences=", ".join(session["world"].world_map.evidences(position)),
+        player_list=list(session["player_dict"].keys()),
+        conversation="\n".join(conversation_log),
+        next_action=gui.NEXT_ACTION,
+    )
+
+
+def simulate(story, turns, checkpoints, max_tokens, summary):
+    game_id, player_list, *_ = gui.game_start(story)
+    session = gui.game_db[game_id]
+    player = player_list[-1]
+    session["context_db"][player] = ConversationContext(max_tokens=max_tokens, summarizer=fake_summarizer if summary else None)
+    conversation_log = []
+    rows = []
+    for turn in range(1, turns + 1):
+        line = SAMPLE_LINES[turn % len(SAMPLE_LINES)]
+        session["event_log"].append("dialogue", None, turn, line)
+        conversation_log.append(line)
+        if turn not in checkpoints:
+            gui.build_player_prompt(player, gui.NEXT_ACTION, game_id)  # 턴마다 새 줄만 읽도록 맞춰 둡니다
+            continue
+        start = time.perf_counter()
+        joined = old_prompt(game_id, player, conversation_log)
+        join_time = time.perf_counter() - start
+        # 핸들러와 같은 경로: 새 이벤트 읽기 → 맥락 버퍼 갱신(요약 포함) → 렌더 → 템플릿 채우기
+        start = time.perf_counter()
+        prompt = gui.build_player_prompt(player, gui.NEXT_ACTION, game_id)
+        build_time = time.perf_counter() - start
+        rows.append((turn, len(joined), join_time, len(prompt), build_time))
+    return rows
+
+
+def check_first_facts(turns, max_tokens, summary_max_chars=600):
+    """요약을 여러 번 거쳐도 게임 초반에 정해진 사실(피해자, 용의자)이 요약 앞쪽에 남는지 확인합니다."""
+    context = ConversationContext(max_tokens=max_tokens, summarizer=fake_summarizer, summary_max_chars=summary_max_chars)
+    context.extend(FIRST_FACTS)
+    for turn in range(turns):
+        context.append(f"{turn}턴: {SAMPLE_LINES[turn % len(SAMPLE_LINES)]}")
+    assert context.summary.startswith(" ".join(FIRST_FACTS)), context.summary[:200]
+    assert len(context.summary) <= summary_max_chars
+    return context.summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    parser.add_argument("--summary", action="store_true", help="요약 단계를 켭니다 (가짜 summarizer)")
+    args = parser.parse_args()
+
+    if args.summary:
+        summary = check_first_facts(args.turns, args.max_tokens)
+        print(f"처음 사실 유지: {len(summary)}자 요약이 '{summary[:40]}...'로 시작합니다")
+
+    checkpoints = {n for n in (10, 100, 1000, 5000, 10000, 20000, 50000) if n <= args.turns} | {args.turns}
+    print(f"{'turn':>7} | {'old prompt':>10} {'old us':>9} | {'new prompt':>10} {'build us':>9}")
+    for turn, old_len, old_time, new_len, new_time in simulate(args.story, args.turns, checkpoints, args.max_tokens, args.summary):
+        print(f"{turn:>7} | {old_len:>10} {old_time * 1e6:>9.1f} | {new_len:>10} {new_time * 1e6:>9.1f}")
@@ -0,0 +1,45 @@
+# -------------------------------------
+# game_start 지연 시간 벤치마크 (동시 시작)
+#   python bench_game_start.py --starts 200 --concurrency 16
+# -------------------------------------
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["LLM_BACKEND"] = "fake"
+
+from metrics import LatencyStats
+from story_registry import StoryRegistry
+import gui
+
+
+def run(label, start_game, starts, concurrency):
+    stats = LatencyStats()
+
+    def one(_):
+        start = time.perf_counter()
+        start_game()
+        stats.record(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(starts)))
+    wall = time.perf_counter() - wall
+    summary = stats.summary()
+    print(f"{label:<24} starts/sec {starts / wall:>9.1f} | p50 {summary['p50'] * 1000:>7.3f} ms | p99 {summary['p99'] * 1000:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--starts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    uncached = StoryRegistry()
+    print(f"starts: {args.starts}, concurrency: {args.concurrency}")
+    # 변경 전과 같은 작업: 매번 파일을 읽고 프롬프트를 치환하고 템플릿을 만듭니다
+    run("compile every start", lambda: uncached.compile(args.story), args.starts, args.concurrency)
+    run("registry lookup", lambda: gui.story_registry.get(args.story), args.starts, args.concurrency)
+    run("gui.game_start", lambda: gui.game_start(args.story), args.starts, args.concurrency)
@@ -0,0 +1,73 @@
+# -------------------------------------
+# 게임 매니저 Agent 준비 비용 마이크로 벤치마크
+#   python bench_gamemanager_agent.py --turns 200
+# -------------------------------------
+from langchain.agents import tool
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from gamemanager import GameManagerAgentCache, build_gamemanager_agent, render_gamemanager_prompt
+import argparse
+import json
+import time
+
+
+@tool
+def move_player(player: str, location: str, game_id: str) -> str:
+    """명령을 내린 플레이어를 지정된 위치로 이동시킵니다."""
+    return ""
+
+@tool
+def talk_to_player(from_player: str, to_player: str, game_id: str) -> str:
+    """두 플레이어 사이에 대화를 진행 합니다."""
+    return ""
+
+@tool
+def get_evidence_info(player: str,evidence: str, game_id: str) -> str:
+    """명령을 내린 player가 탐색하고 싶은 evidence의 세부내용을 보여줍니다."""
+    return ""
+
+
+def load_story(story_name):
+    with open(f"storys/{story_name}/private_story.json") as f:
+        player_list = list(json.load(f).keys())
+    with open(f"storys/{story_name}/map.json") as f:
+        map_dict = json.load(f)
+    with open("gamemanager_prompt.txt") as f:
+        gamemanager_prompt = "\n".join(f.readlines())
+    return player_list, map_dict, gamemanager_prompt
+
+
+def bench_per_turn_build(llm, tools, player_list, map_dict, gamemanager_prompt, turns):
+    """변경 전: 매 턴마다 프롬프트 치환 + AgentExecutor 생성"""
+    start = time.perf_counter()
+    for _ in range(turns):
+        rendered_prompt = render_gamemanager_prompt(gamemanager_prompt, player_list, map_dict)
+        build_gamemanager_agent(llm, tools, rendered_prompt)
+    return time.perf_counter() - start
+
+
+def bench_cached(llm, tools, story_name, player_list, map_dict, gamemanager_prompt, turns):
+    """변경 후: game_start에서 한 번 준비, 매 턴은 캐시 조회"""
+    agents = GameManagerAgentCache(llm, tools)
+    start = time.perf_counter()
+    key = agents.prepare(story_name, gamemanager_prompt, player_list, map_dict)
+    for _ in range(turns):
+        agents.get(key)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    llm = FakeListChatModel(responses=["ok"])
+    tools = [move_player, talk_to_player, get_evidence_info]
+    player_list, map_dict, gamemanager_prompt = load_story(args.story)
+
+    before = bench_per_turn_build(llm, tools, player_list, map_dict, gamemanager_prompt, args.turns)
+    after = bench_cached(llm, tools, args.story, player_list, map_dict, gamemanager_prompt, args.turns)
+    print(f"turns: {args.turns}")
+    print(f"매 턴 생성 : total {before * 1000:.2f} ms, per turn {before / args.turns * 1e6:.1f} us")
+    print(f"캐시 재사용: total {after * 1000:.2f} ms, per turn {after / args.turns * 1e6:.1f} us")
+    print(f"speedup   : x{before / after:.1f}")
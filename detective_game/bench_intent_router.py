@@ -0,0 +1,117 @@
+# -------------------------------------
+# 명령 fast-path 파서 벤치마크 (기록된 명령 코퍼스)
+#   python bench_intent_router.py --corpus bench_commands.jsonl --latency 0.3
+# -------------------------------------
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+
+from langchain_core.messages import HumanMessage
+from metrics import LatencyStats
+import gui
+from llm_backend import base_model
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def target_of(intent):
+    return next(value for key, value in intent.args.items() if key not in ("player", "from_player"))
+
+
+def parse_report(router, corpus, repeat):
+    """파서만 돌려 적중률, 정확도, 파싱 시간을 봅니다."""
+    hits = correct = wrong = 0
+    for item in corpus:
+        intent = router.route(item["player"], item["position"], item["command"])
+        if intent is None:
+            continue
+        hits += 1
+        expected = item["expected"]
+        if expected and expected["tool"] == intent.tool and expected["target"] == target_of(intent):
+            correct += 1
+        else:
+            wrong += 1
+            print(f"  오분류: {item['command']!r} -> {intent.tool}({target_of(intent)})")
+
+    routable = sum(1 for item in corpus if item["expected"])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in corpus:
+            router.route(item["player"], item["position"], item["command"])
+    parse_us = (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+    print(f"commands         : {len(corpus)} (fast-path 대상 {routable})")
+    print(f"fast-path hits   : {hits} ({hits / len(corpus) * 100:.1f} %), 정답 {correct}, 오분류 {wrong}")
+    print(f"recall           : {correct / routable * 100 if routable else 0.0:.1f} %")
+    print(f"parse            : {parse_us:.1f} us/command")
+
+
+def expected_router(corpus):
+    """정답 라벨대로 tool을 호출하는 fake 게임 매니저 (모델이 항상 맞힌다고 가정)."""
+    labels = {item["command"]: item["expected"] for item in corpus}
+
+    def route(messages):
+        if not isinstance(messages[-1], HumanMessage):
+            return None
+        head, _, game_id = messages[-1].content.rpartition(", game_id:")
+        player, _, command = head.partition("의 명령: ")
+        expected = labels.get(command)
+        if not expected:
+            return None
+        key = {"move_player": "location", "talk_to_player": "to_player", "get_evidence_info": "evidence"}[expected["tool"]]
+        speaker = "from_player" if expected["tool"] == "talk_to_player" else "player"
+        return expected["tool"], {speaker: player, key: expected["target"], "game_id": game_id}
+
+    return route
+
+
+async def run_commands(corpus, stats):
+    for item in corpus:
+        game_id, player_list, *_ = gui.game_start(item.get("story", "story1"))
+        gui.game_db[game_id]["person_player"] = player_list[0]
+        if item["position"] != gui.game_db[game_id]["player_db"][item["player"]]["position"]:
+            gui.move_player.func(item["player"], item["position"], game_id)
+        start = time.perf_counter()
+        await gui.aroute_command(item["player"], item["command"], player_list, game_id)
+        stats.record(time.perf_counter() - start)
+
+
+def e2e_report(label, corpus, enabled):
+    gui.INTENT_ROUTER = enabled
+    gui.intent_stats.reset()
+    stats = LatencyStats()
+    asyncio.run(run_commands(corpus, stats))
+    summary = stats.summary()
+    router = gui.intent_stats.summary()
+    print(
+        f"{label:<16} : mean {summary['mean'] * 1000:>7.1f} ms, p50 {summary['p50'] * 1000:>7.1f} ms"
+        f" | hit rate {router['hit_rate'] * 100:>5.1f} %, saved {router['saved_seconds']:.2f} s"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--corpus", default="bench_commands.jsonl")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake 모델 응답 지연(초)")
+    parser.add_argument("--repeat", type=int, default=200, help="파싱 시간 측정 반복 횟수")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    parse_report(gui.story_registry.get(args.story).intent_router, corpus, args.repeat)
+
+    for model in (gui.gamemanager_llm(), gui.game_play_llm()):
+        base_model(model).latency = args.latency
+    base_model(gui.gamemanager_llm()).function_router = expected_router(corpus)
+    print()
+    agent = e2e_report("agent only", corpus, False)
+    routed = e2e_report("intent router", corpus, True)
+    print(f"saved per command: {(agent['mean'] - routed['mean']) * 1000:.1f} ms ({(1 - routed['mean'] / agent['mean']) * 100:.1f} %)")
@@ -0,0 +1,64 @@
+# -------------------------------------
+# 게임 로그 화면 업데이트 벤치마크 (턴 수에 따른 핸들러 시간 / 응답 크기)
+#   python bench_log_updates.py --turns 400 --every 50
+# -------------------------------------
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SPECULATIVE_NPC"] = "0"
+
+import gui
+
+COMMANDS = ["음악실로 이동", "미술실로 이동", "교무실로 이동", "양호실로 이동"]
+
+
+def payload_bytes(update):
+    return len(json.dumps(update, ensure_ascii=False).encode("utf-8"))
+
+
+def apply(screen, update):
+    """브라우저의 APPEND_LOG_JS와 같은 방식으로 화면 텍스트를 갱신합니다."""
+    base = "" if update["reset"] else screen[0]
+    screen[0] = base + update["text"]
+    return screen[0] + update["tail"]
+
+
+async def play(args, delta):
+    gui.LOG_DELTA = delta
+    game_id, player_list, *_ = gui.game_start(args.story)
+    person_player = player_list[0]
+    screen = [""]
+    outputs = await gui.select_character(person_player, game_id, "")
+    apply(screen, outputs[0])
+    rows = []
+    for turn in range(1, args.turns + 1):
+        start = time.perf_counter()
+        outputs = await gui.advance_turn(COMMANDS[turn % len(COMMANDS)], game_id, "", person_player)
+        elapsed = time.perf_counter() - start
+        shown = apply(screen, outputs[0])
+        rows.append((turn, elapsed, payload_bytes(outputs[0])))
+    # delta를 차례로 붙인 화면이 서버의 전체 로그와 같아야 합니다
+    assert shown == gui.game_db[game_id]["log_history"].text()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--every", type=int, default=50, help="몇 턴마다 출력할지")
+    args = parser.parse_args()
+
+    full = asyncio.run(play(args, False))
+    delta = asyncio.run(play(args, True))
+    print(" turn | full: handler ms   bytes | delta: handler ms   bytes")
+    for (turn, full_s, full_b), (_, delta_s, delta_b) in zip(full, delta):
+        if turn == 1 or turn % args.every == 0:
+            print(f"{turn:>5} | {full_s * 1000:>16.3f} {full_b:>7} | {delta_s * 1000:>17.3f} {delta_b:>7}")
+    total_full = sum(row[2] for row in full)
+    total_delta = sum(row[2] for row in delta)
+    print(f"total bytes sent: full {total_full / 1e6:.2f} MB, delta {total_delta / 1e6:.3f} MB")
@@ -0,0 +1,118 @@
+# -------------------------------------
+# 게임 로그 기록 벤치마크 (처리량 / 비정상 종료 시 남는 기록)
+#   python bench_logging.py --games 20 --messages 5000
+#   python bench_logging.py --crash
+# -------------------------------------
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from game_logger import GameLogger
+
+CRASH_GAME = f"20240101000000_{uuid.UUID(int=0)}"
+
+
+def per_message_open(directory, game_ids, messages):
+    """변경 전 main.py의 game_logging: 메시지마다 파일을 열고 닫습니다."""
+    for i in range(messages):
+        game_id = game_ids[i % len(game_ids)]
+        with open(os.path.join(directory, f"{game_id}.txt"), "a") as f:
+            f.write(f"플레이어{i % 6}: 메시지 {i}\n")
+
+
+def buffered(directory, game_ids, messages, request_path):
+    logger = GameLogger(directory=directory)
+    start = time.perf_counter()
+    for i in range(messages):
+        logger.log(game_ids[i % len(game_ids)], "dialogue", f"플레이어{i % 6}", i, f"메시지 {i}")
+    request_path.append(time.perf_counter() - start)
+    logger.close()
+
+
+def count_lines(directory):
+    return sum(sum(1 for _ in open(path, encoding="utf-8")) for path in glob.glob(os.path.join(directory, "*.jsonl")))
+
+
+def count_saved_at_end(directory):
+    """변경 전 gui처럼 게임이 끝날 때 한 번에 저장한 {game_id}.json 의 기록 수 (파일이 없으면 0)."""
+    path = os.path.join(directory, f"{CRASH_GAME}.json")
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return len(json.load(f)["log_history"])
+
+
+def ending_game(directory, log_history):
+    """변경 전 gui의 ending_game: 게임이 끝날 때에만 기록 전체를 {game_id}.json 으로 저장합니다."""
+    with open(os.path.join(directory, f"{CRASH_GAME}.json"), "w", encoding="utf-8") as f:
+        json.dump({"log_history": log_history}, f, ensure_ascii=False)
+
+
+def crash_child(directory, before, after, interval, crash=True):
+    """before 개를 기록하고 flush 주기보다 오래 기다린 뒤, after 개를 더 기록합니다.
+
+    같은 기록을 변경 전 gui처럼 메모리(log_history)에도 쌓고, 게임이 끝나면 ending_game으로 저장합니다.
+    crash이면 마지막 기록 직후 ending_game에 닿기 전에 비정상 종료합니다.
+    """
+    logger = GameLogger(directory=directory, flush_interval=interval)
+    log_history = []
+    for i in range(before + after):
+        if i == before:
+            time.sleep(interval * 2)
+        logger.log(CRASH_GAME, "dialogue", "톰", i, f"메시지 {i}")
+        log_history.append(f"톰: 메시지 {i}")
+    if crash:
+        os._exit(1)
+    ending_game(directory, log_history)
+    logger.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--crash", action="store_true", help="자식 프로세스를 비정상 종료시켜 남은 기록 수를 셉니다")
+    parser.add_argument("--interval", type=float, default=0.2, help="crash 모드의 flush 주기(초)")
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--no-crash", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        crash_child(args.child, args.messages, args.messages, args.interval, crash=not args.no_crash)
+
+    if args.crash:
+        child = [sys.executable, __file__, "--messages", str(args.messages), "--interval", str(args.interval)]
+        with tempfile.TemporaryDirectory() as tmp:
+            subprocess.run([*child, "--child", tmp, "--no-crash"])
+            finished = count_saved_at_end(tmp)
+        with tempfile.TemporaryDirectory() as tmp:
+            subprocess.run([*child, "--child", tmp])
+            durable = count_lines(tmp)
+            saved_at_end = count_saved_at_end(tmp)
+        print(f"기록 {args.messages * 2}개 중 flush 주기 이전 {args.messages}개, 직후 종료 전 {args.messages}개")
+        print(f"종료 시 한 번에 저장 (변경 전 gui, 정상 종료) : {finished} 개 남음")
+        print(f"종료 시 한 번에 저장 (변경 전 gui, 비정상 종료) : {saved_at_end} 개 남음")
+        print(f"GameLogger (비정상 종료)                    : {durable} 개 남음")
+        sys.exit(0)
+
+    game_ids = [f"20240101000000_{uuid.UUID(int=g)}" for g in range(args.games)]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        per_message_open(tmp, game_ids, args.messages)
+        old = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        request_path = []
+        start = time.perf_counter()
+        buffered(tmp, game_ids, args.messages, request_path)
+        new = time.perf_counter() - start
+        assert count_lines(tmp) == args.messages
+    print(f"messages: {args.messages}, games: {args.games}")
+    print(f"open/append/close per message : {args.messages / old:>10.0f} msgs/sec (요청 경로 {old / args.messages * 1e6:.1f} us/msg)")
+    print(f"GameLogger (until durable)    : {args.messages / new:>10.0f} msgs/sec (요청 경로 {request_path[0] / args.messages * 1e6:.1f} us/msg)")
@@ -0,0 +1,146 @@
+# -------------------------------------
+# 모델 풀 부하 테스트 (가짜 모델 서버: 분당 요청 한도, 일시적 503, 느린 꼬리 지연)
+#   python bench_model_pool.py --duration 10
+#   python bench_model_pool.py --scenario light
+# -------------------------------------
+# overload: 백그라운드 NPC 생성 작업자들이 쉬지 않고 호출하는 동안, 사람 역할 사용자들이 생각 시간을 두고 호출합니다.
+# light   : 사용자만 호출합니다 (한도 여유가 있을 때 hedge가 느린 꼬리 지연을 줄이는지).
+#   direct        : 풀 없이 서버에 바로 (속도 제한 · 재시도 없음)
+#   pool, fifo    : 풀 (한도 · 재시도 · 대기열), 우선순위와 hedge 없음
+#   pool, no hedge: 우선순위만 추가
+#   pool          : 우선순위 + hedge
+# 사용자 호출이 실패 없이 얼마나 빨리 끝나는지, 백그라운드 호출이 얼마나 밀리거나 거절되는지를 봅니다.
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from langchain_core.messages import HumanMessage
+
+from fake_model_server import FakeModelServer
+from llm_backend import HttpChatModel
+from metrics import LatencyStats
+from model_pool import BACKGROUND, INTERACTIVE, ModelPool, PoolOverloaded, PooledChatModel, model_priority
+
+CONFIGS = {
+    "direct": None,
+    "pool, fifo": {"priorities": False, "hedge": False},
+    "pool, no hedge": {"priorities": True, "hedge": False},
+    "pool": {"priorities": True, "hedge": True},
+}
+
+
+class Outcome:
+    def __init__(self):
+        self.latency = LatencyStats()
+        self.failed = 0
+        self.rejected = 0
+
+    def line(self):
+        summary = self.latency.summary()
+        return (f"ok {summary['count']:>5}, failed {self.failed:>4}, rejected {self.rejected:>4}, "
+                f"p50 {summary['p50'] * 1e3:>6.0f} ms, p99 {summary['p99'] * 1e3:>6.0f} ms")
+
+
+async def call(model, outcome, prompt):
+    start = time.perf_counter()
+    try:
+        await model.agenerate([[HumanMessage(content=prompt)]])
+    except PoolOverloaded:
+        outcome.rejected += 1
+        return False
+    except Exception:
+        outcome.failed += 1
+        return False
+    outcome.latency.record(time.perf_counter() - start)
+    return True
+
+
+async def background_worker(model, outcome, deadline, priority, counter):
+    with model_priority(priority):
+        while time.monotonic() < deadline:
+            if not await call(model, outcome, f"NPC 행동 {next(counter)}"):
+                await asyncio.sleep(0.1)
+
+
+async def interactive_user(model, outcome, deadline, think, counter):
+    with model_priority(INTERACTIVE):
+        while time.monotonic() < deadline:
+            await call(model, outcome, f"사람의 명령 {next(counter)}")
+            await asyncio.sleep(random.uniform(0.5, 1.5) * think)
+
+
+async def run(args, config, server, users_count, background_workers):
+    inner = HttpChatModel(base_url=server.url, max_connections=args.concurrency * 2)
+    pool = None
+    model = inner
+    if config is not None:
+        pool = ModelPool(
+            max_concurrency=args.concurrency, max_queue=args.queue,
+            requests_per_minute=args.pool_rpm, retries=args.retries,
+            hedge=config["hedge"], hedge_min=args.hedge_min, hedge_ratio=0.1,
+        )
+        model = PooledChatModel(inner=inner, pool=pool)
+    background_priority = BACKGROUND if config is None or config["priorities"] else INTERACTIVE
+    users, background = Outcome(), Outcome()
+    counter = itertools.count()
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(
+        *(background_worker(model, background, deadline, background_priority, counter) for _ in range(background_workers)),
+        *(interactive_user(model, users, deadline, args.think, counter) for _ in range(users_count)),
+    )
+    return users, background, pool
+
+
+def report(name, users, background, stats, pool):
+    print(f"{name:<15} users      {users.line()}")
+    if background is not None:
+        print(f"{'':<15} background {background.line()}")
+    line = f"{'':<15} server: served {stats['served']}, 429 {stats['throttled']}, 503 {stats['errors']}, connections {stats['connections']}"
+    if pool is not None:
+        pool_stats = pool.stats()
+        line += (f" | pool: retried {pool_stats['retried']}, evicted {pool_stats['evicted']}, "
+                 f"hedges {pool_stats['hedges']} (won {pool_stats['hedge_wins']}, after {pool_stats['hedge_delay'] * 1e3:.0f} ms), "
+                 f"wait interactive {pool_stats['wait_mean_interactive'] * 1e3:.0f} ms, background {pool_stats['wait_mean_background'] * 1e3:.0f} ms")
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=8, help="사람 역할 사용자 수")
+    parser.add_argument("--light-users", type=int, default=4, help="light 시나리오의 사용자 수 (한도의 절반 정도)")
+    parser.add_argument("--think", type=float, default=0.3, help="사용자 호출 사이 평균 생각 시간(초)")
+    parser.add_argument("--background", type=int, default=100, help="백그라운드 NPC 작업자 수")
+    parser.add_argument("--server-rpm", type=float, default=1200)
+    parser.add_argument("--pool-rpm", type=float, default=1100, help="풀의 분당 요청 한도 (서버 한도보다 조금 낮게)")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--slow-ratio", type=float, default=0.03, help="x10 느린 응답 비율 (hedge 지연은 최근 p90)")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--queue", type=int, default=64)
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--hedge-min", type=float, default=0.3, help="hedge 지연의 하한(초), 기본 지연의 몇 배 정도로")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--scenario", choices=["overload", "light", "both"], default="both")
+    args = parser.parse_args()
+
+    print(f"server: {args.server_rpm:.0f} rpm, latency {args.latency}s (x10 for {args.slow_ratio:.0%}), "
+          f"503 {args.error_rate:.0%} | {args.duration}s per run")
+    scenarios = [("overload", args.users, args.background), ("light", args.light_users, 0)]
+    for scenario, users_count, background_workers in scenarios:
+        if args.scenario not in (scenario, "both"):
+            continue
+        print(f"\n[{scenario}] users: {users_count}, background workers: {background_workers}")
+        for name in args.configs:
+            server = FakeModelServer(
+                latency=args.latency, slow_ratio=args.slow_ratio, error_rate=args.error_rate,
+                requests_per_minute=args.server_rpm, seed=1,
+            ).start()
+            try:
+                users, background, pool = asyncio.run(run(args, CONFIGS[name], server, users_count, background_workers))
+            finally:
+                server.stop()
+            report(name, users, background if background_workers else None, server.stats(), pool)
+
@@ -0,0 +1,112 @@
+# -------------------------------------
+# 여러 워커 프로세스 부하 테스트 (serve.py + STATE_BACKEND)
+#   python bench_multiworker.py --workers 1 4 --games 24 --turns 8
+#   python bench_multiworker.py --workers 4 --backend file --clicks 3
+# -------------------------------------
+# 게임마다 같은 턴 요청을 --clicks 개씩 동시에 보냅니다(더블 클릭/재시도). 연결을 매번 새로 맺으므로
+# 요청은 워커들에 흩어지고, 같은 게임의 요청이 서로 다른 워커에서 동시에 처리됩니다.
+# 끝나면 게임마다 로그에 남은 명령 수가 보낸 요청 수와 같은지(잃어버린 갱신이 없는지) 확인합니다.
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from metrics import LatencyStats
+
+COMMANDS = ["깨진조각상 확인", "음악실로 이동", "미술실로 이동", "미술물통 조사"]
+
+
+def start_server(args, workers, directory, port):
+    backend = f"sqlite:{os.path.join(directory, 'game_state.db')}" if args.backend == "sqlite" else f"file:{os.path.join(directory, 'game_state')}"
+    env = dict(
+        os.environ,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=str(args.latency),
+        RESPONSE_CACHE="0",
+        SPECULATIVE_NPC="0",
+        STATE_BACKEND=backend,
+        SNAPSHOT_DIR=os.path.join(directory, "snapshots"),
+        GAME_LOG_DIR=os.path.join(directory, "logs"),
+    )
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def play(client, url, args, latency, workers_seen):
+    response = await client.post(f"{url}/api/games", json={"story": args.story})
+    game_id = response.json()["game_id"]
+    sent = 0
+    for i in range(args.turns):
+        async def click():
+            start = time.perf_counter()
+            response = await client.post(f"{url}/api/games/{game_id}/turn", json={"command": COMMANDS[i % len(COMMANDS)]})
+            latency.record(time.perf_counter() - start)
+            response.raise_for_status()
+            workers_seen.setdefault(game_id, set()).add(response.json()["worker"])
+        await asyncio.gather(*(click() for _ in range(args.clicks)))
+        sent += args.clicks
+    state = (await client.get(f"{url}/api/games/{game_id}", params={"log": True})).json()
+    return game_id, sent, state["log"].count("의 명령: ")
+
+
+async def run(args, workers, url):
+    latency = LatencyStats()
+    workers_seen = {}
+    # keep-alive 연결은 한 워커에 묶이므로 요청마다 새 연결을 맺습니다
+    async with httpx.AsyncClient(timeout=120, headers={"Connection": "close"}) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(play(client, url, args, latency, workers_seen) for _ in range(args.games)))
+        elapsed = time.perf_counter() - start
+    lost = [(game_id, sent, logged) for game_id, sent, logged in results if sent != logged]
+    spread = sum(len(pids) for pids in workers_seen.values()) / len(workers_seen)
+    summary = latency.summary()
+    print(
+        f"workers {workers}: {summary['count'] / elapsed:>7.1f} turn req/s | p50 {summary['p50'] * 1e3:>7.1f} ms, "
+        f"p99 {summary['p99'] * 1e3:>7.1f} ms | workers per game {spread:.1f} | lost updates {len(lost)}"
+    )
+    assert not lost, lost[:3]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--backend", choices=["sqlite", "file"], default="sqlite")
+    parser.add_argument("--games", type=int, default=24)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--clicks", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="가짜 모델 응답 지연(초)")
+    parser.add_argument("--port", type=int, default=7961)
+    args = parser.parse_args()
+
+    print(f"backend: {args.backend}, games: {args.games}, turns: {args.turns}, clicks per turn: {args.clicks}, model latency: {args.latency}s")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            server = start_server(args, workers, tmp, args.port)
+            url = f"http://127.0.0.1:{args.port}"
+            try:
+                asyncio.run(wait_ready(url))
+                asyncio.run(run(args, workers, url))
+            finally:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,63 @@
+# -------------------------------------
+# 모델 응답 캐시 벤치마크 (같은 스토리의 여러 게임, 로컬 fake 백엔드)
+#   python bench_response_cache.py --games 20 --latency 0.05
+#   python bench_response_cache.py --db /tmp/response_cache.db   (두 번 실행하면 디스크 계층 hit 확인)
+# -------------------------------------
+import argparse
+import asyncio
+import os
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["INTENT_ROUTER"] = "0"  # 모든 명령이 게임 매니저 모델을 거치게 합니다
+
+from response_cache import ResponseCache, LangChainResponseCache
+from bench_turns import function_router
+import gui
+from llm_backend import base_model
+
+COMMANDS = ["음악실로 이동", "증거를 확인할게", "여기 증거를 살펴볼래", "교무실로 이동"]
+
+
+async def play(story_name, commands):
+    """사람 플레이어 한 명이 같은 명령들을 차례로 내리는 게임 하나. 게임 결과(턴, 위치, 이벤트 수)를 반환합니다."""
+    game_id, player_list, *_ = gui.game_start(story_name)
+    person_player = player_list[0]
+    gui.game_db[game_id]["person_player"] = person_player
+    for command in commands:
+        await gui.aroute_command(person_player, command, player_list, game_id)
+    game = gui.game_db[game_id]
+    return game["turn"], game["player_db"][person_player]["position"], len(game["event_log"])
+
+
+def run(label, args, enabled):
+    gui.RESPONSE_CACHE = enabled
+    gui.gamemanager_llm().cache = LangChainResponseCache(gui.response_cache, placeholder_pattern=gui.GAME_ID_PATTERN) if enabled else False
+    start = time.perf_counter()
+    outcomes = [asyncio.run(play(args.story, COMMANDS)) for _ in range(args.games)]
+    wall = time.perf_counter() - start
+    # 캐시된 tool 호출 인자의 game_id가 현재 게임으로 되돌려졌다면 모든 게임의 결과가 같아야 합니다
+    assert len(set(outcomes)) == 1, outcomes
+    print(f"{label:<10} : {wall / args.games * 1000:>7.1f} ms/game | outcome (turn, position, events) {outcomes[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake 모델 응답 지연(초)")
+    parser.add_argument("--db", default="", help="SQLite 계층 경로 (지정하지 않으면 메모리만 사용)")
+    args = parser.parse_args()
+
+    for model in (gui.gamemanager_llm(), gui.game_play_llm()):
+        base_model(model).latency = args.latency
+    base_model(gui.gamemanager_llm()).function_router = function_router(0)
+    gui.response_cache = ResponseCache(db_path=args.db or None)
+
+    run("no cache", args, False)
+    run("cache", args, True)
+    stats = gui.response_cache.stats()
+    print(
+        f"hit rate {stats['hit_rate'] * 100:.1f} % (disk {stats['disk_hits']}), entries {stats['entries']}, {stats['bytes']} bytes"
+        f" | saved {stats['saved_seconds']:.2f} s, {stats['saved_tokens']} tokens"
+    )
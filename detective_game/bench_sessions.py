@@ -0,0 +1,87 @@
+# -------------------------------------
+# 게임 세션 저장소 부하 테스트 (많은 게임을 만들고 대부분 방치)
+#   python bench_sessions.py --games 2000 --max-resident 100
+# -------------------------------------
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SPECULATIVE_NPC"] = "0"
+
+from metrics import LatencyStats
+from session_store import SessionStore
+import gui
+
+
+def fingerprint(session):
+    player_db = session["player_db"]
+    return (
+        session["turn"],
+        len(session["event_log"]),
+        len(session["log_history"]),
+        tuple(info["position"] for info in player_db.values()),
+        tuple(tuple(info["talkable"]) for info in player_db.values()),
+    )
+
+
+async def play(story_name, turns):
+    game_id, player_list, *_ = gui.game_start(story_name)
+    person_player = player_list[0]
+    await gui.select_character(person_player, game_id, "")
+    for _ in range(turns):
+        await gui.advance_turn("음악실로 이동", game_id, "", person_player)
+    return game_id
+
+
+async def run(store, args):
+    gui.game_db = store
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    expected = {}
+    for _ in range(args.games):
+        game_id = await play(args.story, args.turns)
+        expected[game_id] = fingerprint(store[game_id])
+    resident_mb = (tracemalloc.get_traced_memory()[0] - before) / 1e6
+    tracemalloc.stop()
+
+    # 방치됐던 게임에 다시 요청이 오면 디스크에서 되돌려 이어서 진행할 수 있어야 합니다
+    access = LatencyStats()
+    for game_id, value in expected.items():
+        start = time.perf_counter()
+        session = store[game_id]
+        access.record(time.perf_counter() - start)
+        assert fingerprint(session) == value, game_id
+    resumed = list(expected)[0]
+    await gui.advance_turn("교무실로 이동", resumed, "", gui.game_db[resumed]["person_player"])
+    return resident_mb, access.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-resident", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [
+            ("dict (기존)", {}),
+            ("SessionStore", SessionStore(
+                path=os.path.join(tmp, "sessions.db"), max_resident=args.max_resident,
+                serialize=gui.serialize_session, restore=gui.restore_session,
+            )),
+        ]
+        print(f"games: {args.games}, turns/game: {args.turns}, max resident: {args.max_resident}")
+        for label, store in stores:
+            resident_mb, access = asyncio.run(run(store, args))
+            line = f"{label:<14} : heap growth {resident_mb:>7.1f} MB | access p50 {access['p50'] * 1e6:>7.1f} us, p99 {access['p99'] * 1e6:>8.1f} us"
+            if isinstance(store, SessionStore):
+                store.flush()
+                stats = store.stats()
+                line += f" | resident {stats['resident']}, spilled {stats['spilled']} ({stats['disk_bytes'] / 1e6:.1f} MB), rehydrations {stats['rehydrations']}"
+            print(line)
@@ -0,0 +1,168 @@
+# -------------------------------------
+# 게임 스냅샷 벤치마크 (게임 길이에 따른 턴당 저장 비용 / 비정상 종료 후 이어하기)
+#   python bench_snapshot.py --turns 800
+#   python bench_snapshot.py --crash --turns 37
+# -------------------------------------
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# 증거 확인은 턴을 넘기므로 NPC 턴(모델 호출)도 섞입니다
+COMMANDS = ["깨진조각상 확인", "음악실로 이동", "미술실로 이동", "미술물통 조사"]
+
+
+def setup_env(directory, snapshots):
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["SPECULATIVE_NPC"] = "0"
+    os.environ["SNAPSHOTS"] = "1" if snapshots else "0"
+    os.environ["SNAPSHOT_DIR"] = os.path.join(directory, "snapshots")
+    os.environ["SESSION_DB"] = os.path.join(directory, "sessions.db")
+    os.environ["GAME_LOG_DIR"] = os.path.join(directory, "logs")
+
+
+def fingerprint(session):
+    """복원 전후로 같아야 하는 값들의 해시"""
+    state = {
+        "turn": session["turn"],
+        "events": [list(event) for event in session["event_log"].events],
+        "cursors": session["event_log"].cursors,
+        "log": session["log_history"].text(),
+        "player_db": session["player_db"],
+        "conversation_db": session["conversation_db"],
+        "person_player": session.get("person_player"),
+        "contexts": {player: context.render() for player, context in session["context_db"].items()},
+        "occupants": {location: sorted(players) for location, players in session["world"].occupants.items()},
+    }
+    return hashlib.sha256(json.dumps(state, ensure_ascii=False, sort_keys=True, default=list).encode("utf-8")).hexdigest()
+
+
+async def start(gui, story_name):
+    game_id, player_list, *_ = gui.game_start(story_name)
+    await gui.select_character(player_list[0], game_id, "")
+    return game_id, player_list[0]
+
+
+async def play_turn(gui, game_id, person_player, i):
+    await gui.advance_turn(COMMANDS[i % len(COMMANDS)], game_id, "", person_player)
+
+async def cost(args, directory):
+    """같은 게임을 진행하며 매 턴 '전체 스냅샷'과 '저널 + 주기적 스냅샷'의 저장 비용을 잽니다."""
+    setup_env(directory, snapshots=False)
+    import gui
+    from snapshot_store import SnapshotStore
+
+    stores = {
+        "full": SnapshotStore(os.path.join(directory, "full"), snapshot_every=0,
+                              serialize=gui.serialize_session, restore=gui.restore_session),
+        "journal": SnapshotStore(os.path.join(directory, "journal"), snapshot_every=args.snapshot_every,
+                                 serialize=gui.serialize_session, restore=gui.restore_session),
+    }
+    marks = dict.fromkeys(stores)
+    timings = {name: [] for name in stores}
+    written = {name: [] for name in stores}
+    game_id, person_player = await start(gui, args.story)
+    session = gui.game_db[game_id]
+    for i in range(args.turns):
+        await play_turn(gui, game_id, person_player, i)
+        for name, store in stores.items():
+            # 두 방식이 같은 세션을 쓰므로 각자의 저널 위치를 바꿔 끼웁니다
+            session.pop("checkpoint", None)
+            if marks[name] is not None:
+                session["checkpoint"] = marks[name]
+            before = store.bytes_written
+            t = time.perf_counter()
+            store.checkpoint(game_id, session)
+            timings[name].append(time.perf_counter() - t)
+            written[name].append(store.bytes_written - before)
+            marks[name] = session["checkpoint"]
+
+    print(f"turns: {args.turns}, snapshot every {args.snapshot_every} journal entries")
+    print(f"{'turn':>6} | {'full ms/turn':>12} {'full KB/turn':>12} | {'journal ms/turn':>15} {'journal KB/turn':>15}")
+    window = max(args.turns // 10, 1)
+    for end in sorted({args.turns // 4, args.turns // 2, args.turns}):
+        if end < window:
+            continue
+        line = f"{end:>6} |"
+        for name, (ms_width, kb_width) in zip(stores, [(12, 12), (15, 15)]):
+            ms = sum(timings[name][end - window:end]) / window * 1e3
+            kb = sum(written[name][end - window:end]) / window / 1e3
+            line += f" {ms:>{ms_width}.3f} {kb:>{kb_width}.1f} |"
+        print(line.rstrip(" |"))
+
+    # 저널 쪽에서 되살린 세션이 메모리의 세션과 같아야 합니다
+    restored = stores["journal"].restore(game_id)
+    assert fingerprint(restored) == fingerprint(session), "journal restore mismatch"
+    print(f"journal restore ok ({stores['journal'].stats()})")
+    gui.game_logger.close()
+
+
+def crash_child(args, directory):
+    """게임을 진행하다가 턴 도중(저널을 남긴 뒤) 프로세스를 강제로 끝냅니다."""
+    setup_env(directory, snapshots=True)
+    import gui
+
+    async def run():
+        game_id, person_player = await start(gui, args.story)
+        for i in range(args.turns):
+            await play_turn(gui, game_id, person_player, i)
+        print(json.dumps({"game_id": game_id, "fingerprint": fingerprint(gui.game_db[game_id]),
+                          "turn": gui.game_db[game_id]["turn"]}), flush=True)
+        # 다음 턴의 모델 호출 중에 죽은 상황: 이 턴은 저널에 남지 않았으므로 복원하면 직전 턴부터 다시 합니다
+        gui.game_db[game_id]["log_history"].append("저널에 남지 않은 변경\n")
+        os._exit(9)
+
+    asyncio.run(run())
+
+
+def crash(args, directory):
+    child = subprocess.run(
+        [sys.executable, __file__, "--child", directory, "--turns", str(args.turns), "--story", args.story],
+        capture_output=True, text=True,
+    )
+    print(f"child exited with {child.returncode} after {args.turns} turns")
+    expected = json.loads(child.stdout.strip().splitlines()[-1])
+
+    setup_env(directory, snapshots=True)
+    import gui
+
+    async def resume():
+        game_id = expected["game_id"]
+        start_time = time.perf_counter()
+        session = gui.game_db[game_id]  # 메모리/세션 DB에 없으므로 스냅샷 + 저널에서 복원됩니다
+        elapsed = time.perf_counter() - start_time
+        assert fingerprint(session) == expected["fingerprint"], "restored state differs"
+        print(f"restored {game_id} at turn {session['turn']} in {elapsed * 1e3:.1f} ms (state identical)")
+        person_player = session["person_player"]
+        size = len(session["log_history"])
+        for i in range(args.turns, args.turns + 5):
+            await play_turn(gui, game_id, person_player, i)
+        print(f"continued 5 more turns (log {size} -> {len(gui.game_db[game_id]['log_history'])} chars)")
+
+    asyncio.run(resume())
+    print(f"snapshot stats: {gui.snapshots.stats()}")
+    gui.game_logger.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--snapshot-every", type=int, default=20)
+    parser.add_argument("--crash", action="store_true")
+    parser.add_argument("--child")
+    args = parser.parse_args()
+
+    if args.child:
+        crash_child(args, args.child)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.crash:
+                crash(args, tmp)
+            else:
+                asyncio.run(cost(args, tmp))
@@ -0,0 +1,131 @@
+# -------------------------------------
+# 기동 시간 측정 (임포트 시간, 요청을 받기까지, 첫 게임/첫 Agent까지)
+#   python bench_startup.py --repeat 3
+#   python bench_startup.py --backend fake
+# -------------------------------------
+# 측정마다 새 파이썬 프로세스를 띄우고 세 가지 설정을 비교합니다.
+#   eager  : LAZY_INIT=0 (예전 방식, 임포트 중에 Vertex SDK 임포트 · 모델 생성 · 스토리/Agent 준비)
+#   lazy   : LAZY_INIT=1 WARMUP=0 (모두 첫 사용 때)
+#   warmup : LAZY_INIT=1 WARMUP=1 (뜨는 동안 백그라운드 스레드에서 준비)
+# 진입점
+#   gui.py          : 임포트 시간
+#   serve.py        : gui의 Blocks를 마운트한 같은 앱. /api/health 응답까지(listen), /api/ready 까지,
+#                     listen 후 --arrival 초 뒤에 온 첫 사용자의 POST /api/games 응답 시간 (first game)
+#   money_agent     : 임포트 시간, get_graph()로 Agent와 그래프가 준비되기까지
+# 모델에 요청은 보내지 않습니다. vertex 백엔드도 SDK 임포트와 클라이언트 생성까지만 하므로 GCP 자격 증명 없이 잴 수 있습니다.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MONEY_AGENT = os.path.join(HERE, "..", "money_agent")
+
+MODES = {
+    "eager": {"LAZY_INIT": "0", "WARMUP": "0"},
+    "lazy": {"LAZY_INIT": "1", "WARMUP": "0"},
+    "warmup": {"LAZY_INIT": "1", "WARMUP": "1"},
+}
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+{after}
+print(json.dumps({{"import": imported, "ready": time.perf_counter() - start}}))
+"""
+
+
+def environment(args, mode, tmp):
+    return dict(
+        os.environ,
+        **MODES[mode],
+        LLM_BACKEND=args.backend,
+        PROJECT_NAME=os.environ.get("PROJECT_NAME", "startup-bench"),
+        LOCATION=os.environ.get("LOCATION", "us-central1"),
+        SPECULATIVE_NPC="0",  # 첫 게임 직후 NPC 행동을 미리 생성하면 모델에 요청이 나갑니다
+        SESSION_DB=os.path.join(tmp, "sessions.db"),
+        SNAPSHOT_DIR=os.path.join(tmp, "snapshots"),
+        GAME_LOG_DIR=os.path.join(tmp, "logs"),
+    )
+
+
+def probe(env, cwd, module, after="pass"):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module, after=after)],
+        env=env, cwd=cwd, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def wait_for(client, url, deadline, ok=(200,)):
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code in ok:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def serve_timings(env, port, story, arrival):
+    start = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(port)],
+        env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(timeout=120) as client:
+            wait_for(client, f"{url}/api/health", start + 120)
+            listen = time.monotonic() - start
+            # WARMUP=0 이면 /api/ready는 바로 200이므로 ready == listening 입니다
+            wait_for(client, f"{url}/api/ready", start + 120)
+            ready = time.monotonic() - start
+            time.sleep(max(0.0, arrival - (ready - listen)))
+            requested = time.monotonic()
+            client.post(f"{url}/api/games", json={"story": story}).raise_for_status()
+            first_game = time.monotonic() - requested
+        return {"listen": listen, "first_game": first_game, "ready": ready}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["vertex", "fake"], default="vertex")
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--arrival", type=float, default=3.0, help="서버가 뜬 뒤 첫 사용자가 오기까지(초)")
+    parser.add_argument("--port", type=int, default=7971)
+    args = parser.parse_args()
+
+    print(f"backend: {args.backend}, first user arrives {args.arrival}s after listening, median of {args.repeat} fresh processes (seconds)")
+    for mode in args.modes:
+        gui_runs, serve_runs, money_runs = [], [], []
+        with tempfile.TemporaryDirectory() as tmp:
+            env = environment(args, mode, tmp)
+            for _ in range(args.repeat):
+                gui_runs.append(probe(env, HERE, "gui"))
+                serve_runs.append(serve_timings(env, args.port, args.story, args.arrival))
+                money_runs.append(probe(env, MONEY_AGENT, "main", after="main.get_graph()"))
+        print(
+            f"{mode:<7} gui.py: import {median(gui_runs, 'import'):5.2f} | "
+            f"serve.py: listening {median(serve_runs, 'listen'):5.2f}, ready {median(serve_runs, 'ready'):5.2f}, "
+            f"first game request {median(serve_runs, 'first_game'):5.2f} | "
+            f"money_agent: import {median(money_runs, 'import'):5.2f}, agent ready {median(money_runs, 'ready'):5.2f}"
+        )
@@ -0,0 +1,99 @@
+# -------------------------------------
+# 계측 비용과 출력 확인 (span 하나의 비용, 턴당 오버헤드, 턴 분해, /metrics, OTLP JSON)
+#   python bench_tracing.py --games 20 --turns 10
+# -------------------------------------
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["SPECULATIVE_NPC"] = "0"
+os.environ["SNAPSHOTS"] = "0"
+
+from metrics import LatencyStats
+from tracing import Tracer, tracer
+import gui
+
+# 마지막 명령은 fast-path로 풀리지 않아 게임 매니저 Agent(모델 + tool 선택)를 거칩니다
+COMMANDS = ["깨진조각상 확인", "음악실로 이동", "미술실로 이동", "주변을 천천히 둘러본다"]
+
+
+def span_cost(enabled, n=200000):
+    local = Tracer(enabled=enabled)
+    start = time.perf_counter()
+    for _ in range(n):
+        with local.span("bench", game_id="g"):
+            pass
+    return (time.perf_counter() - start) / n
+
+
+async def play(args, stats):
+    game_id, player_list, *_ = gui.game_start(args.story)
+    person_player = player_list[0]
+    await gui.select_character(person_player, game_id, "")
+    for i in range(args.turns):
+        start = time.perf_counter()
+        await gui.advance_turn(COMMANDS[i % len(COMMANDS)], game_id, "", person_player)
+        stats.record(time.perf_counter() - start)
+    return game_id
+
+
+async def run(args, enabled):
+    tracer.enabled = enabled
+    gui.response_cache.clear()
+    stats = LatencyStats()
+    game_ids = await asyncio.gather(*(play(args, stats) for _ in range(args.games)))
+    return stats.summary(), game_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"span cost: disabled {span_cost(False) * 1e9:.0f} ns, enabled {span_cost(True) * 1e9:.0f} ns")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracer.export_path = os.path.join(tmp, "traces.jsonl")
+        asyncio.run(run(args, False))  # 워밍업
+        # 번갈아 여러 번 돌려 가장 빠른 회차끼리 비교합니다 (CPU 잡음 제거)
+        results = {False: [], True: []}
+        for _ in range(args.repeat):
+            for enabled in (False, True):
+                summary, game_ids = asyncio.run(run(args, enabled))
+                results[enabled].append(summary)
+        off = min(results[False], key=lambda summary: summary["mean"])
+        on = min(results[True], key=lambda summary: summary["mean"])
+        print(f"turn (handler) mean: off {off['mean'] * 1e3:.2f} ms, on {on['mean'] * 1e3:.2f} ms "
+              f"(+{(on['mean'] - off['mean']) * 1e6:.0f} us/turn) | p99 off {off['p99'] * 1e3:.2f} ms, on {on['p99'] * 1e3:.2f} ms")
+
+        print("\nper-turn breakdown (last 4 handler calls of one game, ms):")
+        for record in gui.tracer.turn_breakdown(game_ids[0])[-4:]:
+            spans = ", ".join(f"{name} {value * 1e3:.2f}" for name, value in sorted(record["spans"].items()))
+            print(f"  {record['handler']:<22} turn {record['turn']}: total {record['total'] * 1e3:.2f} | {spans} | "
+                  f"other {record['other'] * 1e3:.2f} | tokens {record['tokens_in']}/{record['tokens_out']} | "
+                  f"cache hits {record['cache_hits']} | tools {record['tools']}")
+
+        text = tracer.prometheus_text()
+        print(f"\n/metrics: {len(text.splitlines())} lines, e.g.")
+        for line in text.splitlines():
+            if line.startswith(("detective_span_duration_seconds_count", "detective_tool_calls_total", "detective_cache_lookups_total")):
+                print(f"  {line}")
+
+        tracer.flush()
+        spans = []
+        with open(tracer.export_path, encoding="utf-8") as f:
+            for line in f:
+                for resource in json.loads(line)["resourceSpans"]:
+                    for scope in resource["scopeSpans"]:
+                        spans.extend(scope["spans"])
+        ids = {span["spanId"] for span in spans}
+        orphans = sum(1 for span in spans if "parentSpanId" in span and span["parentSpanId"] not in ids)
+        print(f"\nOTLP JSON: {len(spans)} spans exported, {orphans} with a parent outside the export")
+    gui.game_logger.close()
@@ -0,0 +1,139 @@
+# -------------------------------------
+# 턴 처리량 / 동시 세션 부하 테스트 (로컬 fake 백엔드)
+#   python bench_turns.py --games 8 --turns 30 --latency 0.05 --concurrency 4
+#   python bench_turns.py --games 64 --turns 10 --sweep 1,4,16,64
+# -------------------------------------
+import argparse
+import asyncio
+import os
+import re
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+
+from langchain_core.messages import HumanMessage
+from llm_backend import model_timer
+from metrics import LatencyStats
+import gui
+from llm_backend import base_model
+
+COMMAND_PATTERN = re.compile(r"^(?P<player>\S+)의 명령: .*, game_id:(?P<game_id>\S+)$", re.S)
+
+
+def function_router(talk_every):
+    """게임 매니저 Agent 호출을 흉내내어 게임 상태에 맞는 tool 호출을 결정합니다."""
+    def route(messages):
+        if not isinstance(messages[-1], HumanMessage):
+            return None  # tool 결과를 받은 뒤에는 답변으로 마무리
+        match = COMMAND_PATTERN.match(messages[-1].content)
+        if match is None:
+            return None
+        player, game_id = match["player"], match["game_id"]
+        game = gui.game_db[game_id]
+        player_list = list(game["player_dict"].keys())
+        turn = game["turn"]
+        if talk_every and turn % talk_every == talk_every - 1:
+            # 사람 플레이어(목록의 첫 캐릭터)와의 대화로 conversation_processing 경로까지 거치게 합니다
+            to_player = player_list[0] if player != player_list[0] else player_list[1]
+            return "talk_to_player", {"from_player": player, "to_player": to_player, "game_id": game_id}
+        evidences = game["player_db"][player]["evidences"]
+        return "get_evidence_info", {"player": player, "evidence": evidences[turn % len(evidences)], "game_id": game_id}
+    return route
+
+
+async def drain(handler, stats):
+    """스트리밍 핸들러를 끝까지 소비하고 전체 시간을 기록합니다."""
+    start = time.perf_counter()
+    async for _ in handler:
+        pass
+    stats.record(time.perf_counter() - start)
+
+
+async def play_game(story_name, turns, turn_stats, conv_stats, think_time=0.0):
+    game_id, player_list, *_ = gui.game_start(story_name)
+    person_player = player_list[0]
+    await gui.select_character(person_player, game_id, "")
+    for _ in range(turns):
+        await asyncio.sleep(think_time)  # 사람이 [다음 턴]을 누르기까지의 시간
+        start = time.perf_counter()
+        await gui.advance_turn("증거를 확인할게", game_id, "", person_player)
+        turn_stats.record(time.perf_counter() - start)
+
+        if gui.game_db[game_id]["conversation_db"]["person_conv"]:
+            await drain(gui.conversation_start(game_id, ""), conv_stats)
+            while gui.game_db[game_id]["conversation_db"]["person_conv"]:
+                await drain(gui.conversation_processing(game_id, "", "그 시간에 어디에 있었어?"), conv_stats)
+    return game_id
+
+
+async def run_games(story_name, games, turns, concurrency, turn_stats, conv_stats, think_time=0.0):
+    """games 개의 게임을 최대 concurrency 개의 세션이 동시에 진행합니다."""
+    sessions = asyncio.Semaphore(concurrency)
+
+    async def session():
+        async with sessions:
+            await play_game(story_name, turns, turn_stats, conv_stats, think_time)
+
+    await asyncio.gather(*(session() for _ in range(games)))
+
+
+def report(args, concurrency):
+    turn_stats = LatencyStats()
+    conv_stats = LatencyStats()
+    model_timer.stats.reset()
+    gui.ttft_stats.reset()
+    gui.stream_latency_stats.reset()
+    gui.intent_stats.reset()
+    start = time.perf_counter()
+    asyncio.run(run_games(args.story, args.games, args.turns, concurrency, turn_stats, conv_stats, args.think_time))
+    wall = time.perf_counter() - start
+
+    turns = turn_stats.summary()
+    convs = conv_stats.summary()
+    model = model_timer.stats.summary()
+    handler_total = turns["total"] + convs["total"]
+    print(f"games: {args.games}, turns/game: {args.turns}, concurrency: {concurrency}, latency: {args.latency}s")
+    print(f"turns/sec        : {turns['count'] / wall:.2f}")
+    print(f"turn latency     : p50 {turns['p50'] * 1000:.1f} ms, p99 {turns['p99'] * 1000:.1f} ms")
+    print(f"conv latency     : p50 {convs['p50'] * 1000:.1f} ms, p99 {convs['p99'] * 1000:.1f} ms ({convs['count']} calls)")
+    ttft = gui.ttft_stats.summary()
+    stream = gui.stream_latency_stats.summary()
+    print(f"npc stream       : TTFT p50 {ttft['p50'] * 1000:.1f} ms, p99 {ttft['p99'] * 1000:.1f} ms / total p50 {stream['p50'] * 1000:.1f} ms")
+    print(f"model calls      : {model['count']}, total {model['total']:.2f} s")
+    print(f"outside model    : {max(handler_total - model['total'], 0.0) / handler_total * 100:.1f} %")
+    spec = gui.speculation.stats()
+    print(f"speculation      : hits {spec['hits']}, misses {spec['misses']}, invalidations {spec['invalidations']} (hit rate {spec['hit_rate'] * 100:.1f} %)")
+    cache = gui.response_cache.stats()
+    print(f"response cache   : hits {cache['hits']}, misses {cache['misses']} (hit rate {cache['hit_rate'] * 100:.1f} %, saved {cache['saved_seconds']:.2f} s / {cache['saved_tokens']} tokens)")
+    router = gui.intent_stats.summary()
+    print(f"intent router    : hits {router['hits']}, fallbacks {router['fallbacks']} (hit rate {router['hit_rate'] * 100:.1f} %, saved {router['saved_seconds']:.2f} s)")
+    return turns["count"] / wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story", default="story1")
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake 모델 응답 지연(초)")
+    parser.add_argument("--concurrency", type=int, default=1, help="동시에 진행할 게임 수")
+    parser.add_argument("--think-time", type=float, default=0.0, help="매 턴 전에 사람이 생각하는 시간(초)")
+    parser.add_argument("--sweep", default="", help="쉼표로 구분한 동시 세션 수 목록 (예: 1,4,16,64)")
+    parser.add_argument("--talk-every", type=int, default=4, help="몇 턴마다 대화를 시도할지 (0이면 대화 없음)")
+    args = parser.parse_args()
+
+    for model in (gui.gamemanager_llm(), gui.game_play_llm()):
+        base_model(model).latency = args.latency
+    base_model(gui.gamemanager_llm()).function_router = function_router(args.talk_every)
+
+    if not args.sweep:
+        report(args, args.concurrency)
+    else:
+        levels = [int(level) for level in args.sweep.split(",")]
+        throughput = {}
+        for level in levels:
+            throughput[level] = report(args, level)
+            print()
+        print("concurrency | turns/sec | scaling")
+        for level in levels:
+            print(f"{level:>11} | {throughput[level]:>9.2f} | x{throughput[level] / throughput[levels[0]]:.1f}")
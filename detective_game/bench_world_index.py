@@ -0,0 +1,92 @@
+# -------------------------------------
+# 장소/증거 조회 벤치마크 (합성 지도)
+#   python bench_world_index.py --rooms 100 500 1000 --players 50 --moves 20000
+# -------------------------------------
+import argparse
+import random
+import time
+
+from world_index import WorldMap, WorldIndex
+
+
+def synthetic_map(rooms, evidences):
+    return {
+        f"장소{r}": {f"증거{r}_{e}": f"장소{r}의 증거 {e} 설명" for e in range(evidences)}
+        for r in range(rooms)
+    }
+
+
+def scan_move(map_dict, player_db, player, location):
+    """변경 전 move_player/get_evidence_info와 같은 방식: 매번 리스트를 만들고 전체를 훑습니다."""
+    map_list = list(map_dict.keys())
+    if location not in map_list:
+        return None
+    player_db[player]["position"] = location
+    talkable = [p for p in player_db if p != player and player_db[p]["position"] == location]
+    evidences = list(map_dict[location].keys())
+    player_db[player]["talkable"] = talkable
+    player_db[player]["evidences"] = evidences
+    evidence = evidences[-1]
+    return evidence in list(map_dict[location].keys())
+
+
+def index_move(world, player_db, player, location):
+    world_map = world.world_map
+    if not world_map.is_location(location):
+        return None
+    player_db[player]["position"] = location
+    for affected in world.move(player, location):
+        player_db[affected]["talkable"] = world.talkable(affected)
+    evidences = world_map.evidences(location)
+    player_db[player]["evidences"] = list(evidences)
+    return world_map.has_evidence(location, evidences[-1])
+
+
+def new_player_db(players, start):
+    return {p: {"position": start, "talkable": [], "evidences": []} for p in players}
+
+
+def run(rooms, evidences, players, moves, seed):
+    map_dict = synthetic_map(rooms, evidences)
+    map_list = list(map_dict.keys())
+    player_list = [f"플레이어{i}" for i in range(players)]
+    rng = random.Random(seed)
+    plan = [(rng.choice(player_list), rng.choice(map_list)) for _ in range(moves)]
+
+    player_db = new_player_db(player_list, map_list[0])
+    start = time.perf_counter()
+    for player, location in plan:
+        scan_move(map_dict, player_db, player, location)
+    scan = time.perf_counter() - start
+
+    world = WorldIndex(WorldMap(map_dict), player_list, map_list[0])
+    indexed_db = new_player_db(player_list, map_list[0])
+    start = time.perf_counter()
+    for player, location in plan:
+        index_move(world, indexed_db, player, location)
+    indexed = time.perf_counter() - start
+
+    # 색인 결과가 전체 스캔 결과와 같은지 확인합니다
+    for player in player_list:
+        expected = [p for p in player_list if p != player and indexed_db[p]["position"] == indexed_db[player]["position"]]
+        assert world.talkable(player) == expected, player
+        assert scan_move(map_dict, player_db, player, indexed_db[player]["position"]) is not None
+
+    print(
+        f"rooms {rooms:>5} | scan {scan / moves * 1e6:>8.2f} us/move"
+        f" | index {indexed / moves * 1e6:>8.2f} us/move | x{scan / indexed:>6.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--evidences", type=int, default=5)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--moves", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"players: {args.players}, evidences/room: {args.evidences}, moves: {args.moves}")
+    for rooms in args.rooms:
+        run(rooms, args.evidences, args.players, args.moves, args.seed)
@@ -0,0 +1,60 @@
+# -------------------------------------
+# 게임 로그 (append-only 조각 목록 + 화면 delta)
+# -------------------------------------
+
+
+class ChunkedLog:
+    """게임 로그를 문자열 이어 붙이기 대신 조각 목록으로 보관합니다.
+
+    append는 O(1)이고 전체 문자열은 저장/종료 때만 만듭니다. 화면에는 ui_update()로 그 화면(client)에 마지막으로
+    보낸 뒤에 추가된 조각만 보냅니다. 커서는 화면마다 따로 두므로 두 번째 탭이나 API 호출이 다른 화면의 조각을
+    가져가지 않습니다. tail은 아직 확정되지 않은 줄(스트리밍 중인 NPC 답변)로, 다음 update에서 교체됩니다.
+    """
+
+    def __init__(self, text=""):
+        self.chunks = [text] if text else []
+        self.size = len(text)
+        self.cursors = {}  # client → 그 화면에 보낸 조각 수
+        self.seq = 0
+
+    def append(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+
+    def __len__(self):
+        return self.size
+
+    def text(self):
+        return "".join(self.chunks)
+
+    def since(self, offset):
+        """offset번째 조각부터의 텍스트. 자기 위치를 기억하는 클라이언트(API)가 씁니다."""
+        return "".join(self.chunks[offset:])
+
+    def ui_update(self, tail="", full=False, client=None):
+        """client 화면의 로그 컴포넌트로 보낼 값. full=True면 전체를 다시 보냅니다(reset)."""
+        start = 0 if full else self.cursors.get(client, 0)
+        self.seq += 1
+        update = {
+            "seq": self.seq,
+            "reset": full,
+            "text": "".join(self.chunks[start:]),
+            "tail": tail,
+        }
+        self.cursors[client] = len(self.chunks)
+        return update
+
+
+# 숨겨진 gr.JSON 값이 바뀔 때 브라우저에서 로그 Textbox 끝에 delta를 붙입니다
+APPEND_LOG_JS = """
+(update) => {
+    const box = document.querySelector('#game-log textarea');
+    if (!box || !update) return;
+    if (update.reset || box._logSeq === undefined) box._logBase = "";
+    if (box._logSeq !== undefined && update.seq <= box._logSeq && !update.reset) return;
+    box._logSeq = update.seq;
+    box._logBase += update.text;
+    box.value = box._logBase + update.tail;
+    box.scrollTop = box.scrollHeight;
+}
+"""
@@ -0,0 +1,170 @@
+# -------------------------------------
+# 플레이어별 대화 맥락 버퍼
+# -------------------------------------
+from collections import deque
+import asyncio
+import re
+
+CHARS_PER_TOKEN = 2  # 한국어 기준 대략적인 글자 수/토큰
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+|\s*…\s*")
+SUMMARY_GAP = " … "
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_summary(summary, max_chars, head_share=0.4):
+    """요약이 max_chars를 넘으면 문장(줄) 단위로 줄입니다.
+
+    앞쪽(피해자, 용의자, 초반 단서처럼 먼저 정해진 사실)을 head_share 만큼 남기고, 나머지는 가장 최근 문장으로 채웁니다.
+    가운데의 오래된 진행 내용부터 빠집니다. 문장 하나가 몫보다 길면 그 문장만 글자 단위로 자릅니다.
+    """
+    summary = summary.strip()
+    if len(summary) <= max_chars:
+        return summary
+    sentences = [sentence.strip() for sentence in SENTENCE_BREAK.split(summary) if sentence.strip()]
+    if len(sentences) == 1:
+        return sentences[0][:max_chars]
+    head_budget = int(max_chars * head_share)
+    head, used = [], 0
+    for sentence in sentences:
+        if used + len(sentence) + (1 if head else 0) > head_budget:
+            break
+        used += len(sentence) + (1 if head else 0)
+        head.append(sentence)
+    if not head:
+        head, used = [sentences[0][:head_budget]], head_budget
+    tail_budget = max_chars - used - len(SUMMARY_GAP)
+    tail, used = [], 0
+    for sentence in reversed(sentences[len(head):]):
+        if used + len(sentence) + (1 if tail else 0) > tail_budget:
+            break
+        used += len(sentence) + (1 if tail else 0)
+        tail.append(sentence)
+    if not tail:
+        return " ".join(head)
+    return " ".join(head) + SUMMARY_GAP + " ".join(reversed(tail))
+
+
+class ConversationContext:
+    """플레이어 한 명이 보는 게임 맥락을 누적 렌더링해 두는 버퍼.
+
+    줄이 추가될 때마다 렌더링된 문자열을 이어 붙이고, max_tokens/max_lines 예산을 넘으면
+    가장 오래된 줄부터 창 밖으로 밀어냅니다. summarizer가 있으면 밀려난 줄을
+    summary_batch 줄씩 모아 기존 요약과 함께 압축하므로, 프롬프트 길이가 게임 길이와 상관없이 일정합니다.
+    요약이 summary_max_chars를 넘으면 trim_summary로 처음 사실과 최근 내용을 남기고 가운데를 뺍니다.
+
+    요약은 모델 호출이므로 이벤트 루프 위에서는 append/extend(compact=False)로 쌓기만 하고
+    needs_compaction()이면 await acompact()로 요약합니다. 그 전까지 밀려난 줄은 render()에 그대로 들어갑니다.
+    """
+
+    def __init__(self, max_tokens=1500, max_lines=None, summarizer=None, summary_batch=10,
+                 summary_max_chars=600, token_counter=estimate_tokens):
+        self.max_tokens = max_tokens
+        self.max_lines = max_lines
+        self.summarizer = summarizer
+        self.summary_batch = summary_batch
+        self.summary_max_chars = summary_max_chars
+        self.token_counter = token_counter
+        self.lines = deque()
+        self.tokens = deque()
+        self.token_total = 0
+        self.text = ""
+        self.summary = ""
+        self.evicted = []
+        self.dropped = 0
+
+    def append(self, line, compact=True):
+        tokens = self.token_counter(line)
+        self.lines.append(line)
+        self.tokens.append(tokens)
+        self.token_total += tokens
+        self.text = f"{self.text}\n{line}" if len(self.lines) > 1 else line
+        self._evict(compact)
+
+    def extend(self, lines, compact=True):
+        for line in lines:
+            self.append(line, compact)
+
+    def _over_budget(self):
+        if len(self.lines) <= 1:
+            return False
+        if self.max_lines is not None and len(self.lines) > self.max_lines:
+            return True
+        return self.max_tokens is not None and self.token_total > self.max_tokens
+
+    def _evict(self, compact=True):
+        cut = 0
+        while self._over_budget():
+            line = self.lines.popleft()
+            self.token_total -= self.tokens.popleft()
+            cut += len(line) + 1
+            self.evicted.append(line)
+        if not cut:
+            return
+        self.text = self.text[cut:]
+        if self.summarizer is None:
+            self.dropped += len(self.evicted)
+            self.evicted = []
+        elif compact and self.needs_compaction():
+            self.compact()
+
+    def needs_compaction(self):
+        return self.summarizer is not None and len(self.evicted) >= self.summary_batch
+
+    def compact(self):
+        """밀려난 줄들을 기존 요약과 합쳐 새 요약으로 압축합니다."""
+        if not self.evicted:
+            return
+        summary = self.summarizer(self.summary, self.evicted)
+        self.summary = trim_summary(summary, self.summary_max_chars)
+        self.evicted = []
+
+    async def acompact(self):
+        """compact의 비동기 버전. summarizer에 asummarize가 없으면 스레드에서 부릅니다."""
+        if not self.evicted:
+            return
+        lines = list(self.evicted)
+        asummarize = getattr(self.summarizer, "asummarize", None)
+        if asummarize is not None:
+            summary = await asummarize(self.summary, lines)
+        else:
+            summary = await asyncio.to_thread(self.summarizer, self.summary, lines)
+        self.summary = trim_summary(summary, self.summary_max_chars)
+        del self.evicted[:len(lines)]  # 기다리는 동안 더 밀려난 줄은 다음 요약으로
+
+    def render(self):
+        header = []
+        if self.summary:
+            header.append(f"(이전 요약) {self.summary}")
+        if self.evicted:
+            header.append("\n".join(self.evicted))
+        elif self.dropped:
+            header.append(f"(이전 대화 {self.dropped}줄 생략)")
+        if not header:
+            return self.text
+        return "\n".join(header + [self.text])
+
+
+def llm_summarizer(llm):
+    """모델을 사용해 오래된 맥락을 짧게 요약하는 summarizer를 만듭니다."""
+    from langchain_core.messages import HumanMessage
+
+    def prompt(summary, lines):
+        return (
+            "다음은 추리게임의 이전 요약과 그 이후의 진행 기록입니다. "
+            "누가 어디로 이동했고 어떤 증거를 확인했으며 무슨 대화를 했는지, 중요한 사실만 5줄 이내로 요약하세요.\n\n"
+            f"이전 요약: {summary}\n\n진행 기록:\n" + "\n".join(lines)
+        )
+
+    def summarize(summary, lines):
+        result = llm.generate([[HumanMessage(content=prompt(summary, lines))]])
+        return result.generations[0][0].text
+
+    async def asummarize(summary, lines):
+        result = await llm.agenerate([[HumanMessage(content=prompt(summary, lines))]])
+        return result.generations[0][0].text
+
+    summarize.asummarize = asummarize
+    return summarize
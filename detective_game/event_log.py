@@ -0,0 +1,72 @@
+# -------------------------------------
+# 게임 전체 공용 이벤트 로그
+# -------------------------------------
+from typing import NamedTuple, Optional
+
+
+class Event(NamedTuple):
+    kind: str          # move, evidence, talk_start, dialogue, talk_end, command, result
+    actor: Optional[str]
+    turn: int
+    text: str
+    visible_to: Optional[tuple] = None  # None이면 모든 플레이어에게 보임
+
+
+def event_record(event):
+    """json으로 남길 수 있는 dict 형태의 이벤트"""
+    record = {"type": event.kind, "actor": event.actor, "turn": event.turn, "text": event.text}
+    if event.visible_to is not None:
+        record["visible_to"] = list(event.visible_to)
+    return record
+
+
+class EventLog:
+    """한 게임의 모든 이벤트를 한 번만 저장하는 append-only 로그.
+
+    플레이어별 conversation_log 리스트에 같은 문자열을 복제하는 대신, 각 플레이어는
+    커서(마지막으로 읽은 위치)만 갖고 자신에게 보이는 이벤트를 필요할 때 읽어 갑니다.
+    """
+
+    def __init__(self, players, listener=None):
+        self.players = list(players)
+        self.events = []
+        self.cursors = {player: 0 for player in self.players}
+        self.listener = listener  # 이벤트가 추가될 때마다 호출 (예: GameLogger.event_listener)
+
+    def append(self, kind, actor, turn, text, visible_to=None):
+        if visible_to is not None:
+            visible_to = tuple(visible_to)
+            if len(visible_to) == len(self.players) and set(visible_to) == set(self.players):
+                visible_to = None
+        event = Event(kind, actor, turn, text, visible_to)
+        self.events.append(event)
+        if self.listener is not None:
+            self.listener(event)
+
+    def __getstate__(self):
+        # listener는 로그 기록기(스레드)를 물고 있으므로 세션을 직렬화할 때는 빼고, 되돌린 쪽에서 다시 연결합니다
+        state = dict(vars(self))
+        state["listener"] = None
+        return state
+
+    def __len__(self):
+        return len(self.events)
+
+    @staticmethod
+    def is_visible(event, player):
+        return event.visible_to is None or player in event.visible_to
+
+    def view(self, player, start=0, end=None):
+        """player에게 보이는 이벤트 문장을 start 위치부터 (end 전까지) 차례로 돌려줍니다."""
+        for event in self.events[start:end]:
+            if self.is_visible(event, player):
+                yield event.text
+
+    def read_new(self, player):
+        """player가 아직 읽지 않은 이벤트 문장을 돌려주고 커서를 끝으로 옮깁니다."""
+        start = self.cursors[player]
+        self.cursors[player] = len(self.events)
+        return list(self.view(player, start))
+
+    def to_records(self):
+        return [event_record(event) for event in self.events]
@@ -0,0 +1,177 @@
+# -------------------------------------
+# 로컬 가짜 모델 서버 (http 백엔드와 ModelPool을 GCP 없이 시험하기 위한 것)
+#   python fake_model_server.py --port 8123 --rpm 600 --error-rate 0.02
+#   LLM_BACKEND=http MODEL_SERVER_URL=http://127.0.0.1:8123 python gui.py
+# -------------------------------------
+# POST /v1/chat  {"messages": [{"role": ..., "content": ...}], "temperature": ...}
+#   200 {"content": ..., "usage": {"input_tokens": n, "output_tokens": m}}
+#   429 분당 요청/토큰 한도 초과 (Retry-After 헤더, 초)
+#   503 error_rate 확률로 일시적인 오류
+# 응답 시간은 latency 근처에서 흔들리고, slow_ratio 확률로 slow_factor 배 느린 꼬리 지연이 납니다.
+# GET /stats 는 지금까지의 요청 수, 429/503 수, 최대 동시 처리 수를 돌려줍니다.
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from context_buffer import estimate_tokens
+from model_pool import TokenBucket
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+
+RESPONSES = [
+    "미술실로 이동할게",
+    "음악실로 이동할게",
+    "여기 있는 증거를 살펴보고 싶어",
+    "이 증거에 대해 추궁하고 싶어, 대화를 할게",
+    "그날 저녁에는 교실에 있었어. 다른 사람은 보지 못했어.",
+    "그 시간에 어디에 있었는지 말해줄 수 있어?",
+]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 클라이언트가 먼저 끊은 요청(지고 취소된 hedge 등)은 조용히 넘깁니다
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FakeModelServer:
+    """스레드 하나에서 도는 HTTP 모델 서버. start()/stop() 으로 벤치마크 안에서 띄웁니다."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, slow_ratio=0.0, slow_factor=10.0,
+                 error_rate=0.0, requests_per_minute=0, tokens_per_minute=0, burst_seconds=1.0, seed=None):
+        self.latency = latency
+        self.slow_ratio = slow_ratio
+        self.slow_factor = slow_factor
+        self.error_rate = error_rate
+        # 실제 API처럼 짧은 구간의 몰림을 막도록 버킷 크기를 burst_seconds 초 분량으로 둡니다
+        self.requests = TokenBucket(requests_per_minute, burst=max(1.0, requests_per_minute / 60 * burst_seconds))
+        self.tokens = TokenBucket(tokens_per_minute, burst=max(1.0, tokens_per_minute / 60 * burst_seconds))
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.served = 0
+        self.throttled = 0
+        self.errors = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.connections = 0
+        self.httpd = _HTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: 클라이언트 연결 풀이 연결을 재사용할 수 있게
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self._send(200, server.stats())
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/v1/chat":
+                    self._send(404, {"error": "not found"})
+                    return
+                status, body, headers = server.respond(request)
+                self._send(status, body, headers)
+
+        return Handler
+
+    def respond(self, request):
+        text = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        input_tokens = estimate_tokens(text)
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(input_tokens, now))
+            if wait > 0:
+                self.throttled += 1
+                return 429, {"error": "rate limit exceeded"}, [("Retry-After", f"{wait:.3f}")]
+            self.requests.take(1)
+            self.tokens.take(input_tokens)
+            failed = self.random.random() < self.error_rate
+            slow = self.random.random() < self.slow_ratio
+            delay = self.latency * self.random.lognormvariate(0, 0.25) * (self.slow_factor if slow else 1.0)
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+        if failed:
+            with self._lock:
+                self.errors += 1
+            return 503, {"error": "service unavailable"}, []
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        content = RESPONSES[int.from_bytes(digest[:4], "big") % len(RESPONSES)]
+        with self._lock:
+            self.served += 1
+        return 200, {"content": content, "usage": {"input_tokens": input_tokens, "output_tokens": estimate_tokens(content)}}, []
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-model-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "served": self.served,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "max_inflight": self.max_inflight,
+                "connections": self.connections,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-factor", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--rpm", type=float, default=0)
+    parser.add_argument("--tpm", type=float, default=0)
+    args = parser.parse_args()
+    server = FakeModelServer(
+        args.host, args.port, latency=args.latency, slow_ratio=args.slow_ratio, slow_factor=args.slow_factor,
+        error_rate=args.error_rate, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+    )
+    print(f"fake model server on {server.url}")
+    server.httpd.serve_forever()
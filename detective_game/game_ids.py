@@ -0,0 +1,18 @@
+# -------------------------------------
+# game_id 형식 (로그 · 스냅샷 · 상태 파일 이름에 그대로 쓰이므로 경로를 만들기 전에 확인합니다)
+# -------------------------------------
+import re
+
+# gui.game_start가 만드는 "{시작 시각 14자리}_{uuid4}"
+GAME_ID_PATTERN = re.compile(r"\d{14}_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def is_game_id(game_id):
+    return isinstance(game_id, str) and GAME_ID_PATTERN.fullmatch(game_id) is not None
+
+
+def check_game_id(game_id):
+    """형식이 맞으면 그대로 돌려주고, 아니면 ValueError ('../x' 같은 값이 파일 경로가 되지 않도록)."""
+    if not is_game_id(game_id):
+        raise ValueError(f"invalid game_id {game_id!r}")
+    return game_id
@@ -0,0 +1,54 @@
+# -------------------------------------
+# 게임별 잠금 (한 프로세스 안에서 같은 게임의 핸들러를 한 번에 하나씩)
+# -------------------------------------
+from contextlib import asynccontextmanager
+import asyncio
+import time
+import weakref
+
+
+class GameLockRegistry:
+    """game_id → asyncio.Lock. 전역 잠금 하나 대신 게임마다 따로 잠그므로 다른 게임은 그대로 동시에 처리됩니다.
+
+    잠금은 WeakValueDictionary에 두어, 잡고 있거나 기다리는 핸들러가 없으면 저절로 사라집니다(끝난 게임이 쌓이지 않음).
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    def get(self, game_id):
+        lock = self._locks.get(game_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[game_id] = lock
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, game_id):
+        lock = self.get(game_id)
+        if lock.locked():
+            self.contended += 1
+            start = time.perf_counter()
+            await lock.acquire()
+            self.wait_seconds += time.perf_counter() - start
+        else:
+            await lock.acquire()
+        self.acquired += 1
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def __len__(self):
+        return len(self._locks)
+
+    def stats(self):
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_seconds": self.wait_seconds,
+            "live_locks": len(self._locks),
+        }
@@ -0,0 +1,168 @@
+# -------------------------------------
+# 게임 로그 기록기 (구조화 JSONL, 버퍼링, 백그라운드 쓰기)
+# -------------------------------------
+from collections import OrderedDict
+from event_log import event_record
+from game_ids import check_game_id
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+_STOP = object()
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class GameLogger:
+    """게임별 logs/{game_id}.jsonl 에 이벤트를 한 줄씩 기록합니다.
+
+    log()는 큐에 넣기만 하고 돌아오며, 직렬화와 파일 쓰기는 writer 스레드가 모아서 합니다.
+    버퍼가 flush_bytes를 넘거나 flush_interval 초가 지나면 파일로 내보내므로, 프로세스가 죽어도
+    잃는 기록은 마지막 flush 이후의 것뿐입니다. rotate_bytes를 넘은 파일은 {game_id}.{n}.jsonl.gz 로 압축해 넘깁니다.
+    """
+
+    def __init__(self, directory="logs", flush_interval=1.0, flush_bytes=64 * 1024, rotate_bytes=0,
+                 fsync=False, max_open_files=128):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self.fsync = fsync
+        self.max_open_files = max_open_files
+        self.records = 0
+        self.bytes = 0
+        self.flushes = 0
+        self.rotations = 0
+        self._queue = queue.SimpleQueue()
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self._files = OrderedDict()  # 최근에 쓴 순서로 열린 파일을 max_open_files 개까지 유지
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="game-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def path(self, game_id):
+        check_game_id(game_id)
+        return os.path.join(self.directory, f"{game_id}.jsonl")
+
+    def log(self, game_id, kind, actor=None, turn=None, text="", **extra):
+        check_game_id(game_id)  # writer 스레드가 아니라 부르는 쪽에서 오류가 나도록
+        self._queue.put((game_id, {"ts": time.time(), "type": kind, "actor": actor, "turn": turn, "text": text, **extra}))
+
+    def event_listener(self, game_id):
+        """EventLog(listener=...)에 넘기면 이벤트가 추가될 때마다 기록합니다."""
+        check_game_id(game_id)
+        def listener(event):
+            self._queue.put((game_id, {"ts": time.time(), **event_record(event)}))
+        return listener
+
+    def flush(self, timeout=None):
+        """지금까지 log()한 기록이 파일에 쓰일 때까지 기다립니다."""
+        request = _Flush()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush_all()
+                self._close_files()
+                return
+            if isinstance(item, _Flush):
+                self._flush_all()
+                last_flush = time.monotonic()
+                item.done.set()
+                continue
+            if item is not None:
+                game_id, record = item
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                self._buffers.setdefault(game_id, []).append(line)
+                self._buffered_bytes += len(line)
+                self.records += 1
+            if self._buffered_bytes >= self.flush_bytes or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush_all()
+                last_flush = time.monotonic()
+
+    def _file(self, game_id):
+        f = self._files.pop(game_id, None)
+        if f is None:
+            f = open(self.path(game_id), "a", encoding="utf-8")
+        self._files[game_id] = f
+        while len(self._files) > self.max_open_files:
+            _, oldest = self._files.popitem(last=False)
+            oldest.close()
+        return f
+
+    def _flush_all(self):
+        if not self._buffers:
+            return
+        for game_id, lines in self._buffers.items():
+            f = self._file(game_id)
+            data = "".join(lines)
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self.bytes += len(data)
+            if self.rotate_bytes and f.tell() >= self.rotate_bytes:
+                self._rotate(game_id)
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self.flushes += 1
+
+    def _rotate(self, game_id):
+        self._files.pop(game_id).close()
+        path = self.path(game_id)
+        n = 1
+        while os.path.exists(os.path.join(self.directory, f"{game_id}.{n}.jsonl.gz")):
+            n += 1
+        with open(path, "rb") as src, gzip.open(os.path.join(self.directory, f"{game_id}.{n}.jsonl.gz"), "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        self.rotations += 1
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def stats(self):
+        return {
+            "records": self.records,
+            "bytes": self.bytes,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "queued": self._queue.qsize(),
+            "open_files": len(self._files),
+        }
+
+
+def game_logger_from_env():
+    """GAME_LOG_* 환경변수로 설정한 GameLogger"""
+    return GameLogger(
+        directory=os.environ.get("GAME_LOG_DIR", "logs"),
+        flush_interval=float(os.environ.get("GAME_LOG_FLUSH_INTERVAL", "1.0")),
+        flush_bytes=int(os.environ.get("GAME_LOG_FLUSH_BYTES", str(64 * 1024))),
+        rotate_bytes=int(os.environ.get("GAME_LOG_ROTATE_BYTES", "0")),
+        fsync=os.environ.get("GAME_LOG_FSYNC", "0") == "1",
+    )
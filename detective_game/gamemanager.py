@@ -0,0 +1,75 @@
+# -------------------------------------
+# 게임 매니저 Agent 캐시
+# -------------------------------------
+from llm_backend import LazyChatModel
+import threading
+
+
+def render_gamemanager_prompt(gamemanager_prompt, player_list, map_dict):
+    """게임 매니저 프롬프트에 스토리의 플레이어/증거 예시 값을 채워 넣습니다."""
+    map_list = list(map_dict.keys())
+    sample_evidence = list(map_dict[map_list[0]].keys())[0]
+    gamemanager_prompt = gamemanager_prompt.replace("{to_player}",player_list[0])
+    gamemanager_prompt = gamemanager_prompt.replace("{from_player}",player_list[1])
+    gamemanager_prompt = gamemanager_prompt.replace("{sample_evidence}",sample_evidence)
+    gamemanager_prompt = gamemanager_prompt.replace("{sample_evidence_info}",map_dict[map_list[0]][sample_evidence])
+    return gamemanager_prompt
+
+
+def build_gamemanager_agent(llm, tools, gamemanager_prompt):
+    """치환이 끝난 프롬프트로 게임 매니저 AgentExecutor를 생성합니다."""
+    # langchain.agents는 임포트가 무거우므로 처음 Agent를 만들 때 가져옵니다
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", gamemanager_prompt),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+    # 실행 과정은 verbose 출력 대신 tracing 콜백으로 기록합니다 (TRACING=1)
+    return AgentExecutor(agent=agent, tools=tools)
+
+
+class GameManagerAgentCache:
+    """스토리별로 한 번만 만든 AgentExecutor를 모든 게임, 모든 턴이 재사용합니다.
+
+    AgentExecutor는 호출 사이에 상태를 갖지 않으므로 여러 게임 세션이 동시에 같은 객체를 써도 됩니다.
+    스토리 파일이 바뀌어 치환된 프롬프트가 달라지면 그 스토리의 Agent를 새로 만들어 교체하므로,
+    캐시 크기는 스토리 수를 넘지 않습니다. 진행 중인 게임도 다음 턴부터 새 Agent를 씁니다.
+    llm에 LazyChatModel을 주면 모델은 처음 Agent를 만들 때 생성됩니다.
+    """
+
+    def __init__(self, llm, tools):
+        self._llm = llm
+        self.tools = tools
+        self._agents = {}  # story_name → (치환된 프롬프트, AgentExecutor)
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def prepare(self, story_name, gamemanager_prompt, player_list, map_dict):
+        """game_start 시점에 호출합니다. 필요하면 Agent를 만들고, 턴마다 사용할 캐시 키를 반환합니다."""
+        rendered_prompt = render_gamemanager_prompt(gamemanager_prompt, player_list, map_dict)
+        return self.prepare_rendered(story_name, rendered_prompt)
+
+    def prepare_rendered(self, story_name, rendered_prompt):
+        """이미 치환이 끝난 프롬프트(예: CompiledStory.gamemanager_prompt)로 prepare 합니다."""
+        entry = self._agents.get(story_name)
+        if entry is None or entry[0] != rendered_prompt:
+            with self._lock:
+                entry = self._agents.get(story_name)
+                if entry is None or entry[0] != rendered_prompt:
+                    if entry is not None:
+                        self.rebuilds += 1
+                    self._agents[story_name] = (rendered_prompt, build_gamemanager_agent(self.llm, self.tools, rendered_prompt))
+        return story_name
+
+    @property
+    def llm(self):
+        return self._llm() if isinstance(self._llm, LazyChatModel) else self._llm
+
+    def get(self, story_name):
+        return self._agents[story_name][1]
+
+    def __len__(self):
+        return len(self._agents)
@@ -1,12 +1,17 @@
 # -------------------------------------
 # 1. 라이브러리 임포트
 # -------------------------------------
-from langchain.agents import tool, AgentExecutor, create_openai_functions_agent
-from langchain_google_vertexai import ChatVertexAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema.messages import HumanMessage
-from google.cloud import aiplatform
+# langchain.agents, Vertex AI SDK 같은 무거운 모듈과 모델 클라이언트는 처음 쓸 때(또는 워밍업 스레드에서) 준비합니다
+from langchain_core.tools import tool
+from langchain_core.messages import HumanMessage
+import asyncio
+import contextlib
+import functools
+import inspect
 import os
+import pickle
+import zlib
+from collections import OrderedDict
 from datetime import datetime
 import uuid
 import json
@@ -14,38 +19,53 @@ import time
 from dotenv import load_dotenv
 import gradio as gr
 import threading
+from gamemanager import GameManagerAgentCache
+from llm_backend import LazyChatModel, base_model, model_pool, LLM_MAX_CONCURRENCY
+from model_pool import BACKGROUND, model_priority
+from context_buffer import ConversationContext, llm_summarizer, estimate_tokens
+from event_log import EventLog
+from game_logger import game_logger_from_env
+from metrics import LatencyStats
+from speculation import SpeculativeScheduler
+from story_registry import StoryRegistry, thaw
+from world_index import WorldIndex
+from intent_router import RouterStats
+from response_cache import ResponseCache, LangChainResponseCache, prompt_key
+from session_store import SessionStore
+from snapshot_store import SnapshotStore
+from state_backend import state_backend_from_env
+from game_locks import GameLockRegistry
+from game_ids import GAME_ID_PATTERN, is_game_id
+from tracing import tracer, trace_config
+from chunked_log import ChunkedLog, APPEND_LOG_JS
 
 # -------------------------------------
-# 2. GCP 설정
+# 2. 환경 설정 (GCP 설정은 llm_backend에서 처음 사용할 때 진행)
 # -------------------------------------
 load_dotenv()
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../application_credentials.json"
-aiplatform.init(project=os.environ["PROJECT_NAME"], location=os.environ["LOCATION"])
+# 게임 이벤트를 logs/{game_id}.jsonl 로 버퍼링해 백그라운드에서 기록합니다 (GAME_LOG_* 환경변수)
+game_logger = game_logger_from_env()
 
 # -------------------------------------
 # 3. LangChain 툴 정의
 # -------------------------------------
-def conversation_logging(player_list,conversation, game_id):
-    player_db = game_db[game_id]["player_db"]
-    for player in player_list:
-        player_db[player]["conversation_log"].append(conversation)
+def conversation_logging(player_list,conversation, game_id, kind="dialogue", actor=None):
+    game_db[game_id]["event_log"].append(kind, actor, game_db[game_id]["turn"], conversation, visible_to=player_list)
 
 
 @tool
 def move_player(player: str, location: str, game_id: str) -> str:
     """명령을 내린 플레이어를 지정된 위치로 이동시킵니다."""
-    map_dict = game_db[game_id]["map_dict"]
-    map_list = list(map_dict.keys())
+    world = game_db[game_id]["world"]
     player_db = game_db[game_id]["player_db"]
-    if location not in map_list:
-        return f"'{location}'은(는) 유효한 장소가 아닙니다. 이동 가능한 장소는 {', '.join(map_list)}입니다. 정확한 명칭을 입력해 주세요."
+    if not world.world_map.is_location(location):
+        return f"'{location}'은(는) 유효한 장소가 아닙니다. 이동 가능한 장소는 {', '.join(world.world_map.location_list)}입니다. 정확한 명칭을 입력해 주세요."
     player_db[player]["position"] = location
-    position = player_db[player]["position"]
-    talkable = [p for p in player_db if p != player and player_db[p]["position"] == position]
-    evidences = list(map_dict[position].keys())  # 해당 장소의 증거들
-    player_db[player]["talkable"] = talkable
-    player_db[player]["evidences"] = evidences
-    player_db[player]["conversation_log"].append(f"{location}으로 이동했습니다.")
+    # 출발지와 도착지에 있던 플레이어들의 talkable도 함께 갱신합니다
+    for affected in world.move(player, location):
+        player_db[affected]["talkable"] = world.talkable(affected)
+    player_db[player]["evidences"] = list(world.world_map.evidences(location))  # 해당 장소의 증거들
+    game_db[game_id]["event_log"].append("move", player, game_db[game_id]["turn"], f"{location}으로 이동했습니다.", visible_to=[player])
     return f"{{'player':'{player}','location':'{location}'}}"
 
 
@@ -60,7 +80,7 @@ def talk_to_player(from_player: str, to_player: str, game_id: str) -> str:
     if to_player not in player_db:
         return f"{to_player}는 게임 상 존재하지 않습니다. {', '.join(list(player_db.keys()))}중 정확한 이름을 입력해 주세요"
     
-    conversation_logging(player_list,f"{to_player}이 {from_player}에게 대화를 걸었습니다.",game_id)
+    conversation_logging(player_list,f"{to_player}이 {from_player}에게 대화를 걸었습니다.",game_id,kind="talk_start",actor=from_player)
 
     if person_player in [from_player, to_player]:
         game_db[game_id]["conversation_db"]={
@@ -72,24 +92,18 @@ def talk_to_player(from_player: str, to_player: str, game_id: str) -> str:
         }
         return f"{to_player}와 {from_player}가 대화를 시작했습니다"
 
+    # 사람이 낀 대화는 위에서 대화창으로 넘겼으므로 여기서는 NPC끼리만 말합니다
+    # (서버의 stdin을 기다리면 게임 잠금을 쥔 채로 멈추므로 input()은 쓰지 않습니다)
     for _ in range(3):
-        # player_db[from_player]["conversation_log"].append(f"{to_player}에게 질문하세요")
-        if from_player == person_player:
-            q = input(f"{from_player} 의 질문 :")
-        else:
-            q = get_player2_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id)
-        game_db[game_id]["log_history"] += f"{from_player}: {q}"
-        conversation_logging(player_list,f"{from_player}: {q}",game_id)
+        q = get_player2_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id,use_cache=False)
+        game_db[game_id]["log_history"].append(f"{from_player}: {q}")
+        conversation_logging(player_list,f"{from_player}: {q}",game_id,actor=from_player)
         
-        # player_db[to_player]["conversation_log"].append(f"{from_player}에게 답변하세요")
-        if to_player == person_player:
-            a = input(f"{to_player} 의 답변 :")
-        else:
-            a = get_player2_action(to_player,f"당신은 {to_player} 입니다. {from_player}의 마지막 질문에 답변하세요",game_id)
-        game_db[game_id]["log_history"] += f"{to_player}: {a}"
-        conversation_logging(player_list,f"{to_player}: {a}",game_id)
+        a = get_player2_action(to_player,f"당신은 {to_player} 입니다. {from_player}의 마지막 질문에 답변하세요",game_id,use_cache=False)
+        game_db[game_id]["log_history"].append(f"{to_player}: {a}")
+        conversation_logging(player_list,f"{to_player}: {a}",game_id,actor=to_player)
         
-    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.",game_id)
+    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.",game_id,kind="talk_end",actor=from_player)
     game_db[game_id]["turn"] += 1
     return f"{to_player}와 {from_player}가 대화를 마쳤습니다."
 
@@ -99,194 +113,606 @@ def get_evidence_info(player: str,evidence: str, game_id: str) -> str:
     player_dict = game_db[game_id]["player_dict"]
     player_list = list(player_dict.keys())
     player_db = game_db[game_id]["player_db"]
-    map_dict = game_db[game_id]["map_dict"]
+    world_map = game_db[game_id]["world"].world_map
     player_position = player_db[player]['position']
-    evidence_list = list(map_dict[player_position].keys())
-    if evidence in evidence_list:
+    if world_map.has_evidence(player_position, evidence):
         game_db[game_id]["turn"] += 1
 
-        conversation_logging(player_list,f"{player}이(가) {player_position}에서 {evidence}를 확인했습니다.",game_id)
-        return f"{{'player':'{player}','evidence':'{evidence}','evidence_info':'{map_dict[player_position][evidence]}'}}"
+        conversation_logging(player_list,f"{player}이(가) {player_position}에서 {evidence}를 확인했습니다.",game_id,kind="evidence",actor=player)
+        return f"{{'player':'{player}','evidence':'{evidence}','evidence_info':'{world_map.evidence_info(player_position, evidence)}'}}"
     else:
-        return f"{{'error':'{evidence}가 {', '.join(evidence_list)} 중에 없습니다. 정확한 증거품 명을 입력하세요.'}}"
+        return f"{{'error':'{evidence}가 {', '.join(world_map.evidences(player_position))} 중에 없습니다. 정확한 증거품 명을 입력하세요.'}}"
 
 
  # -------------------------------------
 # 5. Game manage Agent 설정
 # -------------------------------------
-llm = ChatVertexAI(model_name="gemini-2.0-flash-001", temperature=0.5)
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "1") == "1"
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", "600")),
+    db_path=os.environ.get("RESPONSE_CACHE_DB") or None,  # 지정하면 재시작 후에도 남는 SQLite 계층을 사용
+    disk_max_entries=int(os.environ.get("RESPONSE_CACHE_DISK_MAX_ENTRIES", "65536")),
+)
+
+def configure_gamemanager_llm(model):
+    if RESPONSE_CACHE:
+        # 스트리밍 호출은 langchain cache를 거치지 않으므로, 출력을 흘려보낼 필요가 없는 게임 매니저는 스트리밍을 끕니다
+        # game_id는 자리표시자로 바꿔 키를 만들므로 같은 스토리의 다른 게임에서 나온 같은 질문도 hit가 됩니다
+        model.cache = LangChainResponseCache(response_cache, placeholder_pattern=GAME_ID_PATTERN)
+        model.disable_streaming = True
+
+# 모델은 처음 필요할 때 만듭니다 (gamemanager_llm(), game_play_llm() 으로 꺼내 씀)
+gamemanager_llm = LazyChatModel(temperature=0.5, configure=configure_gamemanager_llm)
 tools = [move_player, talk_to_player, get_evidence_info]
-def invoke_gamemanager_agent(current_player,user_input,player_list,game_id):
-    map_list = list(game_db[game_id]["map_dict"].keys())
-    sample_evidence = list(game_db[game_id]["map_dict"][map_list[0]].keys())[0]
-    gamemanager_prompt = game_db[game_id]["gamemanager_prompt"]
-    gamemanager_prompt = gamemanager_prompt.replace("{to_player}",player_list[0])
-    gamemanager_prompt = gamemanager_prompt.replace("{from_player}",player_list[1])
-    gamemanager_prompt = gamemanager_prompt.replace("{sample_evidence}",sample_evidence)
-    gamemanager_prompt = gamemanager_prompt.replace("{sample_evidence_info}",game_db[game_id]["map_dict"][map_list[0]][sample_evidence])
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", gamemanager_prompt),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad")
-    ])
-    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+gamemanager_agents = GameManagerAgentCache(gamemanager_llm, tools)
+story_registry = StoryRegistry(check_interval=float(os.environ.get("STORY_CHECK_INTERVAL", "1.0")))
+async def ainvoke_gamemanager_agent(current_player,user_input,player_list,game_id):
+    agent_executor = gamemanager_agents.get(game_db[game_id]["gamemanager_agent_key"])
     
     player_db = game_db[game_id]["player_db"]
-    result = agent_executor.invoke({
-        "input": f"{current_player}의 명령: {user_input}, game_id:{game_id}",
-        "player_list":",".join(player_list),
-        "evidence_list":",".join(player_db[current_player]["evidences"])
-    })
+    with tracer.span("gamemanager.agent"):
+        result = await agent_executor.ainvoke({
+            "input": f"{current_player}의 명령: {user_input}, game_id:{game_id}",
+            "player_list":",".join(player_list),
+            "evidence_list":",".join(player_db[current_player]["evidences"])
+        }, config=trace_config())
     return result['output']
 
+# 명확한 명령은 모델 없이 바로 tool을 실행합니다 (INTENT_ROUTER=0 이면 항상 모델 사용)
+INTENT_ROUTER = os.environ.get("INTENT_ROUTER", "1") == "1"
+TOOLS_BY_NAME = {t.name: t for t in tools}
+intent_stats = RouterStats()
+
+async def aroute_command(current_player,user_input,player_list,game_id):
+    """fast-path로 처리할 수 있으면 tool을 직접 호출하고, 애매하면 게임 매니저 Agent에게 넘깁니다."""
+    start = time.perf_counter()
+    if INTENT_ROUTER:
+        position = game_db[game_id]["player_db"][current_player]["position"]
+        intent = game_db[game_id]["story"].intent_router.route(current_player, position, user_input)
+        if intent is not None:
+            with tracer.span("router.fast", route="fast", intent=intent.tool):
+                result = await TOOLS_BY_NAME[intent.tool].ainvoke({**intent.args, "game_id": game_id}, config=trace_config())
+            intent_stats.record_fast(intent.tool, time.perf_counter() - start)
+            return result
+    with tracer.span("router.agent", route="agent"):
+        result = await ainvoke_gamemanager_agent(current_player,user_input,player_list,game_id)
+    intent_stats.record_agent(time.perf_counter() - start)
+    return result
+
 # -------------------------------------
 # 6. Game play Agent 설정
 # -------------------------------------
-game_play_llm = ChatVertexAI(model_name="gemini-2.0-flash-001", temperature=0.5)
-def get_player2_action(player,next_action,game_id):
-    """게임 정보 기반으로 LLM에게 한 줄의 액션 요청"""
+game_play_llm = LazyChatModel(temperature=0.5)
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "1500"))
+CONTEXT_SUMMARY = os.environ.get("CONTEXT_SUMMARY", "0") == "1"
+def new_context():
+    """플레이어 한 명의 게임 맥락 버퍼. CONTEXT_SUMMARY=1 이면 밀려난 맥락을 모델로 요약합니다."""
+    summarizer = llm_summarizer(game_play_llm()) if CONTEXT_SUMMARY else None
+    return ConversationContext(max_tokens=CONTEXT_MAX_TOKENS, summarizer=summarizer)
+
+def build_player_prompt(player,next_action,game_id,compact=True):
+    """게임 정보 기반으로 NPC에게 보낼 프롬프트를 만듭니다.
+
+    compact=False면 맥락 요약(모델 호출)을 미루고 밀려난 줄을 그대로 넣습니다 (이벤트 루프 위에서 부를 때).
+    """
     player_db = game_db[game_id]["player_db"]
-    map_dict = game_db[game_id]["map_dict"]
     player_dict = game_db[game_id]["player_dict"]
     position = player_db[player]["position"]
-    evidences = list(map_dict[position].keys())  # 해당 장소의 증거들
-    conversation = "\n".join(player_db[player]["conversation_log"])
+    evidences = game_db[game_id]["world"].world_map.evidences(position)  # 해당 장소의 증거들
+    context = game_db[game_id]["context_db"][player]
+    context.extend(game_db[game_id]["event_log"].read_new(player), compact)
+    conversation = context.render()
 
-    player_story = "\n".join(player_dict[player])
+    player_story = game_db[game_id]["story"].player_stories[player]
     game_play_prompt = game_db[game_id]["game_play_prompt"]
     prompt = game_play_prompt.format(
         position=position,
         player = player,
         player_story = player_story,
         evidences=", ".join(evidences),
-        player_list=player_list,
+        player_list=list(player_dict.keys()),
         conversation=conversation,
         next_action=next_action
     )
-    result = game_play_llm.generate([
-        [HumanMessage(content=prompt)]
-    ])
-
-    return result.generations[0][0].text
+    return prompt
+
+async def abuild_player_prompt(player,next_action,game_id):
+    """build_player_prompt의 비동기 버전. 맥락 요약을 이벤트 루프를 막지 않고 기다립니다."""
+    context = game_db[game_id]["context_db"][player]
+    context.extend(game_db[game_id]["event_log"].read_new(player), compact=False)
+    if context.needs_compaction():
+        await context.acompact()
+    return build_player_prompt(player,next_action,game_id,compact=False)
+
+def npc_cache_namespace():
+    model = base_model(game_play_llm())
+    return f"npc:{type(model).__name__}:{model.temperature}"
+
+def cached_player_action(prompt,use_cache):
+    """같은 프롬프트(공백 차이 무시)로 생성한 NPC 응답이 캐시에 있으면 반환합니다.
+
+    대화처럼 매번 다른 말이 나와야 하는 호출은 use_cache=False로 캐시를 건너뜁니다.
+    """
+    if not (RESPONSE_CACHE and use_cache):
+        return None
+    return response_cache.get(prompt_key(prompt, npc_cache_namespace()))
+
+async def acached_player_action(prompt,use_cache):
+    """cached_player_action의 비동기 버전. 디스크(SQLite) 조회는 이벤트 루프 밖에서 합니다."""
+    if not (RESPONSE_CACHE and use_cache):
+        return None
+    return await response_cache.aget(prompt_key(prompt, npc_cache_namespace()))
+
+def store_player_action(prompt,text,use_cache):
+    if RESPONSE_CACHE and use_cache:
+        response_cache.set(prompt_key(prompt, npc_cache_namespace()), text, tokens=estimate_tokens(prompt) + estimate_tokens(text))
+
+def get_player2_action(player,next_action,game_id,use_cache=True):
+    """게임 정보 기반으로 LLM에게 한 줄의 액션 요청"""
+    prompt = build_player_prompt(player,next_action,game_id)
+    with tracer.span("npc.generate", player=player) as span:
+        text = cached_player_action(prompt,use_cache)
+        if text is None:
+            result = game_play_llm().generate([
+                [HumanMessage(content=prompt)]
+            ])
+            text = result.generations[0][0].text
+            store_player_action(prompt,text,use_cache)
+        if tracer.enabled:
+            span.set(tokens_in=estimate_tokens(prompt), tokens_out=estimate_tokens(text))
+    return text
+
+async def agenerate_player_action(prompt,use_cache=True):
+    with tracer.span("npc.generate") as span:
+        text = await acached_player_action(prompt,use_cache)
+        if text is None:
+            result = await game_play_llm().agenerate([
+                [HumanMessage(content=prompt)]
+            ])
+            text = result.generations[0][0].text
+            store_player_action(prompt,text,use_cache)
+        if tracer.enabled:
+            span.set(tokens_in=estimate_tokens(prompt), tokens_out=estimate_tokens(text))
+    return text
+
+STREAM_NPC = os.environ.get("STREAM_NPC", "1") == "1"
+ttft_stats = LatencyStats()
+stream_latency_stats = LatencyStats()
+async def astream_player_action(player,next_action,game_id):
+    """NPC의 답변을 토큰이 도착하는 대로 흘려보냅니다. 지금까지 누적된 텍스트를 yield 합니다.
+
+    게임 로그에는 호출한 쪽이 마지막 텍스트를 한 번만 기록합니다. 첫 토큰까지의 시간(TTFT)과 전체 시간을 기록합니다.
+    """
+    prompt = await abuild_player_prompt(player,next_action,game_id)
+    start = time.perf_counter()
+    if not STREAM_NPC:
+        text = await agenerate_player_action(prompt,use_cache=False)
+        ttft_stats.record(time.perf_counter() - start)
+        stream_latency_stats.record(time.perf_counter() - start)
+        yield text
+        return
+    text = ""
+    with tracer.span("npc.stream", player=player) as span:
+        async for chunk in game_play_llm().astream([HumanMessage(content=prompt)]):
+            if not text:
+                ttft_stats.record(time.perf_counter() - start)
+                span.set(ttft=time.perf_counter() - start)
+            text += chunk.content
+            yield text
+        if tracer.enabled:
+            span.set(tokens_in=estimate_tokens(prompt), tokens_out=estimate_tokens(text))
+    stream_latency_stats.record(time.perf_counter() - start)
+
+async def aget_player2_action(player,next_action,game_id):
+    """get_player2_action의 비동기 버전. 모델 풀(동시 호출 수, 속도 제한) 안에서 모델을 기다립니다."""
+    prompt = await abuild_player_prompt(player,next_action,game_id)
+    return await agenerate_player_action(prompt)
+
+def get_players_actions(requests,game_id):
+    """[(player, next_action), ...] 에 대한 NPC 행동을 한 번에 요청합니다.
+
+    프롬프트는 모두 같은 게임 상태에서 먼저 만들고, 모델 호출은 batch로 동시에 보내므로
+    걸리는 시간이 호출 수의 합이 아니라 가장 느린 호출 하나 정도가 됩니다. 결과는 requests 순서를 따릅니다.
+    """
+    prompts = [build_player_prompt(player,next_action,game_id) for player, next_action in requests]
+    texts = [cached_player_action(prompt,True) for prompt in prompts]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    results = game_play_llm().batch(
+        [[HumanMessage(content=prompts[i])] for i in missing],
+        config={"max_concurrency": LLM_MAX_CONCURRENCY}
+    ) if missing else []
+    for i, result in zip(missing, results):
+        texts[i] = result.content
+        store_player_action(prompts[i],texts[i],True)
+    return texts
+
+async def aget_players_actions(requests,game_id):
+    """get_players_actions의 비동기 버전. 각 호출은 모델 풀의 동시 호출 수와 속도 제한을 따릅니다."""
+    prompts = await asyncio.gather(*(abuild_player_prompt(player,next_action,game_id) for player, next_action in requests))
+    return await asyncio.gather(*(agenerate_player_action(prompt) for prompt in prompts))
+
+SPECULATIVE_NPC = os.environ.get("SPECULATIVE_NPC", "1") == "1"
+NEXT_ACTION = "다음 행동을 선택하세요"
+speculation = SpeculativeScheduler()
+def game_state_fingerprint(game_id):
+    """미리 생성한 NPC 행동을 그대로 써도 되는지 판단하는 게임 상태 요약값"""
+    return (game_db[game_id]["turn"], len(game_db[game_id]["event_log"]))
+
+def schedule_next_action(game_id):
+    """턴이 끝난 뒤 다음 차례가 NPC라면, 사람이 [다음 턴]을 누르기 전에 그 NPC의 행동을 미리 생성하기 시작합니다."""
+    if not SPECULATIVE_NPC or game_db[game_id]["conversation_db"]["person_conv"]:
+        return
+    player_list = list(game_db[game_id]["player_dict"].keys())
+    next_player = player_list[game_db[game_id]["turn"] % len(player_list)]
+    if next_player == game_db[game_id].get("person_player"):
+        return
+    # 핸들러(이벤트 루프) 안에서 부르므로 요약은 다음 abuild_player_prompt로 미룹니다
+    prompt = build_player_prompt(next_player,NEXT_ACTION,game_id,compact=False)
+    speculation.prefetch(game_id, next_player, game_state_fingerprint(game_id), lambda: prefetch_player_action(prompt))
+
+async def prefetch_player_action(prompt):
+    # 사람이 기다리지 않는 호출이므로, 모델 풀이 붐비면 사람이 기다리는 호출에 먼저 자리를 내줍니다
+    with model_priority(BACKGROUND):
+        return await agenerate_player_action(prompt)
+
+async def anext_player_action(player,game_id):
+    """미리 생성한 행동이 유효하면 사용하고, 없거나 그 사이 게임 상태가 바뀌었으면 지금 생성합니다."""
+    action = await speculation.take(game_id, player, game_state_fingerprint(game_id))
+    if action is None:
+        action = await aget_player2_action(player,NEXT_ACTION,game_id)
+    return action
+
+# 스토리에서 다시 만들 수 있는 값. 세션을 디스크로 내보낼 때 빼고, 되돌릴 때 스토리 레지스트리에서 다시 채웁니다
+STORY_DERIVED_KEYS = ("story", "player_dict", "map_dict", "game_play_prompt", "gamemanager_agent_key", "world")
+def serialize_session(game_id, session):
+    """세션을 pickle 가능한 상태로 만듭니다 (세션 저장소 spill, 스냅샷)."""
+    state = {key: value for key, value in session.items() if key not in STORY_DERIVED_KEYS}
+    # 요약 함수(summarizer)는 모델을 물고 있으므로 빼고 저장합니다
+    state["context_db"] = {
+        player: {key: value for key, value in vars(context).items() if key != "summarizer"}
+        for player, context in session["context_db"].items()
+    }
+    return state
+
+def restore_session(game_id, state):
+    """디스크에서 읽은 세션에 스토리 값을 다시 채웁니다."""
+    story = story_registry.get(state["story_name"])
+    session = dict(state)
+    context_db = {}
+    for player, context_state in state["context_db"].items():
+        context_db[player] = new_context()
+        vars(context_db[player]).update(context_state)
+    session["context_db"] = context_db
+    session["event_log"].listener = game_logger.event_listener(game_id)
+    session["story"] = story
+    session["player_dict"] = story.player_dict
+    session["map_dict"] = story.map_dict
+    session["game_play_prompt"] = story.game_play_prompt
+    session["gamemanager_agent_key"] = gamemanager_agents.prepare_rendered(state["story_name"], story.gamemanager_prompt)
+    session["world"] = WorldIndex.from_positions(story.world, {player: info["position"] for player, info in state["player_db"].items()})
+    return session
+
+# 게임마다 스냅샷 + 턴별 저널을 남겨 서버가 재시작돼도 game_id로 이어서 할 수 있게 합니다
+SNAPSHOTS = os.environ.get("SNAPSHOTS", "1") == "1"
+snapshots = SnapshotStore(
+    directory=os.environ.get("SNAPSHOT_DIR", "snapshots"),
+    snapshot_every=int(os.environ.get("SNAPSHOT_EVERY", "20")),
+    fsync=os.environ.get("SNAPSHOT_FSYNC", "0") == "1",
+    serialize=serialize_session,
+    restore=restore_session,
+)
+
+def checkpoint(game_id):
+    """핸들러가 응답하기 전에 이번 요청의 변경분을 저널에 남깁니다."""
+    if SNAPSHOTS:
+        snapshots.checkpoint(game_id, game_db[game_id])
+
+def restore_snapshot(game_id):
+    return snapshots.restore(game_id) if SNAPSHOTS and is_game_id(game_id) else None
+
+def save_game_log(game_id, session):
+    """끝난 게임을 logs/에 남기고 스냅샷을 지웁니다. 파일 쓰기라서 핸들러는 asyncio.to_thread로 부릅니다."""
+    with open(f"logs/{game_id}.json","w") as f:
+        json.dump(session, f, indent=4, ensure_ascii=False)
+    snapshots.discard(game_id)
+
+# 여러 워커 프로세스로 띄울 때 게임 상태를 공유하는 저장소 (STATE_BACKEND). 없으면 이 프로세스의 game_db만 씁니다
+state_backend = state_backend_from_env()
+# game_id -> 이 워커가 마지막으로 읽거나 올린 version. 최근 STATE_VERSIONS_MAX 게임까지 기억하고, 잊은 게임은 다음 요청에서 새로 읽습니다.
+# 메모리에 둘 세션 수(SESSION_MAX_RESIDENT)와 따로 둡니다. 항목 하나가 수십 바이트이므로 진행 중인 게임 전체보다 크게 잡습니다
+state_versions = OrderedDict()
+STATE_VERSIONS_MAX = int(os.environ.get("STATE_VERSIONS_MAX", "100000"))
+
+def remember_version(game_id, version):
+    state_versions[game_id] = version
+    state_versions.move_to_end(game_id)
+    while len(state_versions) > STATE_VERSIONS_MAX:
+        state_versions.popitem(last=False)
+
+def publish_session(game_id):
+    """이 워커의 세션을 공유 저장소에 올립니다. 끝나서 지워진 게임은 저장소에서도 지웁니다."""
+    if game_id in game_db:
+        blob = zlib.compress(pickle.dumps(serialize_session(game_id, game_db[game_id]), protocol=pickle.HIGHEST_PROTOCOL))
+        remember_version(game_id, state_backend.save(game_id, blob))
+    else:
+        state_backend.delete(game_id)
+        state_versions.pop(game_id, None)
+
+def sync_session(game_id):
+    """공유 저장소의 version이 이 워커가 가진 것과 다르면(다른 워커가 처리했으면) 새로 읽어 game_db에 올립니다."""
+    version = state_backend.version(game_id)
+    if version is None:
+        # 다른 워커에서 끝난 게임
+        if state_versions.pop(game_id, None) is not None and game_id in game_db:
+            del game_db[game_id]
+        return
+    if state_versions.get(game_id) == version and game_id in game_db:
+        return
+    version, blob = state_backend.load(game_id)
+    game_db[game_id] = restore_session(game_id, pickle.loads(zlib.decompress(blob)))
+    remember_version(game_id, version)
+
+def reload_session(game_id):
+    """이 워커의 세션을 버리고 공유 저장소의 마지막 상태를 다시 읽습니다. 한 번도 올리지 않은 게임이면 버리기만 합니다."""
+    state_versions.pop(game_id, None)
+    speculation.discard(game_id)  # 반쯤 바뀐 상태에서 시작한 추측
+    if game_id in game_db:
+        del game_db[game_id]
+    sync_session(game_id)
+
+# 같은 게임의 핸들러는 한 번에 하나씩 (GAME_LOCKS=0 이면 끕니다. 동시성 부하 테스트의 비교용)
+GAME_LOCKS = os.environ.get("GAME_LOCKS", "1") == "1"
+game_locks = GameLockRegistry()
+
+@contextlib.asynccontextmanager
+async def game_state(game_id, write=True):
+    """게임을 잠그고 최신 상태로 맞춘 뒤 실행하고, 성공하면 공유 저장소에 올립니다(write=False면 읽기만).
+    핸들러가 실패하면 반쯤 바뀐 세션을 올리지 않고 공유 저장소의 마지막 상태로 되돌립니다.
+
+    같은 프로세스 안에서는 게임별 asyncio.Lock으로 먼저 줄을 세우고, 백엔드가 있으면 프로세스 간 잠금을 추가로 잡습니다.
+    처리하는 동안은 세션 저장소가 이 게임을 디스크로 내보내지 않도록 붙잡아 둡니다 (모델 응답이 늦어도).
+    """
+    with game_db.pinned(game_id) if isinstance(game_db, SessionStore) else contextlib.nullcontext():
+        if isinstance(game_db, SessionStore):
+            await game_db.aload(game_id)  # 디스크로 내보낸 게임이면 이벤트 루프 밖에서 되돌려 둡니다
+        async with game_locks.hold(game_id) if GAME_LOCKS else contextlib.nullcontext():
+            if state_backend is None:
+                yield
+                return
+            async with state_backend.lock(game_id) as lease:
+                sync_session(game_id)
+                try:
+                    yield
+                except BaseException:
+                    if write:
+                        reload_session(game_id)
+                    raise
+                if write:
+                    lease.check()  # 잠금이 만료되어 다른 워커가 가져갔으면 올리지 않습니다 (LockLost)
+                    publish_session(game_id)
+
+stale_events = 0
+def accept_action(game_id, turn_token):
+    """화면이 보고 있던 turn_token이 지금 게임의 것과 같을 때만 처리하고 토큰을 올립니다.
+
+    더블 클릭이나 큐 재시도로 같은 이벤트가 두 번 오면 둘 다 같은 토큰을 들고 오므로, 앞의 것이 처리된 뒤에 온 것은 버립니다.
+    토큰 없이(None) 부르는 쪽(API, 벤치마크)은 항상 처리합니다.
+    """
+    global stale_events
+    session = game_db[game_id]
+    current = session.setdefault("turn_token", 0)
+    if turn_token is not None and turn_token != current:
+        stale_events += 1
+        return False
+    session["turn_token"] = current + 1
+    return True
+
+def current_turn_token(game_id):
+    """이벤트가 끝난 뒤 화면의 turn_token을 게임의 현재 값으로 맞춥니다."""
+    if not game_id or game_id not in game_db:
+        return 0
+    return game_db[game_id].get("turn_token", 0)
+
+log_clients = {}  # game_id → 지금 처리 중인 핸들러를 부른 화면 (게임 잠금 안에서만 바뀝니다)
+
+@contextlib.contextmanager
+def log_client(game_id, client):
+    """이 핸들러의 log_update가 client 화면의 로그 커서를 쓰도록 합니다."""
+    log_clients[game_id] = client
+    try:
+        yield
+    finally:
+        log_clients.pop(game_id, None)
+
+def client_of(request):
+    """Gradio 화면(브라우저 탭)마다 다른 값. API나 벤치마크처럼 request 없이 부르면 None."""
+    return getattr(request, "session_hash", None)
+
+def split_request(args, kwargs):
+    request = kwargs.pop("request", None)
+    rest = []
+    for arg in args:
+        if isinstance(arg, gr.Request):
+            request = arg
+        else:
+            rest.append(arg)
+    return client_of(request), rest
+
+def game_handler(fn):
+    """game_id 인자로 게임을 찾아 핸들러 전체를 game_state 안에서 실행합니다 (스트리밍 핸들러 포함)."""
+    signature = inspect.signature(fn)
+    def game_id_of(args, kwargs):
+        return signature.bind_partial(*args, **kwargs).arguments["game_id"]
+    name = f"handler.{fn.__name__}"
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            client, args = split_request(args, kwargs)
+            game_id = game_id_of(args, kwargs)
+            with tracer.span(name, game_id=game_id) as span:
+                async with game_state(game_id):
+                    trace_turn(span, game_id)
+                    with log_client(game_id, client):
+                        async for update in fn(*args, **kwargs):
+                            yield update
+    else:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            client, args = split_request(args, kwargs)
+            game_id = game_id_of(args, kwargs)
+            with tracer.span(name, game_id=game_id) as span:
+                async with game_state(game_id):
+                    trace_turn(span, game_id)
+                    with log_client(game_id, client):
+                        return await fn(*args, **kwargs)
+    # Gradio가 화면마다 gr.Request를 넣어 주도록 request 인자를 알립니다 (로그 delta 커서를 화면별로 두기 위해)
+    request = inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=None)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request])
+    wrapper.__annotations__ = {**fn.__annotations__, "request": gr.Request}
+    return wrapper
+
+def trace_turn(span, game_id):
+    """핸들러 span에 처리 시작 시점의 턴 번호를 붙입니다 (턴별 분해용)."""
+    if tracer.enabled and game_id in game_db:
+        span.set(turn=game_db[game_id]["turn"])
 
 # -------------------------------------
 # 7. Gradio
 # -------------------------------------
-def select_character(selected, game_id, person_player):
+# 1이면 게임 로그 화면에 지난 응답 이후 추가된 부분만 보냅니다 (0이면 매번 전체)
+LOG_DELTA = os.environ.get("LOG_DELTA", "1") == "1"
+def log_update(game_id, tail=""):
+    """게임 로그 화면(log_delta → output_box)으로 보낼 값. tail은 스트리밍 중인 아직 확정되지 않은 줄입니다."""
+    return game_db[game_id]["log_history"].ui_update(tail, full=not LOG_DELTA, client=log_clients.get(game_id))
+
+@game_handler
+async def select_character(selected, game_id, person_player, turn_token=None):
+    if not accept_action(game_id, turn_token):
+        return gr.update(), gr.update(), game_db[game_id].get("person_player") or "", gr.update(), gr.update(), gr.update()
     player_dict = game_db[game_id]["player_dict"]
     player_list = list(player_dict.keys())
     person_player = selected
-    description = "\n".join(player_dict[person_player])
-    game_db[game_id]["log_history"] += f"'{selected}' 캐릭터로 게임을 시작합니다.\n<{person_player}의 비밀 정보>\n{description}\n"
+    description = game_db[game_id]["story"].player_stories[person_player]
+    game_db[game_id]["log_history"].append(f"'{selected}' 캐릭터로 게임을 시작합니다.\n<{person_player}의 비밀 정보>\n{description}\n")
     
     current_player = player_list[game_db[game_id]["turn"] % len(player_list)]
-    game_db[game_id]["log_history"] += f"\n[{current_player}의 턴 시작]\n"
+    game_db[game_id]["log_history"].append(f"\n[{current_player}의 턴 시작]\n")
     if current_player == person_player:
-        game_db[game_id]["log_history"] + "\n명령을 입력하고 [다음 턴]을 누르세요."
+        game_db[game_id]["log_history"].append("\n명령을 입력하고 [다음 턴]을 누르세요.")
     game_db[game_id]["person_player"] = person_player
-    return game_db[game_id]["log_history"], gr.update(visible=(current_player == person_player)), person_player, gr.update(visible=False), gr.update(visible=False), gr.update(visible=True)
-
-def advance_turn(user_input, game_id, current_player, person_player):
+    schedule_next_action(game_id)
+    checkpoint(game_id)
+    return log_update(game_id), gr.update(visible=(current_player == person_player)), person_player, gr.update(visible=False), gr.update(visible=False), gr.update(visible=True)
+
+@game_handler
+async def advance_turn(user_input, game_id, current_player, person_player, conversation_seq=0, turn_token=None):
+    if not accept_action(game_id, turn_token):
+        return gr.update(), gr.update(), current_player, person_player, gr.update()
     player_dict = game_db[game_id]["player_dict"]
     player_list = list(player_dict.keys())
     current_player = player_list[game_db[game_id]["turn"] % len(player_list)]
     
     
     if current_player == person_player:
-        game_db[game_id]["log_history"] += f"{current_player}의 명령: {user_input}\n"
+        game_db[game_id]["log_history"].append(f"{current_player}의 명령: {user_input}\n")
         result = f"(에이전트 응답 예시)"
     else:
         # LLM으로부터 명령 생성
-        user_input = get_player2_action(current_player,"다음 행동을 선택하세요",game_id)
-        game_db[game_id]["log_history"] += f"{current_player}의 명령: {user_input}\n"
+        user_input = await anext_player_action(current_player,game_id)
+        game_db[game_id]["log_history"].append(f"{current_player}의 명령: {user_input}\n")
         result = f"(에이전트 응답 예시)"
         
-    result = invoke_gamemanager_agent(current_player,user_input,player_list,game_id)
+    game_logger.log(game_id, "command", current_player, game_db[game_id]["turn"], user_input)
+    result = await aroute_command(current_player,user_input,player_list,game_id)
+    game_logger.log(game_id, "result", current_player, game_db[game_id]["turn"], result)
         
     next_player = player_list[(game_db[game_id]["turn"]) % len(player_list)]
 
     if game_db[game_id]["conversation_db"]["person_conv"]:
         from_player = game_db[game_id]["conversation_db"]["from_player"]
         to_player = game_db[game_id]["conversation_db"]["to_player"]
-        game_db[game_id]["log_history"] += f"{to_player}와 {from_player}가 대화를 시작했습니다 '대화창'에서 대화를 시작하세요"
-        conversation_trigger.value += 1
-        return game_db[game_id]["log_history"], gr.update(visible=(next_player == person_player),value=""), current_player, person_player, gr.update(value=conversation_trigger.value)
+        game_db[game_id]["log_history"].append(f"{to_player}와 {from_player}가 대화를 시작했습니다 '대화창'에서 대화를 시작하세요")
+        checkpoint(game_id)
+        # 대화창 트리거 값은 브라우저 세션마다 따로 두고 1씩 올려 change 이벤트를 냅니다
+        return log_update(game_id), gr.update(visible=(next_player == person_player),value=""), current_player, person_player, gr.update(value=conversation_seq + 1)
 
     if person_player == next_player:
-        game_db[game_id]["log_history"] + "\n명령을 입력하고 [다음 턴]을 누르세요."
+        game_db[game_id]["log_history"].append("\n명령을 입력하고 [다음 턴]을 누르세요.")
     
-    game_db[game_id]["log_history"] += f"결과: {result}\n"
-    game_db[game_id]["log_history"] += f"\n[{next_player}의 턴 시작]\n"
-    return game_db[game_id]["log_history"], gr.update(visible=(next_player == person_player),value=""), current_player, person_player, gr.update()
-
-def game_start(story_name):
-    with open(f"storys/{story_name}/private_story.json") as f:
-        player_dict = json.load(f)
-        player_list = list(player_dict.keys())
-        
-    with open(f"storys/{story_name}/map.json") as f:
-        map_dict = json.load(f)
-        map_list = list(map_dict.keys())
-
-    with open(f"storys/{story_name}/story.txt") as f:
-        game_story_list = f.readlines()
-        game_story_prompt = "\n".join(game_story_list)
-        
-    with open(f"gamemanager_prompt.txt") as f:
-        gamemanager_prompt_list = f.readlines()
-        gamemanager_prompt = "\n".join(gamemanager_prompt_list)
+    game_db[game_id]["log_history"].append(f"결과: {result}\n")
+    game_db[game_id]["log_history"].append(f"\n[{next_player}의 턴 시작]\n")
+    schedule_next_action(game_id)
+    checkpoint(game_id)
+    return log_update(game_id), gr.update(visible=(next_player == person_player),value=""), current_player, person_player, gr.update()
+
+def create_game(story_name):
+    """새 게임 세션을 만들어 game_db에 넣고 game_id를 돌려줍니다. 스냅샷과 공유 저장소에는 아직 올리지 않습니다."""
+    story = story_registry.get(story_name)
+    player_list = list(story.player_list)
+    map_list = story.map_list
+    world = WorldIndex(story.world, player_list, map_list[0])
 
     player_db = {
         name: {
             "position": map_list[0],
-            "talkable":player_list,
-            "evidences":list(map_dict[map_list[0]].keys()),
-            "conversation_log":[]
+            "talkable":world.talkable(name),
+            "evidences":list(story.world.evidences(map_list[0])),
         }
         for name in player_list
     }
     
-    with open("character_system_prompt.txt") as f:
-        prompt_list = f.readlines()
-        character_system_prompt = "\n".join(prompt_list)
-        character_system_prompt = character_system_prompt.replace("{game_story}",game_story_prompt)
-        character_system_prompt = character_system_prompt.replace("{player_list}",",".join(player_list))
-        character_system_prompt = character_system_prompt.replace("{map_list}",",".join(map_list))
-    game_play_prompt = ChatPromptTemplate.from_messages([
-        ("system", 
-        character_system_prompt),
-        ("human", """다음은 현재게임의 정보 및 대화 맥락입니다:
-    - 나의 현재위치: {position}
-    - 이 장소에 있는 증거들: {evidences}
-    - 대화 가능한 캐릭터 목록: {player_list}
-    - 게임 맥락:{conversation}
-
-    다음 지시에 따릅니다:{next_action}
-    """),
-    ])
-    
     game_start_time = datetime.today().strftime("%Y%m%d%H%M%S")
     game_id = f"{game_start_time}_{uuid.uuid4()}"
-    game_db[game_id] = {}
-    game_db[game_id]["player_db"] = player_db
-    game_db[game_id]["player_dict"] = player_dict
-    game_db[game_id]["map_dict"] = map_dict
-    game_db[game_id]["turn"] = 0
-    game_db[game_id]["log_history"] = ""
-    game_db[game_id]["gamemanager_prompt"] = gamemanager_prompt
-    game_db[game_id]["game_play_prompt"] = game_play_prompt
-    game_db[game_id]["conversation_db"]={
-        "person_conv":False,
-        "person_player":None,
-        "from_player":None,
-        "to_player":None,
-        "turn":0
+    # 세션을 다 만든 뒤 한 번에 넣습니다. 넣는 도중의 반쪽 세션을 spill이나 스냅샷이 보면 KeyError가 납니다
+    game_db[game_id] = {
+        "player_db": player_db,
+        "event_log": EventLog(player_list, listener=game_logger.event_listener(game_id)),
+        "world": world,
+        "context_db": {name: new_context() for name in player_list},
+        "story_name": story_name,
+        "story": story,
+        "player_dict": story.player_dict,
+        "map_dict": story.map_dict,
+        "turn": 0,
+        "turn_token": 0,
+        "log_history": ChunkedLog(),
+        "gamemanager_agent_key": gamemanager_agents.prepare_rendered(story_name, story.gamemanager_prompt),
+        "game_play_prompt": story.game_play_prompt,
+        "conversation_db": {
+            "person_conv":False,
+            "person_player":None,
+            "from_player":None,
+            "to_player":None,
+            "turn":0
+        },
     }
-    
-    return game_id, player_list, gr.update(value=game_story_prompt,visible=True), gr.update(choices=player_list,value=player_list[0]), gr.update(visible=False), gr.update(visible=True)
+    game_logger.log(game_id, "game_start", text=story_name, players=player_list)
+    return game_id
+
+def game_start_screen(game_id):
+    story = game_db[game_id]["story"]
+    player_list = list(story.player_list)
+    return game_id, player_list, gr.update(value=story.game_story_prompt,visible=True), gr.update(choices=player_list,value=player_list[0]), gr.update(visible=False), gr.update(visible=True)
 
-def conversation_start(game_id,conv_text):
+async def agame_start(story_name):
+    """게임을 만들고(스토리 컴파일 등은 스레드에서) 게임 잠금 안에서 스냅샷을 남긴 뒤 공유 저장소에 올립니다."""
+    game_id = await asyncio.to_thread(create_game, story_name)
+    async with game_state(game_id):  # 나갈 때 publish_session
+        await asyncio.to_thread(checkpoint, game_id)
+    return game_start_screen(game_id)
+
+def game_start(story_name):
+    """agame_start의 동기 버전 (벤치마크, 스크립트). 공유 저장소 없이 한 프로세스에서 쓸 때용입니다."""
+    game_id = create_game(story_name)
+    checkpoint(game_id)
+    if state_backend is not None:
+        publish_session(game_id)
+    return game_start_screen(game_id)
+
+@game_handler
+async def conversation_start(game_id,conv_text):
     player_dict = game_db[game_id]["player_dict"]
     player_list = list(player_dict.keys())
     person_player = game_db[game_id]["conversation_db"]["person_player"]
@@ -295,11 +721,14 @@ def conversation_start(game_id,conv_text):
     if person_player == from_player:
         conv_text = f"{to_player}에게 질문하세요 \n\n"
     elif person_player != from_player:
-        q = get_player2_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id)
+        q = ""
+        async for q in astream_player_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id):
+            yield gr.update(visible=False), gr.update(visible=True), f"{from_player}: {q}", log_update(game_id, tail=f"{from_player}: {q}")
         conv_text = f"{from_player}: {q}"
-        game_db[game_id]["log_history"] += f"{from_player}: {q}"
-        conversation_logging(player_list,f"{from_player}: {q}",game_id)
-    return gr.update(visible=False), gr.update(visible=True), conv_text
+        game_db[game_id]["log_history"].append(f"{from_player}: {q}")
+        conversation_logging(player_list,f"{from_player}: {q}",game_id,actor=from_player)
+    checkpoint(game_id)
+    yield gr.update(visible=False), gr.update(visible=True), conv_text, log_update(game_id)
 
 def end_converstion(game_id,to_player,from_player):
     player_dict = game_db[game_id]["player_dict"]
@@ -309,13 +738,19 @@ def end_converstion(game_id,to_player,from_player):
     game_db[game_id]["conversation_db"]["person_conv"] = False
     next_player = player_list[(game_db[game_id]["turn"]) % len(player_list)]
 
-    game_db[game_id]["log_history"] += f"\n{to_player}와 {from_player}가 대화를 마쳤습니다.\n"
-    game_db[game_id]["log_history"] += f"\n[{next_player}의 턴 시작]\n"
-    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.",game_id)
+    game_db[game_id]["log_history"].append(f"\n{to_player}와 {from_player}가 대화를 마쳤습니다.\n")
+    game_db[game_id]["log_history"].append(f"\n[{next_player}의 턴 시작]\n")
+    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.",game_id,kind="talk_end",actor=from_player)
+    schedule_next_action(game_id)
+    checkpoint(game_id)
     
-    return gr.update(visible=True), gr.update(visible=False), gr.update(value=""), conv_text, game_db[game_id]["log_history"], gr.update(visible=(next_player == person_player),value="")
+    return gr.update(visible=True), gr.update(visible=False), gr.update(value=""), conv_text, log_update(game_id), gr.update(visible=(next_player == person_player),value="")
 
-def conversation_processing(game_id,conv_text,conv_input):
+@game_handler
+async def conversation_processing(game_id,conv_text,conv_input,turn_token=None):
+    if not accept_action(game_id, turn_token):
+        yield gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+        return
     player_dict = game_db[game_id]["player_dict"]
     player_list = list(player_dict.keys())
     person_player = game_db[game_id]["conversation_db"]["person_player"]
@@ -323,60 +758,130 @@ def conversation_processing(game_id,conv_text,conv_input):
     to_player = game_db[game_id]["conversation_db"]["to_player"]
     if from_player == person_player:
         q = conv_input
-        game_db[game_id]["log_history"] += f"{from_player}: {q}"
+        game_db[game_id]["log_history"].append(f"{from_player}: {q}")
         conv_text += f"{from_player}: {q}"
-        conversation_logging(player_list,f"{from_player}: {q}",game_id)
-        a = get_player2_action(to_player,f"당신은 {to_player} 입니다. {from_player}의 마지막 질문에 답변하세요",game_id)
-        game_db[game_id]["log_history"] += f"{to_player}: {a}"
+        conversation_logging(player_list,f"{from_player}: {q}",game_id,actor=from_player)
+        a = ""
+        async for a in astream_player_action(to_player,f"당신은 {to_player} 입니다. {from_player}의 마지막 질문에 답변하세요",game_id):
+            yield gr.update(visible=False), gr.update(visible=True), gr.update(value=""), conv_text + f"{to_player}: {a}", log_update(game_id, tail=f"{to_player}: {a}"), gr.update()
+        game_db[game_id]["log_history"].append(f"{to_player}: {a}")
         conv_text += f"{to_player}: {a}"
-        conversation_logging(player_list,f"{to_player}: {a}",game_id)
+        conversation_logging(player_list,f"{to_player}: {a}",game_id,actor=to_player)
         game_db[game_id]["conversation_db"]["turn"] += 1
         if game_db[game_id]["conversation_db"]["turn"] >= 3:
-            return end_converstion(game_id,to_player,from_player)
+            yield end_converstion(game_id,to_player,from_player)
+            return
         
     else:
         a = conv_input
-        game_db[game_id]["log_history"] += f"{to_player}: {a}"
+        game_db[game_id]["log_history"].append(f"{to_player}: {a}")
         conv_text += f"{to_player}: {a}"
-        conversation_logging(player_list,f"{to_player}: {a}",game_id)
+        conversation_logging(player_list,f"{to_player}: {a}",game_id,actor=to_player)
         game_db[game_id]["conversation_db"]["turn"] += 1
         if game_db[game_id]["conversation_db"]["turn"] >= 3:
-            return end_converstion(game_id,to_player,from_player)
-        q = get_player2_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id)
-        game_db[game_id]["log_history"] += f"{from_player}: {q}"
+            yield end_converstion(game_id,to_player,from_player)
+            return
+        q = ""
+        async for q in astream_player_action(from_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요",game_id):
+            yield gr.update(visible=False), gr.update(visible=True), gr.update(value=""), conv_text + f"{from_player}: {q}", log_update(game_id, tail=f"{from_player}: {q}"), gr.update()
+        game_db[game_id]["log_history"].append(f"{from_player}: {q}")
         conv_text += f"{from_player}: {q}"
-        conversation_logging(player_list,f"{from_player}: {q}",game_id)
-
-    return gr.update(visible=False), gr.update(visible=True), gr.update(value=""), conv_text, game_db[game_id]["log_history"], gr.update()
-
-def ending_game(game_id,player_list,person_player):
+        conversation_logging(player_list,f"{from_player}: {q}",game_id,actor=from_player)
+
+    checkpoint(game_id)
+    yield gr.update(visible=False), gr.update(visible=True), gr.update(value=""), conv_text, log_update(game_id), gr.update()
+
+@game_handler
+async def ending_game(game_id,player_list,person_player,vote=""):
+    """vote는 사람 플레이어가 화면에서 고른 가장 의심가는 상대입니다 (게임 잠금을 쥔 채 입력을 기다리지 않도록 미리 받습니다)."""
+    # in 대신 조회로 확인해야 재시작 뒤 스냅샷에서 되살립니다 (다른 핸들러와 같은 경로)
+    if game_db.get(game_id) is None:
+        return gr.update()  # 이미 끝난 게임 (종료 버튼을 두 번 누름)
+    vote = (vote or "").strip()
+    if person_player in player_list and not vote:
+        raise gr.Error("게임을 끝내기 전에 가장 의심가는 상대를 입력하세요.")
+    speculation.discard(game_id)
     fin_result = ""
+    npc_players = [player for player in player_list if player != person_player]
+    npc_results = await aget_players_actions([(player,"가장 의심가는 상대를 선택하시오.") for player in npc_players],game_id)
+    results = dict(zip(npc_players, npc_results))
     for player in player_list:
         if player == person_player:
-            result = input("가장 의심가는 상대를 선택하시오.: ")
+            result = vote
+            results[player] = result
         else:
-            result = get_player2_action(player,"가장 의심가는 상대를 선택하시오.",game_id)
+            result = results[player]
         fin_result += f"{player}의 답변: {result}"
-    game_db[game_id]["log_history"] += fin_result
-    game_db[game_id].pop("gamemanager_prompt")
+    game_db[game_id]["log_history"].append(fin_result)
+    game_logger.log(game_id, "game_end", turn=game_db[game_id]["turn"], results=results)
+    game_db[game_id].pop("gamemanager_agent_key")
     game_db[game_id].pop("game_play_prompt")
-    with open(f"logs/{game_id}.json","w") as f:
-        json.dump(game_db[game_id], f, indent=4, ensure_ascii=False)
-    return game_db[game_id]["log_history"]
+    game_db[game_id].pop("context_db")
+    game_db[game_id].pop("story")
+    game_db[game_id].pop("world")
+    game_db[game_id].pop("checkpoint", None)
+    game_db[game_id]["player_dict"] = thaw(game_db[game_id]["player_dict"])
+    game_db[game_id]["map_dict"] = thaw(game_db[game_id]["map_dict"])
+    game_db[game_id]["event_log"] = game_db[game_id]["event_log"].to_records()
+    update = log_update(game_id)
+    game_db[game_id]["log_history"] = game_db[game_id]["log_history"].text()
+    await asyncio.to_thread(save_game_log, game_id, game_db[game_id])
+    # 끝난 게임은 로그 파일로 남았으므로 세션 저장소에서 지웁니다
+    del game_db[game_id]
+    return update
+
+async def resume_game(resume_id, request: gr.Request = None):
+    """진행 중이거나 스냅샷이 남은 게임을 game_id로 이어서 합니다."""
+    resume_id = resume_id.strip()
+    if not is_game_id(resume_id):
+        raise gr.Error(f"'{resume_id}'은(는) 올바른 game_id가 아닙니다.")
+    async with game_state(resume_id):
+        try:
+            session = game_db[resume_id]
+        except KeyError:
+            raise gr.Error(f"'{resume_id}' 게임을 찾을 수 없습니다.")
+        player_list = list(session["player_dict"].keys())
+        person_player = session.get("person_player") or ""
+        current_player = player_list[session["turn"] % len(player_list)]
+        person_conv = session["conversation_db"]["person_conv"]
+        # 브라우저 로그는 비어 있으므로 전체를 다시 보냅니다
+        update = session["log_history"].ui_update(full=True, client=client_of(request))
+        # 사람이 낀 대화 중이었다면 다음 입력은 항상 사람 차례이므로 대화창을 바로 엽니다
+        return (
+            resume_id, player_list, person_player, update,
+            gr.update(visible=(current_player == person_player), value=""),
+            gr.update(visible=False), gr.update(visible=False), gr.update(visible=True),
+            gr.update(visible=not person_conv), gr.update(visible=person_conv),
+        )
 
 with gr.Blocks() as demo:
-    game_db = {}
+    # 오래 방치된 게임은 디스크로 내보내고, 다시 요청이 오면 되돌립니다.
+    # STATE_BACKEND가 있으면 원본은 거기 있으므로 내보내지 않고 버렸다가 sync_session이 저장소에서 다시 읽습니다
+    # (워커마다 같은 spill 파일을 쓰면 다른 워커가 올린 옛 세션을 최신으로 착각할 수 있습니다)
+    game_db = SessionStore(
+        path=None if state_backend is not None else os.environ.get("SESSION_DB", "sessions.db"),
+        max_resident=int(os.environ.get("SESSION_MAX_RESIDENT", "256")),
+        idle_timeout=float(os.environ.get("SESSION_IDLE_TIMEOUT", "1800")),
+        serialize=serialize_session,
+        restore=restore_session,
+        missing=restore_snapshot,
+        on_evict=speculation.discard,  # 내보낸 게임의 추측은 버립니다 (spill 파일이 없어도)
+    )
     game_id = gr.State("")
     player_list = gr.State([])
     person_player = gr.State("")
     current_player = gr.State("")
+    turn_token = gr.State(0)  # 이 화면이 마지막으로 본 게임의 turn_token (중복 이벤트 판별)
     turn = gr.State(0)
     log_history = gr.State("")
     
     gr.Markdown("## Crime Scene")
     with gr.Row() as story_selector_ui:
-        story_selector = gr.Dropdown(choices=["story1"], label="스토리 종류 선택")
+        story_selector = gr.Dropdown(choices=story_registry.available(), label="스토리 종류 선택")
         game_start_button = gr.Button("게임 시작")
+    with gr.Row() as resume_ui:
+        resume_id = gr.Textbox(label="이어할 게임 ID")
+        resume_button = gr.Button("이어하기")
     game_story_viewer = gr.Textbox(label ="게임 스토리",visible=False)
     
     with gr.Row(visible=False) as char_selector_ui:
@@ -384,7 +889,9 @@ with gr.Blocks() as demo:
         select_button = gr.Button("선택")
     
     with gr.Row(visible=False) as game_processing_ui:
-        output_box = gr.Textbox(label="게임 로그", lines=25, interactive=False)
+        # 서버는 log_delta로 추가분만 보내고, 브라우저에서 output_box 끝에 붙입니다
+        output_box = gr.Textbox(label="게임 로그", lines=25, interactive=False, elem_id="game-log")
+        log_delta = gr.JSON(visible=False)
         with gr.Column() as user_input_ui:
             with gr.Column() as turn_processing_ui:
                 user_input = gr.Textbox(label="당신의 명령", visible=False)
@@ -395,37 +902,104 @@ with gr.Blocks() as demo:
                 conv_input = gr.Textbox(label="대화 입력")
                 conv_button = gr.Button("대화 보내기")
 
-    end_game = gr.Button(value="게임종료")
+    with gr.Row():
+        vote_input = gr.Textbox(label="가장 의심가는 상대 (게임종료 때 제출)")
+        end_game = gr.Button(value="게임종료")
+
+    log_delta.change(None, inputs=[log_delta], outputs=None, js=APPEND_LOG_JS)
 
     conversation_trigger.change(
         conversation_start,
         inputs=[game_id,conv_text],
-        outputs=[turn_processing_ui,conversation_processing_ui,conv_text]
+        outputs=[turn_processing_ui,conversation_processing_ui,conv_text,log_delta]
     )
     conv_button.click(
         conversation_processing,
-        inputs=[game_id,conv_text,conv_input],
-        outputs=[turn_processing_ui,conversation_processing_ui, conv_input,conv_text,output_box,user_input]
-    )
+        inputs=[game_id,conv_text,conv_input,turn_token],
+        outputs=[turn_processing_ui,conversation_processing_ui, conv_input,conv_text,log_delta,user_input]
+    ).then(current_turn_token, inputs=[game_id], outputs=[turn_token])
     game_start_button.click(
-        game_start,
+        agame_start,
         inputs=[story_selector],
         outputs=[game_id, player_list, game_story_viewer, char_selector, story_selector_ui,char_selector_ui]
-    )
+    ).then(current_turn_token, inputs=[game_id], outputs=[turn_token])
     select_button.click(
         select_character, 
-        inputs=[char_selector, game_id, person_player], 
-        outputs=[output_box, user_input, person_player, select_button,char_selector,game_processing_ui]
-    )
+        inputs=[char_selector, game_id, person_player, turn_token], 
+        outputs=[log_delta, user_input, person_player, select_button,char_selector,game_processing_ui]
+    ).then(current_turn_token, inputs=[game_id], outputs=[turn_token])
     next_button.click(
         advance_turn, 
-        inputs=[user_input, game_id, current_player, person_player], 
-        outputs=[output_box, user_input, current_player, person_player,conversation_trigger]
-    )
+        inputs=[user_input, game_id, current_player, person_player, conversation_trigger, turn_token], 
+        outputs=[log_delta, user_input, current_player, person_player,conversation_trigger]
+    ).then(current_turn_token, inputs=[game_id], outputs=[turn_token])
+    resume_button.click(
+        resume_game,
+        inputs=[resume_id],
+        outputs=[game_id, player_list, person_player, log_delta, user_input, story_selector_ui, resume_ui, game_processing_ui, turn_processing_ui, conversation_processing_ui]
+    ).then(current_turn_token, inputs=[game_id], outputs=[turn_token])
     end_game.click(
         ending_game,
-        inputs=[game_id,player_list,person_player],
-        outputs=[output_box]
+        inputs=[game_id,player_list,person_player,vote_input],
+        outputs=[log_delta]
     )
 
-demo.launch()
+# /metrics 에 계측 span과 함께 내보낼 기존 통계
+for prefix, collect in [
+    ("response_cache", response_cache.stats), ("intent_router", intent_stats.summary), ("speculation", speculation.stats),
+    ("sessions", game_db.stats), ("model_pool", lambda: model_pool().stats()), ("game_locks", game_locks.stats), ("snapshots", snapshots.stats), ("game_logger", game_logger.stats),
+]:
+    tracer.add_collector(prefix, collect)
+
+# -------------------------------------
+# 8. 워밍업
+# -------------------------------------
+# 임포트는 가볍게 끝내고, 모델 클라이언트 생성 · 스토리 컴파일 · 스토리별 게임 매니저 Agent 생성은
+# 서버가 뜨는 동안 백그라운드 스레드에서 미리 합니다 (WARMUP=0 이면 첫 게임이 시작될 때 준비).
+# LAZY_INIT=0 이면 예전처럼 임포트 중에 모두 준비합니다 (잘못된 GCP 설정을 기동 시점에 바로 드러내고 싶을 때)
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+LAZY_INIT = os.environ.get("LAZY_INIT", "1") == "1"
+warmup_stats = {"state": "idle", "seconds": None, "stories": 0, "error": None}
+warmup_done = threading.Event()
+
+def warm_up():
+    """두 모델을 만들고, 모든 스토리를 컴파일해 게임 매니저 Agent까지 만들어 둡니다."""
+    start = time.perf_counter()
+    warmup_stats["state"] = "running"
+    try:
+        gamemanager_llm()
+        game_play_llm()
+        for story_name in story_registry.available():
+            story = story_registry.get(story_name)
+            gamemanager_agents.prepare_rendered(story_name, story.gamemanager_prompt)
+            warmup_stats["stories"] += 1
+        warmup_stats["state"] = "done"
+    except Exception as e:
+        # 워밍업이 실패해도 서버는 뜹니다. 같은 준비를 첫 사용 때 다시 시도하고, 그때 오류가 드러납니다
+        if not LAZY_INIT:
+            raise
+        warmup_stats.update(state="failed", error=repr(e))
+    finally:
+        warmup_stats["seconds"] = time.perf_counter() - start
+        warmup_done.set()
+
+def start_warmup():
+    """WARMUP=1 이면 warm_up을 데몬 스레드로 시작합니다. 이미 시작했으면 아무것도 하지 않습니다."""
+    if not WARMUP or warmup_stats["state"] != "idle":
+        return None
+    warmup_stats["state"] = "running"
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+tracer.add_collector("warmup", lambda: {"seconds": warmup_stats["seconds"], "stories": warmup_stats["stories"], "done": int(warmup_done.is_set())})
+if not LAZY_INIT:
+    warm_up()
+
+if __name__ == "__main__":
+    # METRICS_PORT를 주면 /metrics (Prometheus 텍스트)와 /games/{game_id} (턴 분해)를 그 포트로 내보냅니다
+    if os.environ.get("METRICS_PORT"):
+        tracer.serve_metrics(int(os.environ["METRICS_PORT"]))
+    start_warmup()
+    # 핸들러가 비동기이므로 이벤트별 동시 처리 수(기본 1)를 늘려 한 게임이 다른 게임을 막지 않게 합니다
+    demo.queue(default_concurrency_limit=int(os.environ.get("GRADIO_CONCURRENCY", "64"))).launch()
@@ -0,0 +1,169 @@
+# -------------------------------------
+# 명령 fast-path 파서 (게임 매니저 LLM 우회)
+# -------------------------------------
+from collections import Counter
+from typing import NamedTuple
+from metrics import LatencyStats
+import re
+import threading
+
+# 한 명령에 동사 종류가 정확히 하나일 때만 fast-path를 사용합니다
+INTENT_PATTERNS = {
+    "move_player": re.compile(r"이동|(으로|로|에)\s*(가|간|갈|갑|향|들어)"),
+    "talk_to_player": re.compile(r"대화|말\s*(을\s*)?(걸|건)|이야기|얘기|질문|물어|묻"),
+    "get_evidence_info": re.compile(r"확인|살펴|살피|살핀|조사|검사|자세히|읽어|읽는|열어"),
+}
+# 부정('안 해', '않는다')/의문이 섞인 명령은 모델에게 맡깁니다
+UNSURE_PATTERN = re.compile(r"않|(?:^|\s)안(?:\s|$)|말고|지\s*마|못|\?")
+NORMALIZE_PATTERN = re.compile(r"[^0-9a-z가-힣]")
+
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+
+
+def normalize(text):
+    """소문자로 바꾸고 공백/문장부호를 지웁니다."""
+    return NORMALIZE_PATTERN.sub("", text.lower())
+
+
+def jamo(text):
+    """완성형 한글을 초성/중성/종성 자모로 풀어 씁니다. 오타 한 글자가 유사도를 통째로 깎지 않게 합니다."""
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            code -= HANGUL_BASE
+            out.append(chr(0x1100 + code // 588))
+            out.append(chr(0x1161 + (code % 588) // 28))
+            if code % 28:
+                out.append(chr(0x11A7 + code % 28))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class Intent(NamedTuple):
+    tool: str
+    args: dict
+    score: float
+
+
+class Vocabulary:
+    """스토리 어휘(장소/플레이어/증거) 하나. 자모 bigram 역색인으로 후보만 점수를 매깁니다."""
+
+    def __init__(self, terms, min_fuzzy_bigrams=6):
+        self.terms = tuple(terms)
+        self.normalized = {term: normalize(term) for term in self.terms}
+        self.grams = {term: bigrams(jamo(self.normalized[term])) for term in self.terms}
+        self.min_fuzzy_bigrams = min_fuzzy_bigrams
+        self.index = {}
+        for term, grams in self.grams.items():
+            for gram in grams:
+                self.index.setdefault(gram, []).append(term)
+
+    def match(self, text, text_grams, min_score, margin, exclude=()):
+        """(term, score) 또는 None. 정확히 포함된 어휘가 우선이고, 없으면 자모 bigram 포함률로 고릅니다."""
+        exact = [term for term in self.terms if term not in exclude and self.normalized[term] and self.normalized[term] in text]
+        # '피아노'처럼 더 긴 어휘에 포함된 짧은 어휘는 후보에서 뺍니다
+        exact = [term for term in exact if not any(term != other and self.normalized[term] in self.normalized[other] for other in exact)]
+        if len(exact) == 1:
+            return exact[0], 1.0
+        if exact:
+            return None
+
+        counts = Counter(term for gram in text_grams for term in self.index.get(gram, ()))
+        scored = sorted(
+            (
+                (count / len(self.grams[term]), term)
+                for term, count in counts.items()
+                if term not in exclude and len(self.grams[term]) >= self.min_fuzzy_bigrams
+            ),
+            reverse=True,
+        )
+        if not scored or scored[0][0] < min_score:
+            return None
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < margin:
+            return None
+        return scored[0][1], scored[0][0]
+
+
+class IntentRouter:
+    """'미술실로 이동', '플롯케이스 확인' 같은 명확한 명령을 tool 호출로 바로 바꿉니다. 애매하면 None."""
+
+    def __init__(self, player_list, world_map, min_score=0.8, margin=0.1):
+        self.min_score = min_score
+        self.margin = margin
+        self.players = Vocabulary(player_list)
+        self.locations = Vocabulary(world_map.location_list)
+        self.evidences = {location: Vocabulary(world_map.evidences(location)) for location in world_map.location_list}
+
+    def route(self, player, position, command):
+        if UNSURE_PATTERN.search(command):
+            return None
+        kinds = [kind for kind, pattern in INTENT_PATTERNS.items() if pattern.search(command)]
+        if len(kinds) != 1:
+            return None
+        kind = kinds[0]
+
+        text = normalize(command)
+        text_grams = bigrams(jamo(text))
+        if kind == "move_player":
+            found = self.locations.match(text, text_grams, self.min_score, self.margin)
+            key = "location"
+        elif kind == "talk_to_player":
+            found = self.players.match(text, text_grams, self.min_score, self.margin, exclude=(player,))
+            key = "to_player"
+        else:
+            found = self.evidences[position].match(text, text_grams, self.min_score, self.margin)
+            key = "evidence"
+        if found is None:
+            return None
+
+        term, score = found
+        speaker = "from_player" if kind == "talk_to_player" else "player"
+        return Intent(kind, {speaker: player, key: term}, score)
+
+
+class RouterStats:
+    """fast-path 적중률과 절약한 시간(모델 경로 평균 - fast-path 평균)을 집계합니다."""
+
+    def __init__(self):
+        self.fast = LatencyStats()
+        self.agent = LatencyStats()
+        self.by_tool = Counter()
+        self._lock = threading.Lock()
+
+    def record_fast(self, tool, seconds):
+        self.fast.record(seconds)
+        with self._lock:
+            self.by_tool[tool] += 1
+
+    def record_agent(self, seconds):
+        self.agent.record(seconds)
+
+    def reset(self):
+        self.fast.reset()
+        self.agent.reset()
+        with self._lock:
+            self.by_tool.clear()
+
+    def summary(self):
+        fast = self.fast.summary()
+        agent = self.agent.summary()
+        total = fast["count"] + agent["count"]
+        saved_per_hit = max(agent["mean"] - fast["mean"], 0.0) if agent["count"] else 0.0
+        with self._lock:
+            by_tool = dict(self.by_tool)
+        return {
+            "hits": fast["count"],
+            "fallbacks": agent["count"],
+            "hit_rate": fast["count"] / total if total else 0.0,
+            "by_tool": by_tool,
+            "fast_mean": fast["mean"],
+            "agent_mean": agent["mean"],
+            "saved_seconds": saved_per_hit * fast["count"],
+        }
@@ -0,0 +1,330 @@
+# -------------------------------------
+# LLM 백엔드 선택
+#   LLM_BACKEND=vertex (기본) | fake | http
+#   FAKE_LLM_LATENCY=0.2   fake 백엔드의 인위적인 응답 지연(초)
+#   MODEL_SERVER_URL       http 백엔드가 요청할 서버 (fake_model_server.py 등)
+#   LLM_MAX_CONCURRENCY=16 백엔드별 동시 모델 호출 수 (model_pool.ModelPool)
+# -------------------------------------
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from metrics import LatencyStats
+from model_pool import PooledChatModel, pool_from_env, record_attempt
+from typing import Any, Callable, Optional
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import weakref
+
+VERTEX_MODEL_NAME = "gemini-2.0-flash-001"
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+
+FAKE_RESPONSES = [
+    "미술실로 이동할게",
+    "음악실로 이동할게",
+    "여기 있는 증거를 살펴보고 싶어",
+    "이 증거에 대해 추궁하고 싶어, 대화를 할게",
+    "그날 저녁에는 교실에 있었어. 다른 사람은 보지 못했어.",
+    "그 시간에 어디에 있었는지 말해줄 수 있어?",
+]
+
+
+class ModelCallTimer(BaseCallbackHandler):
+    """백엔드와 상관없이 모델 호출 시작부터 끝까지 걸린 시간을 기록합니다. hedge한 호출은 이긴 시도만 셉니다."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.stats = LatencyStats()
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def _end(self, run_id):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            record_attempt(lambda: self.stats.record(elapsed))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+model_timer = ModelCallTimer()
+
+
+class FakeChatModel(BaseChatModel):
+    """GCP 없이 턴 루프를 프로파일링/부하 테스트하기 위한 결정적인 로컬 모델.
+
+    같은 메시지에는 항상 같은 응답을 돌려줍니다. function_router가 주어지면
+    functions가 바인딩된 호출(게임 매니저 Agent)에서 (tool 이름, 인자) 를 받아 function_call 응답을 만듭니다.
+    """
+
+    responses: list = FAKE_RESPONSES
+    latency: float = 0.0
+    temperature: float = 0.0
+    function_router: Optional[Callable[[list], Any]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages, **kwargs):
+        if self.function_router is not None and kwargs.get("functions"):
+            routed = self.function_router(messages)
+            if routed is not None:
+                name, arguments = routed
+                return AIMessage(content="", additional_kwargs={
+                    "function_call": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}
+                })
+        text = "\n".join(str(m.content) for m in messages)
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        return AIMessage(content=self.responses[int.from_bytes(digest[:4], "big") % len(self.responses)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, **kwargs))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, **kwargs))])
+
+    def _chunks(self, messages, **kwargs):
+        message = self._respond(messages, **kwargs)
+        if message.additional_kwargs:
+            return [AIMessageChunk(content=message.content, additional_kwargs=message.additional_kwargs)]
+        pieces = re.findall(r"\S+\s*", message.content) or [message.content]
+        return [AIMessageChunk(content=piece) for piece in pieces]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        """응답을 단어 단위 청크로 나누고, latency를 청크 수만큼 나눠서 흘려보냅니다."""
+        chunks = self._chunks(messages, **kwargs)
+        for message in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = self._chunks(messages, **kwargs)
+        for message in chunks:
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+
+
+class ModelHTTPError(RuntimeError):
+    """모델 서버가 200이 아닌 응답을 줌. status_code와 Retry-After(초)로 재시도 여부를 판단합니다 (model_pool.is_retryable)."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+_http_clients = weakref.WeakKeyDictionary()
+_sync_http_clients = {}
+_http_lock = threading.Lock()
+
+def http_client(base_url, max_connections):
+    """base_url별 연결 풀(httpx). 비동기 클라이언트는 이벤트 루프에 묶이므로 루프마다 따로 만듭니다."""
+    import httpx
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        with _http_lock:
+            if base_url not in _sync_http_clients:
+                _sync_http_clients[base_url] = httpx.Client(base_url=base_url, limits=limits)
+            return _sync_http_clients[base_url]
+    clients = _http_clients.setdefault(loop, {})
+    if base_url not in clients:
+        clients[base_url] = httpx.AsyncClient(base_url=base_url, limits=limits)
+    return clients[base_url]
+
+
+class HttpChatModel(BaseChatModel):
+    """HTTP 모델 서버에 POST /v1/chat 으로 요청하는 채팅 모델 (fake_model_server.py 와 같은 형식).
+
+    요청은 base_url별 keep-alive 연결 풀을 재사용합니다. 오류 응답은 ModelHTTPError로 올리고, 재시도는 ModelPool이 합니다.
+    """
+
+    base_url: str
+    temperature: float = 0.5
+    timeout: float = 60.0
+    max_connections: int = LLM_MAX_CONCURRENCY * 2
+
+    @property
+    def _llm_type(self) -> str:
+        return "http-chat"
+
+    @property
+    def _identifying_params(self):
+        return {"base_url": self.base_url, "temperature": self.temperature}
+
+    def _payload(self, messages, **kwargs):
+        payload = {
+            "messages": [{"role": message.type, "content": str(message.content)} for message in messages],
+            "temperature": self.temperature,
+        }
+        if kwargs.get("functions"):
+            payload["functions"] = [function["name"] for function in kwargs["functions"]]
+        return payload
+
+    def _result(self, response):
+        if response.status_code != 200:
+            retry_after = response.headers.get("Retry-After")
+            raise ModelHTTPError(response.status_code, response.text[:200], float(retry_after) if retry_after else None)
+        data = response.json()
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=data["content"]))],
+            llm_output={"usage": data.get("usage")},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        client = http_client(self.base_url, self.max_connections)
+        return self._result(client.post("/v1/chat", json=self._payload(messages, **kwargs), timeout=self.timeout))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        client = http_client(self.base_url, self.max_connections)
+        return self._result(await client.post("/v1/chat", json=self._payload(messages, **kwargs), timeout=self.timeout))
+
+
+_vertex_ready = False
+_vertex_lock = threading.Lock()
+
+def init_vertex():
+    """Vertex AI 백엔드를 처음 사용할 때 한 번만 GCP 설정을 합니다."""
+    global _vertex_ready
+    with _vertex_lock:
+        if _vertex_ready:
+            return
+        from google.cloud import aiplatform
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../application_credentials.json"
+        aiplatform.init(project=os.environ["PROJECT_NAME"], location=os.environ["LOCATION"])
+        _vertex_ready = True
+
+
+def _create_vertex_model(temperature):
+    init_vertex()
+    from langchain_google_vertexai import ChatVertexAI
+    # ModelPool로 감쌀 때는 재시도를 풀에 맡깁니다 (클라이언트 재시도까지 겹치면 재시도 횟수가 곱해집니다)
+    retries = {"max_retries": 0} if MODEL_POOL else {}
+    return ChatVertexAI(model_name=VERTEX_MODEL_NAME, temperature=temperature, callbacks=[model_timer], **retries)
+
+
+def _create_fake_model(temperature):
+    return FakeChatModel(
+        temperature=temperature,
+        latency=float(os.environ.get("FAKE_LLM_LATENCY", "0")),
+        callbacks=[model_timer],
+    )
+
+
+def _create_http_model(temperature):
+    return HttpChatModel(
+        base_url=os.environ.get("MODEL_SERVER_URL", "http://127.0.0.1:8123"),
+        temperature=temperature,
+        callbacks=[model_timer],
+    )
+
+
+BACKENDS = {
+    "vertex": _create_vertex_model,
+    "fake": _create_fake_model,
+    "http": _create_http_model,
+}
+
+def register_backend(name, factory):
+    """temperature를 받아 LangChain 채팅 모델을 돌려주는 factory를 백엔드로 등록합니다."""
+    BACKENDS[name] = factory
+
+
+def current_backend():
+    return os.environ.get("LLM_BACKEND", "vertex")
+
+
+MODEL_POOL = os.environ.get("MODEL_POOL", "1") == "1"
+model_pools = {}
+_pools_lock = threading.Lock()
+
+def model_pool(backend=None):
+    """백엔드별로 하나인 ModelPool. 그 백엔드로 만든 모든 모델(게임 매니저, NPC)과 이벤트 루프가 함께 씁니다."""
+    backend = backend or current_backend()
+    with _pools_lock:
+        if backend not in model_pools:
+            model_pools[backend] = pool_from_env(LLM_MAX_CONCURRENCY)
+        return model_pools[backend]
+
+
+def create_chat_model(temperature=0.5, backend=None):
+    """LLM_BACKEND 환경변수(또는 backend 인자)에 맞는 채팅 모델을 생성합니다. MODEL_POOL=1 이면 백엔드의 ModelPool로 감쌉니다."""
+    backend = backend or current_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 LLM_BACKEND: {backend} ({', '.join(BACKENDS)} 중 하나를 사용하세요)")
+    model = BACKENDS[backend](temperature)
+    if not MODEL_POOL:
+        return model
+    return PooledChatModel(inner=model, pool=model_pool(backend))
+
+
+def base_model(model):
+    """ModelPool로 감싼 모델이면 안쪽 모델을 돌려줍니다 (fake 모델의 지연/라우터를 바꾸는 벤치마크, 캐시 namespace)."""
+    return getattr(model, "inner", model)
+
+
+class LazyChatModel:
+    """처음 호출될 때 create_chat_model로 모델을 만들고, 이후에는 같은 객체를 돌려줍니다.
+
+    Vertex AI SDK 임포트와 aiplatform.init은 수 초가 걸리므로 모듈 임포트 시점이 아니라
+    첫 사용(또는 워밍업 스레드)까지 미룹니다. configure(model)은 생성 직후 한 번 실행됩니다.
+    """
+
+    def __init__(self, temperature=0.5, backend=None, configure=None):
+        self.temperature = temperature
+        self.backend = backend
+        self.configure = configure
+        self.create_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = create_chat_model(self.temperature, self.backend)
+                    if self.configure is not None:
+                        self.configure(model)
+                    self.create_seconds = time.perf_counter() - start
+                    self._model = model
+        return self._model
+
+    @property
+    def created(self):
+        return self._model is not None
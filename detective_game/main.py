@@ -2,46 +2,45 @@
 # 1. 라이브러리 임포트
 # -------------------------------------
 from langchain.agents import tool, AgentExecutor, create_openai_functions_agent
-from langchain_google_vertexai import ChatVertexAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema.messages import HumanMessage
-from google.cloud import aiplatform
 import os
 from datetime import datetime
 import uuid
 import json
 import time
 from dotenv import load_dotenv
+from llm_backend import create_chat_model
+from context_buffer import ConversationContext
+from event_log import EventLog
+from game_logger import game_logger_from_env
+from world_index import WorldMap, WorldIndex
+from intent_router import IntentRouter
+from tracing import tracer, trace_config
 
 # -------------------------------------
-# 2. GCP 설정
+# 2. 환경 설정 (GCP 설정은 llm_backend에서 처음 사용할 때 진행)
 # -------------------------------------
 load_dotenv()
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../application_credentials.json"
-aiplatform.init(project=os.environ["PROJECT_NAME"], location=os.environ["LOCATION"])
 
 # -------------------------------------
 # 3. LangChain 툴 정의
 # -------------------------------------
-def conversation_logging(player_list,conversation):
-    for player in player_list:
-        player_db[player]["conversation_log"].append(conversation)
-    game_logging(game_id,conversation)
+def conversation_logging(player_list,conversation, kind="dialogue", actor=None):
+    event_log.append(kind, actor, turn, conversation, visible_to=player_list)
 
 
 @tool
 def move_player(player: str, location: str) -> str:
     """플레이어를 지정된 위치로 이동시킵니다."""
-    print("tool 사용: move_player")
-    if location not in VALID_LOCATIONS:
-        return f"'{location}'은(는) 유효한 장소가 아닙니다. 이동 가능한 장소는 {', '.join(VALID_LOCATIONS)}입니다. 정확한 명칭을 입력해 주세요."
+    if not world_map.is_location(location):
+        return f"'{location}'은(는) 유효한 장소가 아닙니다. 이동 가능한 장소는 {', '.join(world_map.location_list)}입니다. 정확한 명칭을 입력해 주세요."
     player_db[player]["position"] = location
-    position = player_db[player]["position"]
-    talkable = [p for p in player_db if p != player and player_db[p]["position"] == position]
-    evidences = list(map_dict[position].keys())  # 해당 장소의 증거들
-    player_db[player]["talkable"] = talkable
-    player_db[player]["evidences"] = evidences
-    player_db[player]["conversation_log"].append(f"{location}으로 이동했습니다.")
+    # 출발지와 도착지에 있던 플레이어들의 talkable도 함께 갱신합니다
+    for affected in world.move(player, location):
+        player_db[affected]["talkable"] = world.talkable(affected)
+    player_db[player]["evidences"] = list(world_map.evidences(location))  # 해당 장소의 증거들
+    event_log.append("move", player, turn, f"{location}으로 이동했습니다.", visible_to=[player])
     return f"{{'player':'{player}','location':'{location}'}}"
 
 
@@ -49,11 +48,10 @@ def move_player(player: str, location: str) -> str:
 def talk_to_player(from_player: str, to_player: str) -> str:
     """두 플레이어 사이에 대화를 진행 합니다. 명령을 내린 사람이 반드시 from_player가 되어야 합니다."""
     global turn
-    print("tool 사용: talk_to_player")
     if to_player not in player_db:
         return f"{to_player}는 게임 상 존재하지 않습니다. {', '.join(list(player_db.keys()))}중 정확한 이름을 입력해 주세요"
     
-    conversation_logging(player_list,f"{to_player}이 {from_player}에게 대화를 걸었습니다.")
+    conversation_logging(player_list,f"{to_player}이 {from_player}에게 대화를 걸었습니다.",kind="talk_start",actor=from_player)
     for _ in range(3):
         # player_db[from_player]["conversation_log"].append(f"{to_player}에게 질문하세요")
         if from_player == person_player:
@@ -61,7 +59,7 @@ def talk_to_player(from_player: str, to_player: str) -> str:
         else:
             q = get_player2_action(current_player,f"당신은 {from_player} 입니다. {to_player} 에게 질문하세요")
             print(q)
-        conversation_logging(player_list,f"{from_player}: {q}")
+        conversation_logging(player_list,f"{from_player}: {q}",actor=from_player)
         
         # player_db[to_player]["conversation_log"].append(f"{from_player}에게 답변하세요")
         if to_player == person_player:
@@ -69,9 +67,9 @@ def talk_to_player(from_player: str, to_player: str) -> str:
         else:
             a = get_player2_action(current_player,f"당신은 {to_player} 입니다. {from_player}의 마지막 질문에 답변하세요")
             print(a)
-        conversation_logging(player_list,f"{to_player}: {a}")
+        conversation_logging(player_list,f"{to_player}: {a}",actor=to_player)
         
-    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.")
+    conversation_logging(player_list,f"{to_player}와 {from_player}가 대화를 마쳤습니다.",kind="talk_end",actor=from_player)
     turn += 1
     return f"{to_player}와 {from_player}가 대화를 마쳤습니다."
 
@@ -79,15 +77,13 @@ def talk_to_player(from_player: str, to_player: str) -> str:
 def get_evidence_info(player: str,evidence: str) -> str:
     """명령을 내린 player가 탐색하고 싶은 evidence의 세부내용을 보여줍니다."""
     global turn
-    print("tool 사용: get_evidence_info")
     player_position = player_db[player]['position']
-    evidence_list = list(map_dict[player_position].keys())
-    if evidence in evidence_list:
+    if world_map.has_evidence(player_position, evidence):
         turn += 1
-        conversation_logging(player_list,f"{player}이(가) {player_position}에서 {evidence}를 확인했습니다.")
-        return f"{{'player':'{player}','evidence':'{evidence}','evidence_info':'{map_dict[player_position][evidence]}'}}"
+        conversation_logging(player_list,f"{player}이(가) {player_position}에서 {evidence}를 확인했습니다.",kind="evidence",actor=player)
+        return f"{{'player':'{player}','evidence':'{evidence}','evidence_info':'{world_map.evidence_info(player_position, evidence)}'}}"
     else:
-        return f"{{'error':'{evidence}가 {', '.join(evidence_list)} 중에 없습니다. 정확한 증거품 명을 입력하세요.'}}"
+        return f"{{'error':'{evidence}가 {', '.join(world_map.evidences(player_position))} 중에 없습니다. 정확한 증거품 명을 입력하세요.'}}"
 
 
 if __name__ == "__main__":
@@ -114,22 +110,30 @@ if __name__ == "__main__":
         gamemanager_prompt_list = f.readlines()
         gamemanager_prompt = "\n".join(gamemanager_prompt_list)
 
-    VALID_LOCATIONS = map_list
+    world_map = WorldMap(map_dict)
+    world = WorldIndex(world_map, player_list, map_list[0])
 
     player_db = {
         name: {
             "position": map_list[0],
-            "talkable":player_list,
-            "evidences":list(map_dict[map_list[0]].keys()),
-            "conversation_log":[]
+            "talkable":world.talkable(name),
+            "evidences":list(world_map.evidences(map_list[0])),
         }
         for name in player_list
     }
+    # 이벤트는 추가되는 즉시 logs/{game_id}.jsonl 로 (버퍼링해서) 기록됩니다
+    game_logger = game_logger_from_env()
+    event_log = EventLog(player_list, listener=game_logger.event_listener(game_id))
+    game_logger.log(game_id, "game_start", text=story_name, players=player_list)
+    context_db = {
+        name: ConversationContext(max_tokens=int(os.environ.get("CONTEXT_MAX_TOKENS", "1500")))
+        for name in player_list
+    }
 
     # -------------------------------------
     # 5. Game manage Agent 설정
     # -------------------------------------
-    llm = ChatVertexAI(model_name="gemini-2.0-flash-001", temperature=0.5)
+    llm = create_chat_model(temperature=0.5)
     tools = [move_player, talk_to_player, get_evidence_info]
     sample_evidence = list(map_dict[map_list[0]].keys())[0]
     gamemanager_prompt = gamemanager_prompt.replace("{to_player}",player_list[0])
@@ -144,16 +148,21 @@ if __name__ == "__main__":
 
 
     agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    # 어떤 tool을 골랐는지는 verbose 출력 대신 tracing 콜백으로 기록합니다 (TRACING=1, TRACE_FILE)
+    agent_executor = AgentExecutor(agent=agent, tools=tools)
+    # 명확한 명령은 모델 없이 바로 tool을 실행합니다
+    intent_router = IntentRouter(player_list, world_map)
+    tools_by_name = {t.name: t for t in tools}
 
     # -------------------------------------
     # 6. Game play Agent 설정
     # -------------------------------------
-    def get_player2_action(player,next_action):
-        """게임 정보 기반으로 LLM에게 한 줄의 액션 요청"""
+    def build_player_prompt(player,next_action):
+        """게임 정보 기반으로 NPC에게 보낼 프롬프트를 만듭니다."""
         position = player_db[player]["position"]
-        evidences = list(map_dict[position].keys())  # 해당 장소의 증거들
-        conversation = "\n".join(player_db[player]["conversation_log"])
+        evidences = world_map.evidences(position)  # 해당 장소의 증거들
+        context_db[player].extend(event_log.read_new(player))
+        conversation = context_db[player].render()
 
         player_story = "\n".join(player_dict[player])
         prompt = game_play_prompt.format(
@@ -165,12 +174,23 @@ if __name__ == "__main__":
             conversation=conversation,
             next_action=next_action
         )
+        return prompt
+
+    def get_player2_action(player,next_action):
+        """게임 정보 기반으로 LLM에게 한 줄의 액션 요청"""
+        prompt = build_player_prompt(player,next_action)
         result = game_play_llm.generate([
             [HumanMessage(content=prompt)]
         ])
 
         return result.generations[0][0].text
 
+    def get_players_actions(requests):
+        """[(player, next_action), ...] 에 대한 NPC 행동을 모델 batch로 한 번에 요청합니다."""
+        prompts = [build_player_prompt(player,next_action) for player, next_action in requests]
+        results = game_play_llm.batch([[HumanMessage(content=prompt)] for prompt in prompts])
+        return [result.content for result in results]
+
     with open("character_system_prompt.txt") as f:
         prompt_list = f.readlines()
         character_system_prompt = "\n".join(prompt_list)
@@ -190,7 +210,7 @@ if __name__ == "__main__":
     """),
     ])
 
-    game_play_llm = ChatVertexAI(model_name="gemini-2.0-flash-001", temperature=0.5)
+    game_play_llm = create_chat_model(temperature=0.5)
 
 
     # -------------------------------------
@@ -209,13 +229,10 @@ if __name__ == "__main__":
         else:
             print(f"{','.join(player_list)} 중 정확한 캐릭터 이름을 입력하세요")
     
-    def game_logging(game_id,message):
-        with open(f"logs/{game_id}.txt","a") as f:
-            f.write(message)
     while True:
         current_player = player_list[turn % len(player_list)]
         print(f"\n{current_player}의 턴입니다.")
-        game_logging(game_id,f"{current_player}의 턴입니다.\n")
+        game_logger.log(game_id, "turn_start", current_player, turn)
         print(f"""
     현제 상황
         위치: {player_db[current_player]["position"]}
@@ -232,23 +249,30 @@ if __name__ == "__main__":
         else:
             user_input = get_player2_action(current_player,"다음 행동을 선택하세요")
 
-        player_db[current_player]["conversation_log"].append(f"{current_player}의 명령: {user_input}")
+        event_log.append("command", current_player, turn, f"{current_player}의 명령: {user_input}", visible_to=[current_player])
         
         if user_input.lower() in ["exit", "quit"]:
             # conversation_logging(player_list,"가장 의심가는 상대를 선택하시오.")
+            results = {person_player: input("가장 의심가는 상대를 선택하시오.: ")}
+            npc_players = [player for player in player_list if player != person_player]
+            npc_results = get_players_actions([(player,"가장 의심가는 상대를 선택하시오.") for player in npc_players])
+            results.update(zip(npc_players, npc_results))
             for player in player_list:
-                if player == person_player:
-                    result = input("가장 의심가는 상대를 선택하시오.: ")
-                else:
-                    result = get_player2_action(player,"가장 의심가는 상대를 선택하시오.")
-                print(f"{player}의 답변: {result}")
+                print(f"{player}의 답변: {results[player]}")
+            game_logger.log(game_id, "game_end", turn=turn, results=results)
             break
         
-        game_logging(game_id,f"{current_player}의 명령: {user_input}")
-        result = agent_executor.invoke({
-            "input": f"{current_player}의 명령: {user_input}",
-            "player_list":",".join(player_list),
-            "evidence_list":",".join(player_db[current_player]["evidences"])
-        })
-        player_db[current_player]["conversation_log"].append(result['output'])
-        game_logging(game_id,f"{result['output']}\n\n")
+        intent = intent_router.route(current_player, player_db[current_player]["position"], user_input)
+        if intent is not None:
+            with tracer.span("router.fast", route="fast", intent=intent.tool, game_id=game_id, turn=turn):
+                result = {"output": tools_by_name[intent.tool].invoke(intent.args, config=trace_config())}
+        else:
+            with tracer.span("router.agent", route="agent", game_id=game_id, turn=turn):
+                result = agent_executor.invoke({
+                    "input": f"{current_player}의 명령: {user_input}",
+                    "player_list":",".join(player_list),
+                    "evidence_list":",".join(player_db[current_player]["evidences"])
+                }, config=trace_config())
+        event_log.append("result", current_player, turn, result['output'], visible_to=[current_player])
+    game_logger.close()
+    tracer.flush()
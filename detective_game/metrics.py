@@ -0,0 +1,54 @@
+# -------------------------------------
+# 지연 시간 통계
+# -------------------------------------
+from collections import deque
+import threading
+
+
+def percentile(samples, p):
+    """정렬된 표본 사이를 선형 보간한 p 백분위 값을 반환합니다."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(ordered) - 1)
+    return ordered[f] + (ordered[c] - ordered[f]) * (k - f)
+
+
+class LatencyStats:
+    """여러 스레드에서 기록하는 지연 시간(초) 표본을 모아 요약합니다.
+
+    횟수와 합계는 처음부터 전부 세고, 백분위는 최근 window 개 표본으로만 계산합니다.
+    오래 도는 서버에서도 메모리와 /metrics 한 번의 정렬 비용이 일정합니다.
+    """
+
+    def __init__(self, window=2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.count = 0
+            self.total = 0.0
+
+    def summary(self):
+        with self._lock:
+            samples = list(self.samples)
+            count, total = self.count, self.total
+        return {
+            "count": count,
+            "total": total,
+            "mean": total / count if count else 0.0,
+            "p50": percentile(samples, 50),
+            "p99": percentile(samples, 99),
+        }
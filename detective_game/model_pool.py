@@ -0,0 +1,585 @@
+# -------------------------------------
+# 모델 호출 풀 (요청/토큰 속도 제한, 우선순위 대기열, 재시도, hedging)
+#   MODEL_POOL=1            모든 채팅 모델 호출을 백엔드별 풀로 보냄 (0이면 모델을 그대로 사용, 동시 호출 제한 없음)
+#   MODEL_POOL_RPM=0        분당 요청 수 제한 (0이면 없음)
+#   MODEL_POOL_TPM=0        분당 토큰 수 제한 (입력 + 출력 추정치, 0이면 없음)
+#   MODEL_POOL_QUEUE=256    슬롯을 기다릴 수 있는 호출 수. 넘치면 덜 급한 호출부터 PoolOverloaded로 거절
+#   MODEL_POOL_RETRIES=4    429/5xx/타임아웃 같은 일시적인 오류의 재시도 횟수
+#   MODEL_POOL_HEDGE=1      느린 호출에 같은 요청을 하나 더 보내 먼저 온 응답을 사용
+#   MODEL_POOL_HEDGE_AFTER  hedge를 보낼 대기 시간(초). 없으면 최근 응답 시간의 p90 (가장 느린 10%에 hedge)
+# -------------------------------------
+from collections import deque
+from contextlib import contextmanager
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from context_buffer import estimate_tokens
+from metrics import percentile
+from typing import Any
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+INTERACTIVE = 0  # 사람이 화면 앞에서 기다리는 호출 (게임 매니저, 대화 답변, 스트리밍)
+BACKGROUND = 1   # 미리 생성해 두는 NPC 행동처럼 늦어도 되는 호출
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority = contextvars.ContextVar("model_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def model_priority(priority):
+    """이 블록 안에서(여기서 만든 태스크 포함) 나가는 모델 호출의 우선순위를 정합니다."""
+    previous = _priority.get()
+    _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.set(previous)
+
+
+_hedge_attempt = contextvars.ContextVar("hedge_attempt", default=None)
+
+
+class _HedgeAttempt:
+    """hedge한 요청의 한 시도. 시도 안에서 남긴 측정값은 결과가 정해질 때까지 모았다가 이긴 시도의 것만 기록합니다."""
+
+    def __init__(self):
+        self._pending = []
+        self._won = None  # None: 아직 모름
+
+    def defer(self, record):
+        if self._won is None:
+            self._pending.append(record)
+        elif self._won:
+            record()
+
+    def settle(self, won):
+        if self._won is not None:
+            return
+        self._won = won
+        pending, self._pending = self._pending, []
+        if won:
+            for record in pending:
+                record()
+
+
+def record_attempt(record):
+    """모델 호출 하나의 측정값을 record()로 남깁니다. hedge로 같은 요청을 두 번 보냈으면 이긴 시도의 것만 남습니다."""
+    attempt = _hedge_attempt.get()
+    if attempt is None:
+        record()
+    else:
+        attempt.defer(record)
+
+
+class PoolOverloaded(RuntimeError):
+    """대기열이 가득 차서 호출을 받지 않았습니다 (backpressure). 잠시 뒤 다시 시도하면 됩니다."""
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# google.api_core, httpx 예외는 클래스 이름으로 판단합니다 (SDK를 여기서 임포트하지 않기 위해)
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "BadGateway", "GatewayTimeout", "Aborted",
+    "TransportError", "TimeoutException",
+}
+
+
+def is_retryable(error):
+    """다시 보내면 성공할 수 있는 일시적인 오류인지 (속도 제한, 서버 과부하, 네트워크)."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_NAMES for cls in type(error).__mro__)
+
+
+def is_throttled(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+class TokenBucket:
+    """분당 per_minute 만큼 채워지는 토큰 버킷. 최대 burst(기본 1초 분량) 만큼 모아 둘 수 있고, per_minute가 0이면 제한하지 않습니다.
+
+    API 쪽 한도도 짧은 구간으로 나눠 적용되는 경우가 많으므로, 한 번에 몰아 보내지 않도록 burst를 작게 둡니다.
+    burst보다 큰 요청은 버킷이 가득 찼을 때 보내고 전부 가져갑니다. 버킷이 음수(빚)가 되므로
+    다음 요청은 그만큼 더 기다리고, 분당 한도는 큰 프롬프트에도 그대로 지켜집니다.
+
+    잠금은 호출하는 쪽(ModelPool, 가짜 서버)이 잡습니다.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1.0, per_minute / 60))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """amount 만큼 쓸 수 있을 때까지 기다려야 하는 시간(초). 0이면 지금 쓸 수 있습니다."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        need = min(amount, self.capacity)  # burst보다 큰 요청은 버킷이 가득 차면 보냅니다 (나머지는 빚으로)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, amount):
+        if self.rate > 0:
+            self.tokens -= amount
+
+    def adjust(self, delta):
+        """추정치로 가져간 양과 실제 사용량의 차이를 정산합니다 (음수면 돌려받음)."""
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _SyncWaiter:
+    """이벤트 루프 밖에서 기다리는 호출의 대기열 항목. asyncio.Future에서 풀이 쓰는 부분만 흉내 냅니다."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._error = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def cancelled(self):
+        return False
+
+    def exception(self):
+        return self._error
+
+    def set_result(self, result):
+        self._event.set()
+
+    def set_exception(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+
+
+class ModelPool:
+    """한 백엔드의 모든 모델 호출이 지나가는 관문. 게임과 이벤트 루프, 스레드가 함께 씁니다.
+
+    - 동시에 나가는 호출은 max_concurrency개까지이고, 나머지는 (우선순위, 도착 순서)로 대기합니다.
+      슬롯이 나면 INTERACTIVE 호출이 BACKGROUND 호출보다 먼저 나갑니다.
+    - 슬롯을 내줄 때 요청/토큰 버킷에서 함께 가져가므로, 분당 한도를 넘는 호출은 버킷이 찰 때까지 대기열에 남습니다.
+    - 대기열이 max_queue를 넘으면 가장 덜 급한 대기자를 PoolOverloaded로 돌려보냅니다 (새 호출이 더 급하지 않으면 새 호출을 거절).
+    - 일시적인 오류는 full jitter 지수 백오프로 재시도하고, Retry-After가 있으면 그보다 일찍 보내지 않습니다.
+    - 응답이 hedge 지연보다 늦으면, 남는 슬롯과 한도가 있을 때에 한해 같은 요청을 하나 더 보내 먼저 온 응답을 씁니다.
+      hedge는 전체 호출의 hedge_ratio 이내로 제한합니다.
+    """
+
+    def __init__(self, max_concurrency=16, max_queue=256, requests_per_minute=0, tokens_per_minute=0,
+                 retries=4, backoff_base=0.25, backoff_max=8.0,
+                 hedge=True, hedge_after=None, hedge_min=0.5, hedge_ratio=0.1, expected_output_tokens=256):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_min = hedge_min
+        self.hedge_ratio = hedge_ratio
+        self.expected_output_tokens = expected_output_tokens
+        self._lock = threading.RLock()
+        self._waiters = []  # (priority, seq, future 또는 _SyncWaiter, tokens)
+        self._seq = itertools.count()
+        self._active = 0
+        self._wakeup_at = None
+        self._latencies = deque(maxlen=256)
+        self.calls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.waits = {priority: 0 for priority in PRIORITY_NAMES}
+
+    # -------------------------------------
+    # 슬롯과 속도 제한
+    # -------------------------------------
+    def _try_take(self, tokens, now):
+        """슬롯이 없으면 None, 한도가 모자라면 기다릴 시간, 가져갔으면 0. (잠금 안에서 호출)"""
+        if self._active >= self.max_concurrency:
+            return None
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self._active += 1
+        return 0.0
+
+    def _dispatch(self, now):
+        """맨 앞 대기자부터 슬롯과 한도가 허락하는 만큼 깨웁니다. (잠금 안에서 호출)"""
+        while self._waiters:
+            priority, seq, future, tokens = self._waiters[0]
+            if future.done():  # 취소되었거나 밀려난 대기자
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._try_take(tokens, now)
+            if wait is None:
+                return  # release()가 다시 부릅니다
+            if wait > 0:
+                self._wake_later(future, wait)
+                return
+            heapq.heappop(self._waiters)
+            self._deliver(future)
+
+    def _deliver(self, future):
+        if isinstance(future, _SyncWaiter):
+            future.set_result(None)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if future.get_loop() is running:
+            future.set_result(None)
+        else:
+            future.get_loop().call_soon_threadsafe(self._deliver_threadsafe, future)
+
+    def _deliver_threadsafe(self, future):
+        if future.done():  # 건너오는 사이에 취소됨: 가져간 슬롯을 돌려줍니다
+            self.release()
+        else:
+            future.set_result(None)
+
+    def _wake_later(self, future, wait):
+        at = time.monotonic() + wait
+        if self._wakeup_at is not None and self._wakeup_at <= at:
+            return
+        self._wakeup_at = at
+        if isinstance(future, _SyncWaiter):
+            timer = threading.Timer(wait, self._wake)
+            timer.daemon = True
+            timer.start()
+        else:
+            loop = future.get_loop()
+            loop.call_soon_threadsafe(loop.call_later, wait, self._wake)
+
+    def _wake(self):
+        with self._lock:
+            self._wakeup_at = None
+            self._dispatch(time.monotonic())
+
+    def _shed(self, priority):
+        """대기열이 가득 찼을 때: 새 호출보다 덜 급한 대기자가 있으면 그것을 돌려보내고, 없으면 새 호출을 거절합니다."""
+        self._waiters = [waiter for waiter in self._waiters if not waiter[2].done()]
+        heapq.heapify(self._waiters)
+        if len(self._waiters) < self.max_queue:
+            return
+        worst = max(self._waiters, key=lambda waiter: (waiter[0], waiter[1]))
+        if worst[0] <= priority:
+            self.rejected += 1
+            raise PoolOverloaded(f"model pool queue is full ({self.max_queue} waiting)")
+        self._waiters.remove(worst)
+        heapq.heapify(self._waiters)
+        self.evicted += 1
+        future = worst[2]
+        error = PoolOverloaded("evicted by a more urgent model call")
+        if isinstance(future, _SyncWaiter):
+            future.set_exception(error)
+        else:
+            future.get_loop().call_soon_threadsafe(lambda: future.done() or future.set_exception(error))
+
+    async def acquire(self, tokens=0, priority=INTERACTIVE):
+        start = time.monotonic()
+        with self._lock:
+            if not self._waiters and self._try_take(tokens, start) == 0.0:
+                self._record_wait(priority, 0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._shed(priority)
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future, tokens))
+            self._dispatch(start)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                # 슬롯을 받은 직후에 취소되었으면 돌려줍니다
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    self.release()
+            raise
+        self._record_wait(priority, time.monotonic() - start)
+
+    def acquire_sync(self, tokens=0, priority=INTERACTIVE):
+        """이벤트 루프 밖(동기 호출, tool 안의 호출)에서 슬롯을 기다립니다. async 호출과 같은 대기열에 섭니다."""
+        start = time.monotonic()
+        with self._lock:
+            if not self._waiters and self._try_take(tokens, start) == 0.0:
+                self._record_wait(priority, 0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._shed(priority)
+            waiter = _SyncWaiter()
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter, tokens))
+            self._dispatch(start)
+        waiter.wait()
+        self._record_wait(priority, time.monotonic() - start)
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch(time.monotonic())
+
+    def _record_wait(self, priority, seconds):
+        self.wait_seconds[priority] = self.wait_seconds.get(priority, 0.0) + seconds
+        self.waits[priority] = self.waits.get(priority, 0) + 1
+
+    def settle(self, reserved_tokens, used_tokens):
+        with self._lock:
+            self.tokens.adjust(used_tokens - reserved_tokens)
+
+    # -------------------------------------
+    # 재시도와 hedging
+    # -------------------------------------
+    def backoff(self, attempt, error=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, retry_after) if retry_after else delay
+
+    def hedge_delay(self):
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if len(self._latencies) < 20:
+            return None
+        # hedge 예산(hedge_ratio)만큼의 가장 느린 호출에 hedge가 붙도록 (0.1이면 p90)
+        return max(self.hedge_min, percentile(list(self._latencies), 100 * (1 - self.hedge_ratio)))
+
+    def _take_hedge_slot(self, tokens):
+        with self._lock:
+            if self.hedges >= self.hedge_ratio * self.calls or any(not waiter[2].done() for waiter in self._waiters):
+                return False
+            return self._try_take(tokens, time.monotonic()) == 0.0
+
+    def _failed_attempt(self, error, attempt):
+        """재시도할 오류면 True. 아니면 실패로 셉니다."""
+        if is_throttled(error):
+            self.throttled += 1
+        if attempt >= self.retries or not is_retryable(error):
+            self.failed += 1
+            return False
+        self.retried += 1
+        return True
+
+    @staticmethod
+    async def _run_attempt(factory, attempt):
+        _hedge_attempt.set(attempt)  # 이 시도의 태스크 안에서만 보입니다
+        return await factory()
+
+    async def _attempt(self, factory, tokens, hedge):
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return await factory()
+        attempts = [_HedgeAttempt()]
+        primary = asyncio.ensure_future(self._run_attempt(factory, attempts[0]))
+        tasks = {primary}
+        backup = None
+        winner = primary
+        try:
+            await asyncio.wait(tasks, timeout=delay)
+            if not primary.done() and self._take_hedge_slot(tokens):
+                self.hedges += 1
+                attempts.append(_HedgeAttempt())
+                backup = asyncio.ensure_future(self._run_attempt(factory, attempts[1]))
+                tasks.add(backup)
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not tasks:  # 둘 다 실패했으면 먼저 보낸 쪽의 오류
+                    return primary.result()
+        finally:
+            # 모델 호출 시간 등은 이긴 시도의 것만 남깁니다 (진 쪽까지 세면 hedge할 때마다 호출 수와 시간이 두 번 잡힙니다)
+            for task, attempt in zip((primary, backup), attempts):
+                attempt.settle(task is winner)
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+            if backup is not None:
+                self.release()
+                # 호출한 쪽은 이긴 응답 하나만 정산하므로, hedge로 더 가져간 예약은 여기서 정산합니다.
+                # 진 쪽(취소되거나 실패한 요청)도 프롬프트는 보냈으므로 예상 출력분만 돌려받습니다
+                self.settle(tokens, max(tokens - self.expected_output_tokens, 0))
+
+    async def call(self, factory, tokens=0, hedge=True, priority=None):
+        """factory()가 돌려주는 코루틴을 풀 안에서 실행합니다. 재시도와 hedge마다 factory를 다시 부릅니다."""
+        priority = _priority.get() if priority is None else priority
+        reserved = tokens + self.expected_output_tokens
+        self.calls += 1
+        for attempt in itertools.count():
+            await self.acquire(reserved, priority)
+            start = time.monotonic()
+            try:
+                result = await self._attempt(factory, reserved, hedge)
+            except Exception as error:
+                if not self._failed_attempt(error, attempt):
+                    raise
+                last_error = error
+            else:
+                self._latencies.append(time.monotonic() - start)
+                self.succeeded += 1
+                return result
+            finally:
+                self.release()
+            await asyncio.sleep(self.backoff(attempt, last_error))
+
+    async def stream(self, factory, tokens=0, priority=None):
+        """factory()가 돌려주는 async iterator를 풀 안에서 흘려보냅니다. 첫 청크 전의 오류만 재시도합니다 (hedge 없음)."""
+        priority = _priority.get() if priority is None else priority
+        reserved = tokens + self.expected_output_tokens
+        self.calls += 1
+        for attempt in itertools.count():
+            await self.acquire(reserved, priority)
+            started = False
+            try:
+                async for chunk in factory():
+                    started = True
+                    yield chunk
+            except Exception as error:
+                if started:  # 이미 내보낸 청크가 있으면 처음부터 다시 보낼 수 없습니다
+                    self.failed += 1
+                    raise
+                if not self._failed_attempt(error, attempt):
+                    raise
+                last_error = error
+            else:
+                self.succeeded += 1
+                return
+            finally:
+                self.release()
+            await asyncio.sleep(self.backoff(attempt, last_error))
+
+    def call_sync(self, fn, tokens=0, priority=None):
+        """동기 버전의 call (hedge 없음)."""
+        priority = _priority.get() if priority is None else priority
+        reserved = tokens + self.expected_output_tokens
+        self.calls += 1
+        for attempt in itertools.count():
+            self.acquire_sync(reserved, priority)
+            try:
+                result = fn()
+            except Exception as error:
+                if not self._failed_attempt(error, attempt):
+                    raise
+                last_error = error
+            else:
+                self.succeeded += 1
+                return result
+            finally:
+                self.release()
+            time.sleep(self.backoff(attempt, last_error))
+
+    def stats(self):
+        with self._lock:
+            queued = sum(1 for waiter in self._waiters if not waiter[2].done())
+        result = {
+            "calls": self.calls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay": self.hedge_delay() or 0.0,
+            "active": self._active,
+            "queued": queued,
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            waits = self.waits.get(priority, 0)
+            result[f"wait_mean_{name}"] = self.wait_seconds.get(priority, 0.0) / waits if waits else 0.0
+        return result
+
+
+def pool_from_env(max_concurrency):
+    env = os.environ.get
+    return ModelPool(
+        max_concurrency=max_concurrency,
+        max_queue=int(env("MODEL_POOL_QUEUE", "256")),
+        requests_per_minute=float(env("MODEL_POOL_RPM", "0")),
+        tokens_per_minute=float(env("MODEL_POOL_TPM", "0")),
+        retries=int(env("MODEL_POOL_RETRIES", "4")),
+        hedge=env("MODEL_POOL_HEDGE", "1") == "1",
+        hedge_after=float(env("MODEL_POOL_HEDGE_AFTER")) if env("MODEL_POOL_HEDGE_AFTER") else None,
+    )
+
+
+class PooledChatModel(BaseChatModel):
+    """다른 채팅 모델을 감싸 모든 호출(AgentExecutor 안의 호출 포함)을 ModelPool로 보냅니다.
+
+    캐시(cache)와 콜백은 이 객체에 설정하므로, 캐시 hit는 풀을 거치지 않습니다.
+    """
+
+    inner: BaseChatModel
+    pool: Any
+
+    # 캐시 키(llm_string)가 감싸기 전과 같도록 안쪽 모델의 이름과 파라미터를 그대로 씁니다
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self):
+        return self.inner._identifying_params
+
+    @staticmethod
+    def _prompt_tokens(messages):
+        return sum(estimate_tokens(str(message.content)) for message in messages)
+
+    def _settle(self, tokens, generations):
+        self.pool.settle(tokens + self.pool.expected_output_tokens, tokens + sum(estimate_tokens(g.text) for g in generations))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._prompt_tokens(messages)
+        result = self.pool.call_sync(lambda: self.inner.generate([messages], stop=stop, **kwargs), tokens=tokens)
+        self._settle(tokens, result.generations[0])
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._prompt_tokens(messages)
+        result = await self.pool.call(lambda: self.inner.agenerate([messages], stop=stop, **kwargs), tokens=tokens)
+        self._settle(tokens, result.generations[0])
+        return ChatResult(generations=result.generations[0], llm_output=result.llm_output)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._prompt_tokens(messages)
+        output = 0
+        async for message in self.pool.stream(lambda: self.inner.astream(messages, stop=stop, **kwargs), tokens=tokens):
+            output += estimate_tokens(str(message.content))
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                await run_manager.on_llm_new_token(message.content, chunk=chunk)
+            yield chunk
+        self.pool.settle(tokens + self.pool.expected_output_tokens, tokens + output)
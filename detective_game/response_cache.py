@@ -0,0 +1,331 @@
+# -------------------------------------
+# 모델 응답 캐시 (메모리 LRU + 선택적 SQLite)
+# -------------------------------------
+from collections import OrderedDict
+from hashlib import sha256
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from context_buffer import estimate_tokens
+from tracing import tracer
+import asyncio
+import atexit
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """공백/줄바꿈 차이만 있는 프롬프트가 같은 키가 되도록 정리합니다."""
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def prompt_key(text, namespace=""):
+    return sha256(f"{namespace}\x00{normalize_prompt(text)}".encode("utf-8")).hexdigest()
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_CLEAR = object()
+_STOP = object()
+
+
+class ResponseCache:
+    """정규화한 프롬프트 해시 → 응답 텍스트. TTL, 항목 수/바이트 상한을 넘으면 오래 안 쓴 것부터 버립니다.
+
+    db_path를 주면 SQLite에도 같이 써서 재시작 후에도 남고, 메모리에서 밀려난 항목도 디스크에서 다시 올라옵니다.
+    디스크 쓰기는 set()이 큐에 넣기만 하고 writer 스레드가 모아서 하며, 디스크 읽기는 짧게 여는 연결로 합니다
+    (async 경로에서는 aget()이 스레드에서 읽으므로 이벤트 루프를 막지 않습니다).
+    writer는 purge_every 번 쓸 때마다(그리고 열 때 한 번) 만료된 행을 지우고, disk_max_entries를 넘으면
+    만료가 가까운(먼저 쓴) 행부터 지워 파일 크기를 묶어 둡니다.
+    miss 후 같은 키로 set 하기까지 걸린 시간을 그 항목의 비용으로 기록해, hit 때마다 절약한 시간으로 더합니다.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=16 * 1024 * 1024, ttl=600.0, db_path=None,
+                 disk_max_entries=65536, purge_every=256):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.disk_max_entries = disk_max_entries
+        self.purge_every = purge_every
+        self._entries = OrderedDict()  # key -> (expires_at, value, cost, tokens, size)
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        self.disk_writes = 0
+        self.disk_purged = 0
+        self._queue = None
+        if db_path:
+            db = self._connect()
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, cost REAL, tokens INTEGER)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS response_cache_expires ON response_cache (expires_at)")
+            db.commit()
+            db.close()
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name="response-cache-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _store(self, key, expires_at, value, cost, tokens):
+        size = len(key) + len(value.encode("utf-8"))
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[4]
+        self._entries[key] = (expires_at, value, cost, tokens, size)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[4]
+            self.evictions += 1
+
+    # --- writer 스레드 ---
+
+    def _run(self):
+        db = self._connect()
+        self._purge_disk(db)  # 지난 실행에서 남은 만료 항목
+        writes = 0
+        while True:
+            items = [self._queue.get()]
+            while True:  # 밀린 쓰기를 한 트랜잭션으로 모읍니다
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows, flushes, stop = [], [], False
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                elif item is _CLEAR:
+                    self._write(db, rows)
+                    rows = []
+                    db.execute("DELETE FROM response_cache")
+                elif isinstance(item, _Flush):
+                    flushes.append(item)
+                else:
+                    rows.append(item)
+            self._write(db, rows)
+            db.commit()
+            if writes // self.purge_every != (writes + len(rows)) // self.purge_every:
+                self._purge_disk(db)
+            writes += len(rows)
+            for request in flushes:
+                request.done.set()
+            if stop:
+                db.close()
+                return
+
+    def _write(self, db, rows):
+        if rows:
+            db.executemany(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, cost, tokens) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.disk_writes += len(rows)
+
+    def _purge_disk(self, db):
+        """만료된 행을 지우고, 상한을 넘은 만큼 만료가 가장 가까운 행부터 지웁니다."""
+        purged = db.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        excess = db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.disk_max_entries
+        if excess > 0:
+            purged += db.execute(
+                "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            ).rowcount
+        db.commit()
+        self.disk_purged += purged
+
+    def flush(self, timeout=None):
+        """지금까지 set()한 항목이 SQLite에 쓰일 때까지 기다립니다."""
+        if self._queue is None:
+            return True
+        request = _Flush()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        if self._queue is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    # --- 조회 ---
+
+    def _read_disk(self, key):
+        """메모리에 없을 때 SQLite에서 찾습니다. 스레드마다 짧게 연결을 열고 닫습니다 (잠금 밖에서 호출)."""
+        if self._queue is None:
+            return None
+        db = self._connect()
+        try:
+            return db.execute(
+                "SELECT value, expires_at, cost, tokens FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            db.close()
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._bytes -= self._entries.pop(key)[4]
+                self.expirations += 1
+                entry = None
+            return entry
+
+    def _finish(self, key, entry, row, now):
+        """메모리 조회 결과(entry)나 디스크에서 읽은 행(row)으로 hit/miss를 기록하고 값을 돌려줍니다."""
+        with self._lock:
+            if entry is None and row is not None:
+                value, expires_at, cost, tokens = row
+                if expires_at < now:
+                    self.expirations += 1  # 행은 writer의 정리 때 지워집니다
+                else:
+                    self._store(key, expires_at, value, cost, tokens)
+                    self.disk_hits += 1
+                    entry = self._entries[key]
+            if entry is None:
+                self.misses += 1
+                tracer.annotate(cache_hit=False)
+                if len(self._pending) > self.max_entries:
+                    self._pending.clear()  # set이 오지 않은(호출이 실패한) 키가 쌓이지 않게
+                self._pending[key] = time.perf_counter()
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            tracer.annotate(cache_hit=True)
+            self.saved_seconds += entry[2]
+            self.saved_tokens += entry[3]
+            return entry[1]
+
+    def get(self, key):
+        now = time.time()
+        entry = self._memory_get(key, now)
+        row = self._read_disk(key) if entry is None else None
+        return self._finish(key, entry, row, now)
+
+    async def aget(self, key):
+        """get과 같지만 디스크 조회는 스레드에서 합니다 (메모리 hit이면 바로 돌려줍니다)."""
+        now = time.time()
+        entry = self._memory_get(key, now)
+        row = await asyncio.to_thread(self._read_disk, key) if entry is None and self._queue is not None else None
+        return self._finish(key, entry, row, now)
+
+    def set(self, key, value, tokens=0):
+        with self._lock:
+            started = self._pending.pop(key, None)
+            cost = time.perf_counter() - started if started is not None else 0.0
+            expires_at = time.time() + self.ttl
+            self._store(key, expires_at, value, cost, tokens)
+        if self._queue is not None:
+            self._queue.put((key, value, expires_at, cost, tokens))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._pending.clear()
+        if self._queue is not None:
+            self._queue.put(_CLEAR)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_writes": self.disk_writes,
+                "disk_purged": self.disk_purged,
+                "disk_queued": self._queue.qsize() if self._queue is not None else 0,
+                "saved_seconds": self.saved_seconds,
+                "saved_tokens": self.saved_tokens,
+            }
+
+
+class LangChainResponseCache(BaseCache):
+    """ResponseCache를 langchain 모델의 cache로 쓰기 위한 어댑터.
+
+    placeholder_pattern에 걸리는 값(예: game_id)은 키를 만들 때 자리표시자로 바꾸고, 저장한 응답(예: tool 호출 인자)에도
+    같은 자리표시자로 저장했다가 꺼낼 때 현재 값으로 되돌립니다. 그래서 다른 게임의 같은 질문도 hit가 됩니다.
+    """
+
+    def __init__(self, cache, placeholder_pattern=None):
+        self.cache = cache
+        self.placeholder_pattern = placeholder_pattern
+
+    def _bindings(self, prompt):
+        if self.placeholder_pattern is None:
+            return {}
+        values = dict.fromkeys(self.placeholder_pattern.findall(prompt))
+        return {value: f"<<placeholder{i}>>" for i, value in enumerate(values)}
+
+    def _key(self, prompt, llm_string):
+        bindings = self._bindings(prompt)
+        for value, placeholder in bindings.items():
+            prompt = prompt.replace(value, placeholder)
+        return prompt_key(prompt, llm_string), bindings
+
+    def _decode(self, raw, bindings):
+        if raw is None:
+            return None
+        for value, placeholder in bindings.items():
+            raw = raw.replace(placeholder, value)
+        return [loads(generation) for generation in json.loads(raw)]
+
+    def lookup(self, prompt, llm_string):
+        key, bindings = self._key(prompt, llm_string)
+        return self._decode(self.cache.get(key), bindings)
+
+    async def alookup(self, prompt, llm_string):
+        key, bindings = self._key(prompt, llm_string)
+        return self._decode(await self.cache.aget(key), bindings)
+
+    async def aupdate(self, prompt, llm_string, return_val):
+        # set은 메모리에 넣고 디스크 쓰기는 큐에 맡기므로 스레드로 보낼 필요가 없습니다
+        self.update(prompt, llm_string, return_val)
+
+    def update(self, prompt, llm_string, return_val):
+        bindings = self._bindings(prompt)
+        raw = json.dumps([dumps(generation) for generation in return_val])
+        # prompt는 메시지 목록을 직렬화한 JSON이므로 본문만 세어 비용(토큰)을 추정합니다
+        messages = json.loads(prompt)
+        tokens = sum(estimate_tokens(str(message.get("kwargs", {}).get("content", ""))) for message in messages)
+        tokens += sum(estimate_tokens(generation.text) for generation in return_val)
+        for value, placeholder in bindings.items():
+            prompt = prompt.replace(value, placeholder)
+            raw = raw.replace(value, placeholder)
+        self.cache.set(prompt_key(prompt, llm_string), raw, tokens=tokens)
+
+    def clear(self, **kwargs):
+        self.cache.clear()
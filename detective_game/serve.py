@@ -0,0 +1,189 @@
+# -------------------------------------
+# 여러 워커 프로세스로 Crime Scene 실행 (한 포트, uvicorn 워커)
+#   STATE_BACKEND=sqlite:game_state.db python serve.py --workers 4 --port 7860   (/api 만)
+#   STATE_BACKEND=sqlite:game_state.db python serve.py --port 7861               (Gradio 화면 + /api, 한 프로세스)
+# -------------------------------------
+# 게임 상태는 STATE_BACKEND에 있고 요청마다 게임별 잠금 안에서 읽고 올리므로, /api 요청은 어느 워커로 가도 됩니다.
+# Gradio 화면(/)은 큐 스트리밍 연결이 요청을 받은 프로세스에 묶이므로 여러 워커에 나눠 띄우지 않습니다.
+# 워커가 여럿이면 /api 만 올리고, 화면은 같은 STATE_BACKEND를 쓰는 단일 프로세스로 따로 띄웁니다 (세션 고정 불필요).
+import argparse
+import contextlib
+import os
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+import gradio as gr
+import uvicorn
+
+from game_ids import is_game_id
+import gui
+from model_pool import PoolOverloaded
+from tracing import tracer
+
+
+class NewGame(BaseModel):
+    story: str
+    player: str | None = None
+
+
+class Command(BaseModel):
+    command: str = ""
+    log_offset: int | None = None  # 마지막 응답의 log_offset. 주면 그 뒤에 추가된 로그만 돌려받습니다
+
+
+class Message(BaseModel):
+    text: str | None = None
+    log_offset: int | None = None
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 워커마다 uvicorn이 요청을 받기 시작하는 동안 모델과 스토리를 백그라운드에서 준비합니다 (WARMUP=1)
+    gui.start_warmup()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(PoolOverloaded)
+async def overloaded(request, error):
+    # 모델 풀 대기열이 가득 참: 클라이언트가 잠시 뒤 다시 보내도록 합니다
+    return JSONResponse(status_code=503, content={"detail": str(error)}, headers={"Retry-After": "1"})
+
+
+def summary(game_id, update=None):
+    session = gui.game_db[game_id]
+    player_list = list(session["player_dict"].keys())
+    result = {
+        "game_id": game_id,
+        "turn": session["turn"],
+        "current_player": player_list[session["turn"] % len(player_list)],
+        "person_player": session.get("person_player"),
+        "conversation": session["conversation_db"]["person_conv"],
+        "log_chars": len(session["log_history"]),
+        "log_offset": len(session["log_history"].chunks),
+        "worker": os.getpid(),
+    }
+    if update is not None:
+        result["log"] = update["text"]
+    return result
+
+
+def check_game_id(game_id):
+    # game_id는 스냅샷/상태 파일 이름이 되므로 형식이 다르면 게임 상태에 닿기 전에 돌려보냅니다
+    if not is_game_id(game_id):
+        raise HTTPException(status_code=404, detail=f"unknown game {game_id}")
+
+
+def client_log(session, update, log_offset):
+    """클라이언트가 자기 log_offset을 보냈으면 그 뒤의 로그를, 아니면 API 호출끼리 쓰는 커서의 delta를 돌려줍니다.
+
+    어느 쪽이든 브라우저 화면의 로그 커서는 건드리지 않습니다.
+    """
+    if log_offset is None:
+        return update
+    return {"text": session["log_history"].since(log_offset)}
+
+
+def session_or_404(game_id):
+    try:
+        return gui.game_db[game_id]
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown game {game_id}")
+
+
+@app.get("/api/health")
+async def health():
+    return {"worker": os.getpid(), "backend": type(gui.state_backend).__name__ if gui.state_backend else None}
+
+
+@app.post("/api/games")
+async def new_game(body: NewGame):
+    if body.story not in gui.story_registry.available():
+        raise HTTPException(status_code=404, detail=f"unknown story {body.story}")
+    game_id, player_list, *_ = await gui.agame_start(body.story)
+    with tracer.span("api.new_game", game_id=game_id):
+        async with gui.game_state(game_id):
+            update, *_ = await gui.select_character.__wrapped__(body.player or player_list[0], game_id, "")
+            return summary(game_id, update)
+
+
+@app.get("/api/games/{game_id}")
+async def get_game(game_id: str, log: bool = False):
+    check_game_id(game_id)
+    async with gui.game_state(game_id, write=False):
+        session = session_or_404(game_id)
+        return summary(game_id, {"text": session["log_history"].text()} if log else None)
+
+
+@app.post("/api/games/{game_id}/turn")
+async def turn(game_id: str, body: Command):
+    check_game_id(game_id)
+    with tracer.span("api.turn", game_id=game_id) as span:
+        async with gui.game_state(game_id):
+            session = session_or_404(game_id)
+            if session["conversation_db"]["person_conv"]:
+                raise HTTPException(status_code=409, detail="conversation in progress")
+            gui.trace_turn(span, game_id)
+            update, *_ = await gui.advance_turn.__wrapped__(body.command, game_id, "", session["person_player"])
+            return summary(game_id, client_log(session, update, body.log_offset))
+
+
+@app.post("/api/games/{game_id}/conversation")
+async def conversation(game_id: str, body: Message):
+    """text 없이 부르면 대화를 시작하고(NPC가 먼저 말함), text가 있으면 사람의 말을 보내고 NPC 답변까지 받습니다."""
+    check_game_id(game_id)
+    with tracer.span("api.conversation", game_id=game_id) as span:
+        async with gui.game_state(game_id):
+            session = session_or_404(game_id)
+            if not session["conversation_db"]["person_conv"]:
+                raise HTTPException(status_code=409, detail="no conversation in progress")
+            gui.trace_turn(span, game_id)
+            if body.text is None:
+                updates = [update async for update in gui.conversation_start.__wrapped__(game_id, "")]
+                update = updates[-1][3]
+            else:
+                updates = [update async for update in gui.conversation_processing.__wrapped__(game_id, "", body.text)]
+                update = updates[-1][4]
+            return summary(game_id, client_log(session, update, body.log_offset))
+
+
+@app.get("/api/games/{game_id}/trace")
+async def game_trace(game_id: str):
+    """이 워커가 처리한 최근 핸들러 호출별 시간 분해 (TRACING=1)"""
+    check_game_id(game_id)
+    return tracer.turn_breakdown(game_id)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return tracer.prometheus_text()
+
+
+@app.get("/api/ready")
+async def ready():
+    """워밍업이 끝났으면 200, 아직이면 503 (로드밸런서 readiness 확인용)"""
+    if gui.WARMUP and not gui.warmup_done.is_set():
+        raise HTTPException(status_code=503, detail=gui.warmup_stats["state"])
+    return {"worker": os.getpid(), **gui.warmup_stats}
+
+
+# SERVE_UI=0 이면 Gradio 화면을 마운트하지 않습니다 (--workers 2 이상이면 자동으로 0)
+if os.environ.get("SERVE_UI", "1") == "1":
+    gui.demo.queue(default_concurrency_limit=int(os.environ.get("GRADIO_CONCURRENCY", "64")))
+    app = gr.mount_gradio_app(app, gui.demo, path="/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    if args.workers > 1 and gui.state_backend is None:
+        parser.error("여러 워커로 띄우려면 STATE_BACKEND(sqlite:경로 또는 file:디렉터리)를 지정하세요.")
+    if args.workers > 1:
+        os.environ["SERVE_UI"] = "0"  # 워커 프로세스가 물려받습니다
+    uvicorn.run("serve:app", host=args.host, port=args.port, workers=args.workers)
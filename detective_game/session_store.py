@@ -0,0 +1,365 @@
+# -------------------------------------
+# 게임 세션 저장소 (메모리 LRU + SQLite spill)
+# -------------------------------------
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+import asyncio
+import atexit
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class SessionStore(MutableMapping):
+    """game_id → 게임 세션(dict). 기존 game_db 딕셔너리를 그대로 대체합니다.
+
+    - 메모리에는 최근에 쓴 세션을 max_resident 개까지만 두고, 넘치면 가장 오래 안 쓴 세션부터 SQLite로 내보냅니다.
+    - idle_timeout 초 동안 쓰지 않은 세션도 내보내고, 디스크에서 spill_ttl 초가 지난 세션은 지웁니다(버려진 게임).
+    - 내보낸 game_id로 요청이 오면 디스크에서 읽어 메모리로 되돌립니다.
+    - 직렬화와 SQLite 쓰기는 writer 스레드가, 디스크 읽기와 복원은 잠금 밖에서 하므로 다른 게임의 요청을 막지 않습니다.
+      async 핸들러는 aload()로 미리 올려 두면 디스크 읽기도 이벤트 루프 밖에서 합니다.
+      디스크에 있는 game_id는 메모리에도 기억하므로 in, del, len, 순회는 디스크를 읽지 않습니다.
+    - path=None이면 디스크 계층 없이 내보낼 세션을 그냥 버립니다 (원본이 다른 곳에 있을 때, 예: STATE_BACKEND).
+    - pinned(game_id) 블록 안에 있는 세션(핸들러가 처리 중인 게임)은 상한을 넘거나 오래 쉬었어도 내보내지 않습니다.
+      처리 도중에 내보냈다가 다시 읽으면 핸들러가 들고 있는 세션과 game_db의 세션이 달라져 변경이 사라지기 때문입니다.
+
+    serialize(game_id, session)는 pickle 가능한 값을 돌려주고, restore(game_id, state)는 그것으로 세션을 다시 만듭니다.
+    스토리에서 다시 만들 수 있는 값(템플릿, 색인 등)은 serialize에서 빼고 restore에서 채우면 됩니다.
+    missing(game_id)를 주면 메모리와 디스크 어디에도 없을 때 마지막으로 불러 봅니다(예: 스냅샷에서 복원). 없으면 None.
+    on_evict(game_id)는 세션을 메모리에서 뺄 때마다(디스크 계층이 없어도) 잠금 안에서 불립니다. 가볍게 끝나야 합니다.
+    """
+
+    def __init__(self, path="sessions.db", max_resident=256, idle_timeout=1800.0, spill_ttl=7 * 24 * 3600.0,
+                 sweep_interval=5.0, serialize=None, restore=None, missing=None, on_evict=None):
+        self.path = path
+        self.max_resident = max_resident
+        self.idle_timeout = idle_timeout
+        self.spill_ttl = spill_ttl
+        self.sweep_interval = sweep_interval
+        self.serialize = serialize or (lambda game_id, session: session)
+        self.restore = restore or (lambda game_id, state: state)
+        self.missing = missing
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()  # 사용 순서 (앞쪽이 가장 오래 안 쓴 세션)
+        self._touched = {}
+        self._pins = Counter()  # game_id → 처리 중인 핸들러 수
+        self._lock = threading.RLock()
+        self._spilling = {}  # game_id → (token, session): 내보냈지만 writer가 아직 디스크에 쓰지 않은 세션
+        self._spilled = {}  # game_id → 디스크에 있는 세션의 크기(바이트). 지우기로 한 행은 writer가 지우기 전에 뺍니다
+        self._queue = None
+        self._thread = None
+        self._swept_at = time.monotonic()
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.rehydrations = 0
+        self.expired = 0
+        self.spilled_bytes = 0
+        self.spill_errors = 0
+        if path is not None and os.path.exists(path):
+            self._open_existing()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _open_existing(self):
+        """지난 실행에서 내보낸 세션의 game_id를 읽어 둡니다 (생성할 때 한 번)."""
+        db = self._connect()
+        try:
+            self._spilled = dict(db.execute("SELECT game_id, LENGTH(data) FROM sessions").fetchall())
+        except sqlite3.OperationalError:  # 테이블이 아직 없음
+            pass
+        finally:
+            db.close()
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        # 처음 내보낼 때(또는 파일이 이미 있으면 생성할 때) writer 스레드를 띄웁니다. 잠금 안에서 호출
+        if self._queue is None:
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _put(self, item):
+        self._start()
+        if item[0] == "delete":
+            self._spilled.pop(item[1], None)
+        self._queue.put(item)
+
+    def _spill(self, game_id):
+        """세션을 메모리에서 빼고 writer 스레드에 쓰기를 맡깁니다. 직렬화와 SQLite 쓰기는 잠금 밖(writer)에서 합니다."""
+        session = self._sessions.pop(game_id)
+        self._touched.pop(game_id, None)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(game_id)
+        if self.path is None:
+            return
+        token = object()
+        self._spilling[game_id] = (token, session)
+        self._put(("spill", game_id, token, session))
+
+    # --- writer 스레드 ---
+
+    def _run(self):
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sessions (game_id TEXT PRIMARY KEY, data BLOB, updated_at REAL)")
+        db.commit()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                db.close()
+                return
+            if isinstance(item, _Flush):
+                item.done.set()
+            elif item[0] == "spill":
+                self._write_spill(db, *item[1:])
+            elif item[0] == "delete":
+                db.execute("DELETE FROM sessions WHERE game_id = ?", (item[1],))
+                db.commit()
+            elif item[0] == "expire":
+                expired = [row[0] for row in db.execute("SELECT game_id FROM sessions WHERE updated_at < ?", (item[1],))]
+                db.executemany("DELETE FROM sessions WHERE game_id = ?", [(game_id,) for game_id in expired])
+                db.commit()
+                with self._lock:
+                    for game_id in expired:
+                        self._spilled.pop(game_id, None)
+                self.expired += len(expired)
+
+    def _current(self, game_id, token):
+        entry = self._spilling.get(game_id)
+        return entry is not None and entry[0] is token
+
+    def _write_spill(self, db, game_id, token, session):
+        with self._lock:
+            if not self._current(game_id, token):
+                return  # 쓰기 전에 다시 불려 갔거나 지워졌습니다
+        try:
+            blob = zlib.compress(pickle.dumps(self.serialize(game_id, session), protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            # 쓰지 못한 세션은 버리지 않고 메모리로 되돌립니다
+            with self._lock:
+                if self._current(game_id, token):
+                    del self._spilling[game_id]
+                    self._sessions[game_id] = session
+                    self._touch(game_id)
+                self.spill_errors += 1
+            return
+        db.execute("INSERT OR REPLACE INTO sessions (game_id, data, updated_at) VALUES (?, ?, ?)", (game_id, blob, time.time()))
+        db.commit()
+        with self._lock:
+            if self._current(game_id, token):
+                del self._spilling[game_id]
+                self._spilled[game_id] = len(blob)
+                self.spilled_bytes += len(blob)
+                return
+            stale = game_id not in self._spilling
+        if stale:
+            # 쓰는 동안 다시 불려 갔거나 지워졌으므로 방금 쓴 행은 낡았습니다 (다시 내보냈으면 뒤의 쓰기가 덮어씁니다)
+            db.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+            db.commit()
+
+    def flush(self, timeout=None):
+        """지금까지 내보내거나 지운 세션이 SQLite에 반영될 때까지 기다립니다."""
+        if self._queue is None:
+            return True
+        request = _Flush()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        if self._queue is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _load(self, game_id):
+        """디스크에 있으면 읽어 돌려줍니다. 스레드마다 짧게 연결을 열고 닫습니다 (잠금 밖에서 호출)."""
+        with self._lock:
+            if game_id not in self._spilled:
+                return None
+        db = self._connect()
+        try:
+            row = db.execute("SELECT data FROM sessions WHERE game_id = ?", (game_id,)).fetchone()
+        finally:
+            db.close()
+        return pickle.loads(zlib.decompress(row[0])) if row else None
+
+    def _touch(self, game_id):
+        self._sessions.move_to_end(game_id)
+        self._touched[game_id] = time.monotonic()
+
+    def _enforce_cap(self):
+        if len(self._sessions) <= self.max_resident:
+            return
+        # 방금 넣거나 읽은 세션(맨 뒤)은 호출한 쪽이 곧바로 쓰므로 내보내지 않습니다
+        for game_id in list(self._sessions)[:-1]:
+            if len(self._sessions) <= self.max_resident:
+                break
+            if game_id not in self._pins:
+                self._spill(game_id)
+
+    @contextmanager
+    def pinned(self, game_id):
+        """블록이 끝날 때까지 이 세션을 메모리에 붙잡아 둡니다 (중첩 가능). 끝나면 밀린 상한 정리를 합니다."""
+        with self._lock:
+            self._pins[game_id] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[game_id] -= 1
+                if self._pins[game_id] <= 0:
+                    del self._pins[game_id]
+                self._enforce_cap()
+
+    def sweep(self, force=False):
+        """오래 쓰지 않은 세션을 내보내고, 디스크에서 만료된 세션을 지웁니다. sweep_interval 초에 한 번만 실제로 돕니다.
+
+        내보내기와 만료 삭제는 writer 스레드에 맡기므로 호출한 쪽(이벤트 루프)은 기다리지 않습니다.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._swept_at < self.sweep_interval:
+                return
+            self._swept_at = now
+            for game_id in list(self._sessions):
+                if now - self._touched.get(game_id, now) < self.idle_timeout:
+                    break  # 사용 순서대로 정렬되어 있으므로 뒤쪽은 더 최근입니다
+                if game_id in self._pins:
+                    continue
+                self._spill(game_id)
+                self.idle_evictions += 1
+            if self._queue is not None:
+                self._put(("expire", time.time() - self.spill_ttl))
+
+    def _resident(self, game_id):
+        """메모리에 있거나, 내보냈지만 아직 디스크에 쓰이지 않았으면 메모리에 두고 돌려줍니다. 없으면 None."""
+        with self._lock:
+            if game_id not in self._sessions:
+                entry = self._spilling.pop(game_id, None)
+                if entry is None:
+                    return None
+                self._sessions[game_id] = entry[1]
+                self._touch(game_id)
+                self._enforce_cap()
+            else:
+                self._touch(game_id)
+            return self._sessions[game_id]
+
+    def _rehydrate(self, game_id):
+        """디스크(없으면 missing)에서 세션을 되살려 메모리에 올립니다. 읽기와 복원은 잠금 밖에서 합니다."""
+        state = self._load(game_id)
+        if state is not None:
+            session = self.restore(game_id, state)
+        elif self.missing is not None:
+            session = self.missing(game_id)
+        else:
+            session = None
+        if session is None:
+            raise KeyError(game_id)
+        with self._lock:
+            # 읽는 동안 다른 쪽이 먼저 올렸으면 그쪽을 씁니다
+            current = self._resident(game_id)
+            if current is not None:
+                return current
+            self._sessions[game_id] = session
+            self._touch(game_id)
+            if state is not None:
+                self.rehydrations += 1
+                self._put(("delete", game_id))
+            self._enforce_cap()
+        return session
+
+    async def aload(self, game_id):
+        """game_id 세션을 메모리에 올려 둡니다. 디스크 읽기와 복원은 스레드에서 하므로 이벤트 루프를 막지 않습니다.
+
+        없는 게임이면 아무것도 하지 않습니다 (이어지는 game_db[game_id]가 KeyError를 냅니다).
+        """
+        if self._resident(game_id) is None:
+            try:
+                await asyncio.to_thread(self._rehydrate, game_id)
+            except KeyError:
+                pass
+
+    def __getitem__(self, game_id):
+        session = self._resident(game_id)
+        if session is None:
+            session = self._rehydrate(game_id)
+        self.sweep()
+        return session
+
+    def __setitem__(self, game_id, session):
+        with self._lock:
+            self._spilling.pop(game_id, None)
+            self._sessions[game_id] = session
+            self._touch(game_id)
+            if self._queue is not None:
+                self._put(("delete", game_id))
+            self._enforce_cap()
+        self.sweep()
+
+    def __delitem__(self, game_id):
+        with self._lock:
+            found = game_id in self._spilled
+            found = self._sessions.pop(game_id, None) is not None or found
+            found = self._spilling.pop(game_id, None) is not None or found
+            self._touched.pop(game_id, None)
+            if self._queue is not None:
+                self._put(("delete", game_id))
+        if not found:
+            raise KeyError(game_id)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._sessions or game_id in self._spilling or game_id in self._spilled
+
+    def _game_ids(self):
+        with self._lock:
+            return list(dict.fromkeys([*self._sessions, *self._spilling, *self._spilled]))
+
+    def __iter__(self):
+        return iter(self._game_ids())
+
+    def __len__(self):
+        return len(self._game_ids())
+
+    def resident(self):
+        return len(self._sessions)
+
+    def stats(self, deep=False):
+        """메모리/디스크 사용 현황. deep=True면 메모리에 있는 세션을 직렬화해 크기를 잽니다(느림)."""
+        with self._lock:
+            stats = {
+                "resident": len(self._sessions),
+                "spilled": len(self._spilled),
+                "pending_spills": len(self._spilling),
+                "disk_bytes": sum(self._spilled.values()),
+                "evictions": self.evictions,
+                "idle_evictions": self.idle_evictions,
+                "rehydrations": self.rehydrations,
+                "expired": self.expired,
+                "spill_errors": self.spill_errors,
+                "pinned": len(self._pins),
+            }
+            resident = list(self._sessions.items())
+        if deep:
+            stats["resident_bytes"] = sum(
+                len(pickle.dumps(self.serialize(game_id, session), protocol=pickle.HIGHEST_PROTOCOL))
+                for game_id, session in resident
+            )
+        return stats
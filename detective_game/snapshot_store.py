@@ -0,0 +1,145 @@
+# -------------------------------------
+# 진행 중인 게임의 스냅샷 + write-ahead 저널
+# -------------------------------------
+from event_log import Event
+from game_ids import check_game_id
+import json
+import os
+import pickle
+import zlib
+
+# 저널 항목마다 통째로 기록하는 작은 상태값
+JOURNAL_FIELDS = ("turn", "turn_token", "player_db", "conversation_db", "person_player")
+
+
+class SnapshotStore:
+    """게임마다 snapshots/{game_id}.snap (전체 상태)과 {game_id}.wal (턴별 변경분 JSONL)을 남겨, 재시작 후에도 게임을 되살립니다.
+
+    checkpoint()는 핸들러가 응답하기 전에 호출합니다. 평소에는 지난 기록 이후 추가된 이벤트/로그 조각과
+    JOURNAL_FIELDS만 저널에 한 줄 붙이고(게임 길이와 무관한 비용), snapshot_every 개나 max_journal_bytes를 넘으면
+    전체 스냅샷을 새로 쓰고 저널을 비웁니다. 스냅샷은 임시 파일에 쓴 뒤 교체하므로 쓰는 중에 죽어도 이전 스냅샷이 남습니다.
+
+    serialize/restore는 SessionStore와 같은 훅(스토리에서 다시 만들 수 있는 값은 빼고/채우기)을 씁니다.
+    """
+
+    def __init__(self, directory="snapshots", snapshot_every=20, max_journal_bytes=256 * 1024, fsync=False,
+                 serialize=None, restore=None):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.max_journal_bytes = max_journal_bytes
+        self.fsync = fsync
+        self.serialize = serialize or (lambda game_id, session: session)
+        self.restore_session = restore or (lambda game_id, state: state)
+        self.snapshots = 0
+        self.journal_entries = 0
+        self.bytes_written = 0
+        self.restores = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self, game_id):
+        check_game_id(game_id)
+        return os.path.join(self.directory, f"{game_id}.snap"), os.path.join(self.directory, f"{game_id}.wal")
+
+    def _write(self, f, data):
+        f.write(data)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.bytes_written += len(data)
+
+    def checkpoint(self, game_id, session):
+        mark = session.get("checkpoint")
+        if mark is None or mark["entries"] >= self.snapshot_every or mark["journal_bytes"] >= self.max_journal_bytes:
+            self.snapshot(game_id, session)
+        else:
+            self._append(game_id, session, mark)
+
+    def _append(self, game_id, session, mark):
+        event_log = session["event_log"]
+        log = session["log_history"]
+        mark["seq"] += 1
+        entry = {
+            "seq": mark["seq"],
+            "events": [list(event) for event in event_log.events[mark["events"]:]],
+            "log": log.chunks[mark["chunks"]:],
+            "cursors": event_log.cursors,
+            **{field: session.get(field) for field in JOURNAL_FIELDS},
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.paths(game_id)[1], "ab") as f:
+            self._write(f, line)
+        mark["events"] = len(event_log.events)
+        mark["chunks"] = len(log.chunks)
+        mark["entries"] += 1
+        mark["journal_bytes"] += len(line)
+        self.journal_entries += 1
+
+    def snapshot(self, game_id, session):
+        """전체 상태를 새 스냅샷으로 쓰고 저널을 비웁니다."""
+        mark = session.setdefault("checkpoint", {"seq": 0})
+        mark.update(
+            seq=mark["seq"] + 1,
+            events=len(session["event_log"].events),
+            chunks=len(session["log_history"].chunks),
+            entries=0,
+            journal_bytes=0,
+        )
+        blob = zlib.compress(pickle.dumps(self.serialize(game_id, session), protocol=pickle.HIGHEST_PROTOCOL))
+        snap_path, wal_path = self.paths(game_id)
+        with open(snap_path + ".tmp", "wb") as f:
+            self._write(f, blob)
+        os.replace(snap_path + ".tmp", snap_path)
+        # 스냅샷보다 오래된 저널 항목은 seq로 걸러지므로, 비우기 전에 죽어도 복원 결과는 같습니다
+        open(wal_path, "wb").close()
+        self.snapshots += 1
+
+    def restore(self, game_id):
+        """스냅샷에 저널을 순서대로 적용해 세션을 되살립니다. 기록이 없으면 None."""
+        snap_path, wal_path = self.paths(game_id)
+        if not os.path.exists(snap_path):
+            return None
+        with open(snap_path, "rb") as f:
+            state = pickle.loads(zlib.decompress(f.read()))
+        mark = state["checkpoint"]
+        event_log = state["event_log"]
+        log = state["log_history"]
+        snapshot_cursors = dict(event_log.cursors)
+        if os.path.exists(wal_path):
+            with open(wal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # 쓰다가 죽은 마지막 줄
+                    if entry["seq"] <= mark["seq"]:
+                        continue
+                    for kind, actor, turn, text, visible_to in entry["events"]:
+                        event_log.events.append(Event(kind, actor, turn, text, tuple(visible_to) if visible_to is not None else None))
+                    for chunk in entry["log"]:
+                        log.append(chunk)
+                    event_log.cursors = entry["cursors"]
+                    for field in JOURNAL_FIELDS:
+                        if entry[field] is not None:
+                            state[field] = entry[field]
+                    mark.update(seq=entry["seq"], events=len(event_log.events), chunks=len(log.chunks),
+                                entries=mark["entries"] + 1, journal_bytes=mark["journal_bytes"] + len(line))
+
+        session = self.restore_session(game_id, state)
+        # 플레이어 맥락은 스냅샷 이후 읽어 간 이벤트를 같은 순서로 다시 넣어 맞춥니다
+        for player, context in session["context_db"].items():
+            context.extend(event_log.view(player, snapshot_cursors[player], event_log.cursors[player]))
+        self.restores += 1
+        return session
+
+    def discard(self, game_id):
+        for path in self.paths(game_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        return {
+            "snapshots": self.snapshots,
+            "journal_entries": self.journal_entries,
+            "bytes_written": self.bytes_written,
+            "restores": self.restores,
+        }
@@ -0,0 +1,72 @@
+# -------------------------------------
+# 다음 NPC 행동 추측 실행(speculative pre-generation)
+# -------------------------------------
+import asyncio
+
+
+class SpeculativeScheduler:
+    """턴이 끝나자마자 다음 NPC의 행동을 백그라운드에서 미리 생성해 둡니다.
+
+    미리 생성할 때의 게임 상태 fingerprint를 함께 보관하고, 실제로 그 턴이 시작될 때
+    fingerprint가 같으면 결과를 그대로 사용(hit), 다르면 버리고 다시 생성하도록 None을 돌려줍니다(invalidated).
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._loop = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def prefetch(self, game_id, player, fingerprint, coro_factory):
+        """실행 중인 이벤트 루프에서 coro_factory()를 태스크로 시작합니다. 이전 추측은 취소합니다."""
+        self.discard(game_id)
+        self._loop = asyncio.get_running_loop()
+        task = self._loop.create_task(coro_factory())
+        self._pending[game_id] = (player, fingerprint, task)
+
+    async def take(self, game_id, player, fingerprint):
+        """미리 생성한 결과를 꺼냅니다. 없거나 상태가 바뀌었으면 None."""
+        entry = self._pending.pop(game_id, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        spec_player, spec_fingerprint, task = entry
+        if spec_player != player or spec_fingerprint != fingerprint:
+            task.cancel()
+            self.invalidations += 1
+            return None
+        try:
+            result = await task
+        except Exception:
+            self.errors += 1
+            return None
+        self.hits += 1
+        return result
+
+    def discard(self, game_id):
+        """추측을 버립니다. 이벤트 루프 밖의 스레드(세션 저장소 writer, 동기 핸들러)에서 불러도 됩니다."""
+        entry = self._pending.pop(game_id, None)
+        if entry is None:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            entry[2].cancel()
+        elif not self._loop.is_closed():
+            # Task.cancel()은 스레드 안전하지 않으므로 태스크의 루프에 맡깁니다
+            self._loop.call_soon_threadsafe(entry[2].cancel)
+
+    def stats(self):
+        taken = self.hits + self.misses + self.invalidations + self.errors
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "hit_rate": self.hits / taken if taken else 0.0,
+            "pending": len(self._pending),
+        }
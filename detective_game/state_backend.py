@@ -0,0 +1,291 @@
+# -------------------------------------
+# 게임 상태 백엔드 (여러 워커 프로세스가 같은 게임을 이어서 처리하기 위한 공유 저장소 + 게임별 잠금)
+# -------------------------------------
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+import asyncio
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from game_ids import check_game_id
+
+
+class LockLost(RuntimeError):
+    """잠금(lease)이 만료되어 다른 워커가 가져갔습니다. 이 워커의 변경은 올리지 않습니다."""
+
+
+class Lease:
+    """lock()이 돌려주는 잠금 손잡이. 갱신에 실패했으면 lost가 True가 됩니다."""
+
+    def __init__(self, backend, game_id, owner):
+        self.backend = backend
+        self.game_id = game_id
+        self.owner = owner
+        self.lost = False
+
+    def check(self):
+        """아직 이 잠금의 주인인지 확인하고(한 번 더 갱신), 아니면 LockLost. 저장하기 직전에 부릅니다."""
+        if self.lost or not self.backend.renew(self.game_id, self.owner):
+            self.lost = True
+            raise LockLost(f"lock on game {self.game_id} expired and was taken by another worker")
+
+
+class StateBackend(ABC):
+    """game_id → (version, 직렬화된 세션 blob) 저장소와 게임별 프로세스 간 잠금.
+
+    워커는 게임을 잠근 뒤 version()을 자기 메모리의 버전과 비교해 다르면 load()로 새로 읽고,
+    핸들러가 끝나면 save()로 올린 다음 잠금을 풉니다. 그래서 어느 워커가 요청을 받아도 결과가 같습니다.
+
+    구현해야 하는 메서드는 load/save/delete/version/try_lock/unlock 입니다. Redis 같은 서비스라면
+    GET/SET(+INCR)/DEL 과 SET key owner NX PX ttl / 소유자 확인 후 DEL 로 그대로 옮길 수 있습니다.
+    만료가 있는 잠금이면 renew도 구현합니다 (소유자 확인 후 PEXPIRE). lock()을 잡고 있는 동안
+    lock_ttl의 1/3마다 갱신하므로 스트리밍처럼 오래 걸리는 핸들러도 잠금을 잃지 않습니다.
+    """
+
+    lock_ttl = 300.0  # 잠근 워커가 죽어도 이 시간이 지나면 다른 워커가 가져갈 수 있습니다
+
+    def __init__(self):
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.renewals = 0
+        self.locks_lost = 0
+
+    @abstractmethod
+    def load(self, game_id):
+        """(version, blob) 또는 None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, game_id, blob):
+        """저장하고 새 version을 돌려줍니다."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, game_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def version(self, game_id):
+        """저장된 version 또는 None. load보다 싸야 합니다."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def try_lock(self, game_id, owner):
+        raise NotImplementedError
+
+    @abstractmethod
+    def unlock(self, game_id, owner):
+        raise NotImplementedError
+
+    def renew(self, game_id, owner):
+        """잠금 만료 시간을 다시 lock_ttl 뒤로 미룹니다. 아직 주인이면 True. 만료가 없는 잠금(flock)은 그대로 True."""
+        return True
+
+    @asynccontextmanager
+    async def lock(self, game_id, timeout=None):
+        """게임 하나를 잠급니다. 다른 워커/코루틴이 잡고 있으면 이벤트 루프를 막지 않고 기다립니다."""
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        start = time.monotonic()
+        delay = 0.001
+        while not self.try_lock(game_id, owner):
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"game {game_id} is locked")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.lock_waits += 1
+            self.lock_wait_seconds += waited
+        lease = Lease(self, game_id, owner)
+        renewer = asyncio.create_task(self._keep_alive(lease))
+        try:
+            yield lease
+        finally:
+            renewer.cancel()
+            self.unlock(game_id, owner)
+
+    async def _keep_alive(self, lease):
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            if not self.renew(lease.game_id, lease.owner):
+                lease.lost = True
+                self.locks_lost += 1
+                return
+            self.renewals += 1
+
+    def stats(self):
+        return {
+            "lock_waits": self.lock_waits,
+            "lock_wait_seconds": self.lock_wait_seconds,
+            "lock_renewals": self.renewals,
+            "locks_lost": self.locks_lost,
+        }
+
+
+class SQLiteStateBackend(StateBackend):
+    """로컬 SQLite 파일 하나를 여러 프로세스가 함께 씁니다(WAL). 잠금은 만료 시간이 있는 lease 행입니다."""
+
+    def __init__(self, path="game_state.db"):
+        super().__init__()
+        self.path = path
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        # 워커 프로세스마다 자기 연결을 만듭니다
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, version INTEGER, data BLOB, updated_at REAL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS locks (game_id TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+            self._pid = os.getpid()
+        return self._db
+
+    def load(self, game_id):
+        with self._lock:
+            row = self._conn().execute("SELECT version, data FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def save(self, game_id, blob):
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT INTO games (game_id, version, data, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(game_id) DO UPDATE SET version = version + 1, data = excluded.data, updated_at = excluded.updated_at",
+                (game_id, blob, time.time()),
+            )
+            return db.execute("SELECT version FROM games WHERE game_id = ?", (game_id,)).fetchone()[0]
+
+    def delete(self, game_id):
+        with self._lock:
+            self._conn().execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+
+    def version(self, game_id):
+        with self._lock:
+            row = self._conn().execute("SELECT version FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def try_lock(self, game_id, owner):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn().execute(
+                "INSERT INTO locks (game_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(game_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE locks.expires_at < ?",
+                (game_id, owner, now + self.lock_ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def unlock(self, game_id, owner):
+        with self._lock:
+            self._conn().execute("DELETE FROM locks WHERE game_id = ? AND owner = ?", (game_id, owner))
+
+    def renew(self, game_id, owner):
+        with self._lock:
+            cursor = self._conn().execute(
+                "UPDATE locks SET expires_at = ? WHERE game_id = ? AND owner = ?",
+                (time.time() + self.lock_ttl, game_id, owner),
+            )
+            return cursor.rowcount == 1
+
+
+class FileStateBackend(StateBackend):
+    """디렉터리에 게임마다 {game_id}.state 파일(8바이트 version + blob)을 두고, {game_id}.lock 에 flock 을 겁니다.
+
+    잠근 프로세스가 죽으면 운영체제가 잠금을 풀어 줍니다. 같은 머신의 워커끼리(또는 공유 파일시스템) 쓸 수 있습니다.
+    """
+
+    def __init__(self, directory="game_state"):
+        super().__init__()
+        self.directory = directory
+        self._held = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, game_id, suffix):
+        check_game_id(game_id)
+        return os.path.join(self.directory, f"{game_id}.{suffix}")
+
+    def load(self, game_id):
+        try:
+            with open(self._path(game_id, "state"), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return int.from_bytes(data[:8], "big"), data[8:]
+
+    def save(self, game_id, blob):
+        version = (self.version(game_id) or 0) + 1
+        path = self._path(game_id, "state")
+        with open(path + ".tmp", "wb") as f:
+            f.write(version.to_bytes(8, "big"))
+            f.write(blob)
+        os.replace(path + ".tmp", path)
+        return version
+
+    def delete(self, game_id):
+        # 잠금 파일은 여기서 지우지 않습니다. 호출한 쪽이 아직 flock을 들고 있으므로, 지우면 다른 워커가 새 파일(inode)을
+        # 잠가 두 워커가 동시에 "잠금"을 갖게 됩니다. 끝난 게임의 잠금 파일은 unlock에서 잠금을 푼 뒤 지웁니다
+        try:
+            os.remove(self._path(game_id, "state"))
+        except FileNotFoundError:
+            pass
+
+    def version(self, game_id):
+        try:
+            with open(self._path(game_id, "state"), "rb") as f:
+                return int.from_bytes(f.read(8), "big")
+        except FileNotFoundError:
+            return None
+
+    def try_lock(self, game_id, owner):
+        path = self._path(game_id, "lock")
+        f = open(path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        # 파일을 연 뒤 잠그기 전에 다른 워커가 잠금 파일을 지웠으면(끝난 게임) 지금 잠근 것은 버려진 inode입니다
+        held = os.fstat(f.fileno())
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            current = None
+        if current is None or (current.st_dev, current.st_ino) != (held.st_dev, held.st_ino):
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+            return False
+        self._held[owner] = f
+        return True
+
+    def unlock(self, game_id, owner):
+        f = self._held.pop(owner, None)
+        if f is None:
+            return
+        if not os.path.exists(self._path(game_id, "state")):
+            # 끝난 게임: 잠금을 쥔 채로 파일을 지우고 풉니다. 기다리던 워커는 try_lock에서 inode가 바뀐 것을 보고 다시 시도합니다
+            try:
+                os.remove(self._path(game_id, "lock"))
+            except FileNotFoundError:
+                pass
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+def state_backend_from_env():
+    """STATE_BACKEND=sqlite:경로 | file:디렉터리. 지정하지 않으면 None(한 프로세스 안의 game_db만 사용)."""
+    spec = os.environ.get("STATE_BACKEND", "")
+    if not spec:
+        return None
+    kind, _, target = spec.partition(":")
+    if kind == "sqlite":
+        return SQLiteStateBackend(target or "game_state.db")
+    if kind == "file":
+        return FileStateBackend(target or "game_state")
+    raise ValueError(f"unknown STATE_BACKEND: {spec}")
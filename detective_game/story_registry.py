@@ -0,0 +1,159 @@
+# -------------------------------------
+# 스토리 에셋 레지스트리
+# -------------------------------------
+from dataclasses import dataclass
+from gamemanager import render_gamemanager_prompt
+from intent_router import IntentRouter
+from langchain_core.prompts import ChatPromptTemplate
+from types import MappingProxyType
+from world_index import WorldMap
+import json
+import os
+import threading
+import time
+
+GAME_PLAY_HUMAN_PROMPT = """다음은 현재게임의 정보 및 대화 맥락입니다:
+    - 나의 현재위치: {position}
+    - 이 장소에 있는 증거들: {evidences}
+    - 대화 가능한 캐릭터 목록: {player_list}
+    - 게임 맥락:{conversation}
+
+    다음 지시에 따릅니다:{next_action}
+    """
+
+
+@dataclass(frozen=True)
+class CompiledStory:
+    """storys/<name> 디렉터리와 공용 프롬프트 파일을 한 번 읽어 치환까지 끝낸 불변 번들.
+
+    여러 게임이 같은 객체를 공유하므로 player_dict, map_dict는 읽기 전용 매핑입니다.
+    """
+    name: str
+    version: tuple
+    player_dict: MappingProxyType
+    player_list: tuple
+    player_stories: MappingProxyType
+    map_dict: MappingProxyType
+    map_list: tuple
+    game_story_prompt: str
+    gamemanager_prompt: str
+    game_play_prompt: ChatPromptTemplate
+    world: WorldMap
+    intent_router: IntentRouter
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """freeze한 값을 json.dump 가능한 dict/list로 되돌립니다."""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def read_prompt(path):
+    with open(path) as f:
+        return "\n".join(f.readlines())
+
+
+class StoryRegistry:
+    """스토리별 CompiledStory를 보관합니다. 파일 mtime이 바뀌면 다시 컴파일하므로 작가가 스토리를 바로 수정할 수 있습니다.
+
+    mtime 확인(stat)은 스토리마다 check_interval 초에 한 번만 하므로, 평소 get()은 딕셔너리 조회입니다.
+    """
+
+    def __init__(self, story_dir="storys", prompt_dir=".", check_interval=1.0):
+        self.story_dir = story_dir
+        self.prompt_dir = prompt_dir
+        self.check_interval = check_interval
+        self._stories = {}
+        self._checked_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def paths(self, story_name):
+        story_path = os.path.join(self.story_dir, story_name)
+        return (
+            os.path.join(story_path, "private_story.json"),
+            os.path.join(story_path, "map.json"),
+            os.path.join(story_path, "story.txt"),
+            os.path.join(self.prompt_dir, "gamemanager_prompt.txt"),
+            os.path.join(self.prompt_dir, "character_system_prompt.txt"),
+        )
+
+    def version(self, story_name):
+        return tuple(os.stat(path).st_mtime_ns for path in self.paths(story_name))
+
+    def available(self):
+        return sorted(
+            name for name in os.listdir(self.story_dir)
+            if os.path.isfile(os.path.join(self.story_dir, name, "private_story.json"))
+        )
+
+    def compile(self, story_name):
+        """스토리 파일을 읽어 프롬프트 치환까지 끝낸 CompiledStory를 만듭니다."""
+        version = self.version(story_name)
+        private_story_path, map_path, story_path, gamemanager_path, character_path = self.paths(story_name)
+        with open(private_story_path) as f:
+            player_dict = json.load(f)
+            player_list = list(player_dict.keys())
+
+        with open(map_path) as f:
+            map_dict = json.load(f)
+            map_list = list(map_dict.keys())
+
+        game_story_prompt = read_prompt(story_path)
+        gamemanager_prompt = render_gamemanager_prompt(read_prompt(gamemanager_path), player_list, map_dict)
+
+        character_system_prompt = read_prompt(character_path)
+        character_system_prompt = character_system_prompt.replace("{game_story}",game_story_prompt)
+        character_system_prompt = character_system_prompt.replace("{player_list}",",".join(player_list))
+        character_system_prompt = character_system_prompt.replace("{map_list}",",".join(map_list))
+        game_play_prompt = ChatPromptTemplate.from_messages([
+            ("system", character_system_prompt),
+            ("human", GAME_PLAY_HUMAN_PROMPT),
+        ])
+
+        frozen_map_dict = freeze(map_dict)
+        world = WorldMap(frozen_map_dict)
+        return CompiledStory(
+            name=story_name,
+            version=version,
+            player_dict=freeze(player_dict),
+            player_list=tuple(player_list),
+            player_stories=MappingProxyType({name: "\n".join(lines) for name, lines in player_dict.items()}),
+            map_dict=frozen_map_dict,
+            map_list=tuple(map_list),
+            game_story_prompt=game_story_prompt,
+            gamemanager_prompt=gamemanager_prompt,
+            game_play_prompt=game_play_prompt,
+            world=world,
+            intent_router=IntentRouter(player_list, world),
+        )
+
+    def _story_lock(self, story_name):
+        with self._lock:
+            return self._locks.setdefault(story_name, threading.Lock())
+
+    def get(self, story_name):
+        story = self._stories.get(story_name)
+        now = time.monotonic()
+        if story is not None and now - self._checked_at.get(story_name, 0.0) < self.check_interval:
+            return story
+
+        # 같은 스토리를 동시에 여러 번 컴파일하지 않도록 스토리별로 잠급니다
+        with self._story_lock(story_name):
+            story = self._stories.get(story_name)
+            if story is None or story.version != self.version(story_name):
+                story = self.compile(story_name)
+                self._stories[story_name] = story
+            self._checked_at[story_name] = time.monotonic()
+            return story
@@ -0,0 +1,398 @@
+# -------------------------------------
+# 핫패스 계측 (span 타이밍, 토큰, tool 선택, 캐시 hit → Prometheus 텍스트 / OpenTelemetry JSON)
+# -------------------------------------
+from collections import OrderedDict, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.callbacks import BaseCallbackHandler
+from context_buffer import estimate_tokens
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "root", "start_ns", "end_ns", "attributes", "error", "_previous")
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.attributes = attributes
+        # 게임/턴/경로 정보는 부모에서 물려받아 하위 span도 게임별 집계와 tool 경로 라벨에 들어가게 합니다
+        if parent is not None:
+            for key in ("game_id", "turn", "route"):
+                if key in parent.attributes and key not in attributes:
+                    attributes[key] = parent.attributes[key]
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    """계측이 꺼져 있을 때 span() 이 돌려주는 객체. 아무것도 하지 않습니다."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _ActiveSpan:
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        parent = _current.get()
+        self.span = Span(self.name, parent, self.attributes)
+        self.span._previous = parent
+        _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        # 스트리밍 핸들러는 yield 사이에 다른 context에서 재개될 수 있어 reset(token) 대신 이전 값을 직접 되돌립니다
+        _current.set(self.span._previous)
+        self.tracer.end(self.span, exc)
+        return False
+
+
+class Tracer:
+    """span을 기록하고 이름별 지연 시간 히스토그램, 토큰/캐시 hit/tool 호출 카운터, 게임별 턴 분해를 유지합니다.
+
+    enabled=False면 span()은 미리 만든 no-op 객체를 돌려주므로 비용이 거의 없습니다.
+    export_path를 주면 끝난 span을 OTLP/JSON(ExportTraceServiceRequest 한 줄씩) 파일로 내보냅니다.
+    """
+
+    def __init__(self, enabled=False, service_name="detective_game", export_path=None, export_interval=2.0,
+                 turns_per_game=50, max_games=1024):
+        self.enabled = enabled
+        self.service_name = service_name
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.turns_per_game = turns_per_game
+        self.max_games = max_games
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> [bucket counts..., sum, count]
+        self._counters = defaultdict(float)  # (metric, labels) -> value
+        self._roots = {}  # 진행 중인 root span id -> 분해 기록
+        self._games = OrderedDict()  # game_id -> deque(턴 분해 기록)
+        self._pending = []
+        self._collectors = []
+        self._exporter = None
+        self._server = None
+
+    # ---- span 기록
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return _ActiveSpan(self, name, attributes)
+
+    def current(self):
+        return _current.get() if self.enabled else None
+
+    def annotate(self, **attributes):
+        """지금 실행 중인 span에 속성을 더합니다 (예: 캐시 모듈이 cache_hit 표시)."""
+        if self.enabled:
+            span = _current.get()
+            if span is not None:
+                span.set(**attributes)
+
+    def start(self, name, parent=None, **attributes):
+        """with 블록으로 감쌀 수 없는 곳(콜백)에서 쓰는 span 시작. 부모가 없으면 현재 span 아래에 둡니다."""
+        return Span(name, parent if parent is not None else _current.get(), attributes)
+
+    def end(self, span, error=None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = repr(error)
+        duration = span.duration
+        attributes = span.attributes
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [0] * (len(DURATION_BUCKETS) + 2)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += duration
+            histogram[-1] += 1
+            if "tokens_in" in attributes:
+                self._counters[("tokens_total", (("span", span.name), ("direction", "in")))] += attributes["tokens_in"]
+            if "tokens_out" in attributes:
+                self._counters[("tokens_total", (("span", span.name), ("direction", "out")))] += attributes["tokens_out"]
+            if "cache_hit" in attributes:
+                result = "hit" if attributes["cache_hit"] else "miss"
+                self._counters[("cache_lookups_total", (("span", span.name), ("result", result)))] += 1
+            if "tool" in attributes:
+                self._counters[("tool_calls_total", (("tool", attributes["tool"]), ("route", attributes.get("route", "agent"))))] += 1
+            if span.error is not None:
+                self._counters[("span_errors_total", (("span", span.name),))] += 1
+            self._record_breakdown(span, duration)
+            if self.export_path:
+                self._pending.append(span)
+        if self.export_path and self._exporter is None:
+            self._start_exporter()
+
+    def _record_breakdown(self, span, duration):
+        if span.root is not span:
+            if span.root.end_ns is not None:
+                return  # 핸들러가 끝난 뒤에 끝난 백그라운드 작업(추측 실행 등)
+            record = self._roots.get(span.root.span_id)
+            if record is None:
+                record = self._roots[span.root.span_id] = {
+                    "spans": defaultdict(float), "direct": 0.0, "tokens_in": 0, "tokens_out": 0, "cache_hits": 0, "tools": [],
+                }
+            record["spans"][span.name] += duration
+            if span.parent is span.root:
+                record["direct"] += duration
+            record["tokens_in"] += span.attributes.get("tokens_in", 0)
+            record["tokens_out"] += span.attributes.get("tokens_out", 0)
+            record["cache_hits"] += 1 if span.attributes.get("cache_hit") else 0
+            if "tool" in span.attributes:
+                record["tools"].append(span.attributes["tool"])
+            return
+        record = self._roots.pop(span.span_id, None)
+        game_id = span.attributes.get("game_id")
+        if not game_id:
+            return
+        turns = self._games.pop(game_id, None) or deque(maxlen=self.turns_per_game)
+        self._games[game_id] = turns
+        while len(self._games) > self.max_games:
+            self._games.popitem(last=False)
+        turns.append({
+            "handler": span.name,
+            "turn": span.attributes.get("turn"),
+            "started_at": span.start_ns / 1e9,
+            "total": duration,
+            "spans": dict(record["spans"]) if record else {},
+            # 하위 span으로 잡히지 않은 핸들러 자체 시간 (잠금 대기, 상태 갱신 등)
+            "other": max(duration - record["direct"], 0.0) if record else duration,
+            "tokens_in": record["tokens_in"] if record else 0,
+            "tokens_out": record["tokens_out"] if record else 0,
+            "cache_hits": record["cache_hits"] if record else 0,
+            "tools": record["tools"] if record else [],
+            "error": span.error,
+        })
+
+    # ---- 게임별 턴 분해
+    def turn_breakdown(self, game_id):
+        """game_id의 최근 핸들러 호출별 시간 분해 (오래된 것부터)"""
+        with self._lock:
+            return list(self._games.get(game_id, ()))
+
+    def live_games(self):
+        with self._lock:
+            return list(self._games)
+
+    def forget(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def add_collector(self, prefix, collect):
+        """/metrics 를 만들 때 collect()가 돌려주는 dict의 숫자 값을 {prefix}_{key} gauge로 함께 내보냅니다."""
+        self._collectors.append((prefix, collect))
+
+    # ---- Prometheus 텍스트
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            histograms = {name: list(values) for name, values in self._histograms.items()}
+            counters = dict(self._counters)
+            live_games = len(self._games)
+        lines.append("# TYPE detective_span_duration_seconds histogram")
+        for name, values in sorted(histograms.items()):
+            # 버킷 값은 기록할 때부터 누적(le 이하 전부)입니다
+            for i, bound in enumerate(DURATION_BUCKETS):
+                lines.append(f'detective_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {values[i]}')
+            lines.append(f'detective_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {values[-1]}')
+            lines.append(f'detective_span_duration_seconds_sum{{span="{name}"}} {values[-2]}')
+            lines.append(f'detective_span_duration_seconds_count{{span="{name}"}} {values[-1]}')
+        by_metric = defaultdict(list)
+        for (metric, labels), value in counters.items():
+            by_metric[metric].append((labels, value))
+        for metric, samples in sorted(by_metric.items()):
+            lines.append(f"# TYPE detective_{metric} counter")
+            for labels, value in sorted(samples):
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"detective_{metric}{{{label_text}}} {value}")
+        lines.append("# TYPE detective_traced_games gauge")
+        lines.append(f"detective_traced_games {live_games}")
+        for prefix, collect in self._collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE detective_{prefix}_{key} gauge")
+                    lines.append(f"detective_{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    # ---- OpenTelemetry JSON
+    def otlp_request(self, spans):
+        """span 목록을 OTLP/JSON ExportTraceServiceRequest 형태로 만듭니다."""
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "detective_game.tracing"},
+                    "spans": [{
+                        "traceId": f"{span.trace_id:032x}",
+                        "spanId": f"{span.span_id:016x}",
+                        **({"parentSpanId": f"{span.parent.span_id:016x}"} if span.parent is not None else {}),
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns),
+                        "attributes": [{"key": key, "value": value(v)} for key, v in span.attributes.items() if v is not None],
+                        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+                    } for span in spans],
+                }],
+            }]
+        }
+
+    def flush(self):
+        """쌓인 span을 export_path에 한 줄(요청 하나)로 씁니다."""
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if spans and self.export_path:
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.otlp_request(spans), ensure_ascii=False) + "\n")
+
+    def _start_exporter(self):
+        with self._lock:
+            if self._exporter is not None:
+                return
+            self._exporter = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+        self._exporter.start()
+        atexit.register(self.flush)
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.export_interval)
+            self.flush()
+
+    # ---- /metrics 서버
+    def serve_metrics(self, port, host="127.0.0.1"):
+        """/metrics (Prometheus 텍스트)와 /games/{game_id} (턴 분해 JSON)를 내보내는 작은 HTTP 서버를 띄웁니다."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = tracer.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+                elif self.path.startswith("/games/"):
+                    game_id = self.path[len("/games/"):]
+                    body, content_type = json.dumps(tracer.turn_breakdown(game_id), ensure_ascii=False).encode("utf-8"), "application/json"
+                elif self.path == "/games":
+                    body, content_type = json.dumps(tracer.live_games()).encode("utf-8"), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        return self._server
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """langchain 콜백으로 모델 호출과 tool 실행을 span으로 기록합니다. Agent 안에서 고른 tool과 토큰 수가 여기서 잡힙니다."""
+
+    run_inline = True
+    # 쓰지 않는 이벤트는 langchain이 넘기지 않도록 합니다 (체인 단계마다 오는 이벤트가 대부분의 비용).
+    # tool 이벤트는 ignore_agent에 묶여 있어 그것은 켜 둡니다
+    ignore_chain = True
+    ignore_retriever = True
+    ignore_retry = True
+    ignore_custom_event = True
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, name, **attributes):
+        with self._lock:
+            parent = self._spans.get(parent_run_id)
+        span = self.tracer.start(name, parent, **attributes)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def _end(self, run_id, error=None, **attributes):
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.set(**attributes)
+            self.tracer.end(span, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        tokens = sum(estimate_tokens(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, parent_run_id, "llm.chat", tokens_in=tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        tokens = sum(estimate_tokens(generation.text) for generations in response.generations for generation in generations)
+        self._end(run_id, tokens_out=tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = serialized.get("name", "tool")
+        self._start(run_id, parent_run_id, f"tool.{name}", tool=name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+# 프로세스 전체에서 하나를 씁니다. TRACING=1 이면 켜지고, TRACE_FILE을 주면 OTLP/JSON 파일로 내보냅니다
+tracer = Tracer(
+    enabled=os.environ.get("TRACING", "0") == "1",
+    export_path=os.environ.get("TRACE_FILE") or None,
+)
+tracing_callbacks = [TracingCallbackHandler(tracer)]
+
+
+def trace_config():
+    """Agent/tool 호출에 넘길 langchain config. 계측이 꺼져 있으면 None."""
+    return {"callbacks": tracing_callbacks} if tracer.enabled else None
@@ -0,0 +1,73 @@
+# -------------------------------------
+# 장소/플레이어/증거 색인
+# -------------------------------------
+from collections import defaultdict
+
+
+class WorldMap:
+    """스토리 지도의 불변 색인. 스토리마다 한 번 만들어 모든 게임이 공유합니다."""
+
+    def __init__(self, map_dict):
+        self.map_dict = map_dict
+        self.location_list = tuple(map_dict.keys())
+        self.locations = frozenset(self.location_list)
+        self.evidence_lists = {location: tuple(evidences.keys()) for location, evidences in map_dict.items()}
+        self.evidence_names = {location: frozenset(names) for location, names in self.evidence_lists.items()}
+
+    def is_location(self, location):
+        return location in self.locations
+
+    def evidences(self, location):
+        return self.evidence_lists[location]
+
+    def has_evidence(self, location, evidence):
+        return evidence in self.evidence_names[location]
+
+    def evidence_info(self, location, evidence):
+        return self.map_dict[location][evidence]
+
+
+class WorldIndex:
+    """한 게임의 장소 → 플레이어 집합 색인. 이동할 때마다 증분 갱신하므로 조회가 O(1)입니다."""
+
+    def __init__(self, world_map, players, start_location):
+        self.world_map = world_map
+        self.rank = {player: i for i, player in enumerate(players)}
+        self.positions = {player: start_location for player in players}
+        self.occupants = defaultdict(set)
+        self.occupants[start_location].update(players)
+
+    @classmethod
+    def from_positions(cls, world_map, positions):
+        """저장해 둔 {player: 위치}로 색인을 다시 만듭니다 (player 순서는 positions 순서)."""
+        players = list(positions)
+        index = cls(world_map, [], None)
+        index.occupants.clear()
+        index.rank = {player: i for i, player in enumerate(players)}
+        index.positions = dict(positions)
+        for player, location in positions.items():
+            index.occupants[location].add(player)
+        return index
+
+    def position(self, player):
+        return self.positions[player]
+
+    def move(self, player, location):
+        """player를 location으로 옮기고, talkable이 바뀐 플레이어(출발지와 도착지에 있던 사람) 목록을 반환합니다."""
+        old_location = self.positions[player]
+        self.positions[player] = location
+        if old_location == location:
+            return list(self.occupants[location])
+        self.occupants[old_location].discard(player)
+        if not self.occupants[old_location]:
+            del self.occupants[old_location]
+        self.occupants[location].add(player)
+        return list(self.occupants.get(old_location, ())) + list(self.occupants[location])
+
+    def occupants_of(self, location):
+        return self.occupants.get(location, set())
+
+    def talkable(self, player):
+        """player와 같은 장소에 있는 다른 플레이어들 (게임 플레이어 순서)"""
+        others = self.occupants_of(self.positions[player]) - {player}
+        return sorted(others, key=self.rank.__getitem__)
@@ -0,0 +1,103 @@
+# -------------------------------------
+# 요청 fast-path 파서 벤치마크 (기록된 요청 코퍼스)
+#   python bench_intent_router.py --corpus bench_requests.jsonl --latency 0.2
+# -------------------------------------
+# 1) 파서만: 적중률, 오분류, 파싱 시간
+# 2) 그래프 전체: 가짜 모델(호출당 --latency 초)로 INTENT_ROUTER 끄고/켜고 같은 요청을 돌려
+#    요청당 평균 지연과 절약한 시간을 비교하고, 두 경우의 마지막 잔액이 같은지 확인합니다.
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["AGENT_VERBOSE"] = "0"
+os.environ.setdefault("LEDGER_DB", os.path.join(tempfile.mkdtemp(), "ledger.db"))
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def matches(intent, expected):
+    if expected is None or expected["tool"] != intent.tool:
+        return False
+    return all(intent.args.get(key) == value for key, value in expected.items() if key != "tool")
+
+
+def parse_report(router, corpus, repeat):
+    """파서만 돌려 적중률, 정확도, 파싱 시간을 봅니다."""
+    hits = correct = wrong = 0
+    for item in corpus:
+        intent = router.route(item["text"])
+        if intent is None:
+            continue
+        hits += 1
+        if matches(intent, item["expected"]):
+            correct += 1
+        else:
+            wrong += 1
+            print(f"  오분류: {item['text']!r} -> {intent.tool}({intent.args})")
+
+    routable = sum(1 for item in corpus if item["expected"])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in corpus:
+            router.route(item["text"])
+    parse_us = (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+    print(f"requests         : {len(corpus)} (fast-path 대상 {routable})")
+    print(f"fast-path hits   : {hits} ({hits / len(corpus) * 100:.1f} %), 정답 {correct}, 오분류 {wrong}")
+    print(f"recall           : {correct / routable * 100 if routable else 0.0:.1f} %")
+    print(f"parse            : {parse_us:.1f} us/request")
+
+
+async def run_requests(graph, corpus, user_id, label):
+    latencies = []
+    for n, item in enumerate(corpus):
+        start = time.perf_counter()
+        await graph.ainvoke({
+            "user_input": item["text"],
+            "request_id": f"{label}-{n}",
+            "user_id": user_id,
+            "chat_history": [],
+        })
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def e2e_report(main, label, corpus, enabled):
+    main.INTENT_ROUTER = enabled
+    main.router_stats.reset()
+    user_id = main.ledger.create_user(f"bench-{label}", age=main.DEFAULT_AGE, balance=main.DEFAULT_MONEY)
+    latencies = sorted(asyncio.run(run_requests(main.get_graph(), corpus, user_id, label)))
+    mean = sum(latencies) / len(latencies)
+    router = main.router_stats.summary()
+    print(
+        f"{label:<16} : mean {mean * 1000:>7.1f} ms, p50 {latencies[len(latencies) // 2] * 1000:>7.1f} ms"
+        f" | hit rate {router['hit_rate'] * 100:>5.1f} %, saved {router['saved_seconds']:.2f} s"
+    )
+    return mean, main.ledger.balance(user_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="bench_requests.jsonl")
+    parser.add_argument("--latency", type=float, default=0.2, help="가짜 모델 호출 한 번의 지연(초)")
+    parser.add_argument("--repeat", type=int, default=200, help="파싱 시간 측정 반복 횟수")
+    args = parser.parse_args()
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+
+    import main
+
+    corpus = load_corpus(args.corpus)
+    parse_report(main.intent_router, corpus, args.repeat)
+    print()
+    agent, agent_balance = e2e_report(main, "agent only", corpus, False)
+    routed, routed_balance = e2e_report(main, "intent router", corpus, True)
+    print(f"saved per request: {(agent - routed) * 1000:.1f} ms ({(1 - routed / agent) * 100:.1f} %)")
+    # 가짜 모델은 과거형('입금했어')도 입금으로 읽으므로, fast-path가 넘긴 요청까지 같은 결과여야 합니다
+    print(f"final balance    : agent only {agent_balance:,}, intent router {routed_balance:,} -> "
+          f"{'same' if agent_balance == routed_balance else 'DIFFERENT'}")
@@ -0,0 +1,162 @@
+# -------------------------------------
+# 원장 부하 테스트 (거래 내역이 수백만 건일 때 기록/조회 지연)
+#   python bench_ledger.py --sizes 100000,1000000,3000000
+# -------------------------------------
+# 크기마다 거래 내역을 그 건수까지 채운 뒤(절반은 한 사용자에게 몰아서) Ledger API의 지연을 잽니다.
+#   record      : 입금/출금 한 건 (잔액 갱신 + 거래 추가, 한 트랜잭션). 채운 거래는 과거 시각이라 지금 시각의 기록 뒤에
+#                 이어 붙일 수 없으므로, 채우기에 쓰지 않는 사용자들에게 씁니다 (같은 테이블과 색인)
+#   balance     : 현재 잔액
+#   latest page : 최근 20건
+#   deep page   : 내역 한가운데에서 before 커서로 20건
+#   day range   : 하루 동안의 거래 (최대 100건)
+#   balance_at  : 임의 시점의 잔액
+#   month totals: 30일 동안의 입금/출금 합계 (기간 안의 행을 모두 읽습니다)
+# 비교용으로 예전 방식(메모리 리스트 전체를 str())과 색인 없이 최근 20건을 찾는 쿼리도 잽니다.
+# 채우기는 벤치마크 안에서 executemany로 바로 넣습니다 (record를 수백만 번 부르면 너무 오래 걸립니다).
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from ledger import Ledger, format_ts
+
+DAY = 24 * 3600 * 1_000_000
+SPAN = 365 * DAY  # 채운 거래는 지난 1년 동안 고르게 흩어져 있습니다
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+class Seeder:
+    """Ledger와 같은 규칙(잔액이 음수가 되지 않고, 행마다 running balance, 사용자별로 증가하는 ts)으로 행을 채웁니다."""
+
+    def __init__(self, path, user_ids, hot_user, hot_share, max_size, seed):
+        self.path = path
+        self.user_ids = user_ids
+        self.hot_user = hot_user
+        self.hot_share = hot_share
+        self.max_size = max_size
+        self.random = random.Random(seed)
+        self.balances = {user_id: 0 for user_id in user_ids}
+        self.counts = {user_id: 0 for user_id in user_ids}
+        self.last_ts = {user_id: 0 for user_id in user_ids}
+        self.start_ts = int((time.time() - 400 * 24 * 3600) * 1_000_000)
+        self.rows = 0
+
+    def fill(self, size, chunk=200_000):
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA synchronous=NORMAL")
+        while self.rows < size:
+            batch = []
+            for i in range(self.rows, min(size, self.rows + chunk)):
+                user_id = self.hot_user if self.random.random() < self.hot_share else self.random.choice(self.user_ids)
+                change = self.random.randrange(-30_000, 50_000, 100)
+                if self.balances[user_id] + change < 0:
+                    change = -change
+                self.balances[user_id] += change
+                self.counts[user_id] += 1
+                ts = self.start_ts + i * SPAN // self.max_size
+                self.last_ts[user_id] = ts
+                batch.append((user_id, ts, change, self.balances[user_id]))
+            db.execute("BEGIN")
+            db.executemany("INSERT INTO transactions (user_id, ts, change, balance) VALUES (?, ?, ?, ?)", batch)
+            db.executemany(
+                "UPDATE users SET balance = ?, tx_count = ?, last_ts = ? WHERE user_id = ?",
+                [(self.balances[u], self.counts[u], self.last_ts[u], u) for u in self.user_ids],
+            )
+            db.execute("COMMIT")
+            self.rows += len(batch)
+        db.close()
+
+
+def old_style_seconds(count):
+    """예전 user_db["transaction_history"] 리스트를 str()로 돌려주는 데 걸리는 시간"""
+    history = [
+        {"timestamp": datetime.now().isoformat(timespec="seconds"), "change": 10000, "balance": 50000 + 10000 * i}
+        for i in range(count)
+    ]
+    start = time.perf_counter()
+    text = str(history)
+    return time.perf_counter() - start, len(text)
+
+
+def report(name, stats):
+    print(f"  {name:<13} mean {stats['mean'] * 1e6:9.1f} us, p50 {stats['p50'] * 1e6:9.1f} us, p99 {stats['p99'] * 1e6:9.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100000,1000000,3000000", help="쉼표로 구분한 전체 거래 수")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--hot-share", type=float, default=0.5, help="한 사용자에게 몰리는 거래 비율")
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--baseline-max", type=int, default=1_000_000, help="예전 방식 비교에 쓸 최대 내역 수 (메모리)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.db")
+        ledger = Ledger(path)
+        hot_user = ledger.create_user("hot", age=30)
+        user_ids = [hot_user] + [ledger.create_user(f"user{i}", age=20 + i % 50) for i in range(args.users - 1)]
+        writers = [ledger.create_user(f"writer{i}", balance=1_000_000) for i in range(10)]
+        seeder = Seeder(path, user_ids, hot_user, args.hot_share, max(sizes), args.seed)
+        rng = random.Random(args.seed)
+        for size in sizes:
+            start = time.perf_counter()
+            seeder.fill(size)
+            fill_seconds = time.perf_counter() - start
+            hot_count = seeder.counts[hot_user]
+            span = seeder.rows * SPAN // seeder.max_size  # 지금까지 채운 기간 (작은 크기에서는 1년의 앞부분만)
+            print(f"\n{size:,} transactions ({hot_count:,} for the hot user) | filled in {fill_seconds:.1f}s, "
+                  f"file {os.path.getsize(path) / 1e6:.0f} MB")
+
+            report("record", timed(lambda: ledger.record(rng.choice(writers), rng.choice((5000, -100))), args.repeat))
+            report("balance", timed(lambda: ledger.balance(rng.choice(user_ids)), args.repeat))
+            report("latest page", timed(lambda: ledger.history(hot_user, limit=20), args.repeat))
+            middle = ledger.history(hot_user, limit=1, end=(seeder.start_ts + span // 2) / 1e6)["items"][0]["id"]
+            report("deep page", timed(lambda: ledger.history(hot_user, limit=20, before=middle), args.repeat))
+
+            def day_range():
+                day = seeder.start_ts + rng.randrange(max(1, span // DAY)) * DAY
+                ledger.history(hot_user, limit=100, start=day / 1e6, end=(day + DAY) / 1e6)
+            report("day range", timed(day_range, args.repeat))
+            report("balance_at", timed(lambda: ledger.balance_at(hot_user, (seeder.start_ts + rng.randrange(span)) / 1e6), args.repeat))
+
+            def month_totals():
+                month = seeder.start_ts + rng.randrange(max(1, span - 30 * DAY))
+                ledger.totals(hot_user, start=month / 1e6, end=(month + 30 * DAY) / 1e6)
+            report("month totals", timed(month_totals, max(10, args.repeat // 20)))
+
+            # 비교: 색인 없이 최근 20건, 예전 방식의 전체 내역 str()
+            with sqlite3.connect(path) as raw:
+                scan = timed(lambda: raw.execute(
+                    "SELECT id, ts, change, balance FROM transactions NOT INDEXED WHERE user_id = ? ORDER BY ts DESC LIMIT 20",
+                    (rng.choice(user_ids),),
+                ).fetchall(), 5)
+            report("no index", scan)
+            count = min(hot_count, args.baseline_max)
+            seconds, length = old_style_seconds(count)
+            print(f"  old str()     {seconds * 1e3:9.1f} ms for {count:,} entries ({length / 1e6:.0f} MB of text per get_user_info call)")
+
+        start = time.perf_counter()
+        ok = all(ledger.verify(user_id) for user_id in user_ids + writers)
+        print(f"\nverify: balance == sum(change) == last running balance for all {len(user_ids) + len(writers)} users: {ok} "
+              f"({time.perf_counter() - start:.1f}s) | latest hot tx {format_ts(seeder.last_ts[hot_user])}")
+        ledger.close()
@@ -0,0 +1,172 @@
+# -------------------------------------
+# 원장 동시성 점검 (여러 프로세스 x 스레드가 같은 원장 파일에 동시에 이체 · 입출금 · 묶음 변경 · 재시도)
+#   python bench_ledger_concurrency.py --processes 2 --threads 8 --duration 10
+# -------------------------------------
+# 작업 섞기
+#   transfer : 두 사용자 사이 이체 (잔액이 모자라면 거절)
+#   deposit  : 키를 붙인 입금, withdraw: 키를 붙인 출금 (잔액이 모자라면 거절)
+#   batch    : 합이 0인 3~5건의 변경을 한 번에 (하나라도 모자라면 전부 거절)
+#   replay   : 이미 반영된 입출금을 같은 키로 다시 보냄 (같은 거래가 돌아와야 하고 잔액은 그대로)
+# 끝나면 확인합니다.
+#   잔액 합계 == 처음 합계 + 반영된 입금 - 반영된 출금 (이체와 묶음 변경은 합계를 바꾸지 않음)
+#   사용자마다 잔액 == 거래 합계 == 마지막 running balance, 음수 잔액 없음
+#   다시 보낸 요청이 모두 처음과 같은 거래를 돌려받았는지
+# 비교용 old dict: 예전 update_user_money처럼 딕셔너리에서 읽고-더하고-쓰기, 재시도는 그대로 한 번 더 반영합니다.
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from ledger import InsufficientFunds, Ledger
+
+INITIAL = 1_000_000
+OPERATIONS = ["transfer"] * 5 + ["deposit"] * 2 + ["withdraw", "batch", "replay"]
+
+
+def new_counts():
+    return {name: 0 for name in ("ops", "declined", "deposited", "withdrawn", "replays", "replay_mismatches", "transfers", "batches", "failures")}
+
+
+def worker(ledger, user_ids, deadline, seed, counts, lock):
+    rng = random.Random(seed)
+    local = new_counts()
+    applied = []  # (key, user_id, amount, 결과) 다시 보낼 후보
+    n = 0
+    while time.monotonic() < deadline:
+        operation = rng.choice(OPERATIONS)
+        n += 1
+        try:
+            if operation == "transfer":
+                a, b = rng.sample(user_ids, 2)
+                ledger.transfer(a, b, rng.randrange(1, 200_000))
+                local["transfers"] += 1
+            elif operation in ("deposit", "withdraw"):
+                key = f"{seed}:{n}"
+                amount = rng.randrange(1, 100_000) * (1 if operation == "deposit" else -1)
+                user_id = rng.choice(user_ids)
+                result = ledger.record(user_id, amount, key=key)
+                applied.append((key, user_id, amount, result))
+                local["deposited" if amount > 0 else "withdrawn"] += abs(amount)
+            elif operation == "batch":
+                users = rng.sample(user_ids, rng.randint(3, 5))
+                changes = [(user_id, rng.randrange(-150_000, 150_000)) for user_id in users[:-1]]
+                changes.append((users[-1], -sum(change for _, change in changes)))
+                ledger.record_batch(changes)
+                local["batches"] += 1
+            elif applied:
+                key, user_id, amount, result = rng.choice(applied)
+                replayed = ledger.record(user_id, amount, key=key)
+                local["replays"] += 1
+                if replayed != result:
+                    local["replay_mismatches"] += 1
+        except InsufficientFunds:
+            local["declined"] += 1
+        except Exception:
+            local["failures"] += 1
+        local["ops"] += 1
+    with lock:
+        for name, value in local.items():
+            counts[name] += value
+
+
+def run_process(path, user_ids, duration, threads, seed):
+    """한 프로세스: 자기 Ledger 연결 하나를 스레드들이 함께 씁니다."""
+    ledger = Ledger(path, allow_overdraft=False)
+    counts, lock = new_counts(), threading.Lock()
+    deadline = time.monotonic() + duration
+    workers = [
+        threading.Thread(target=worker, args=(ledger, user_ids, deadline, seed * 1000 + i, counts, lock))
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    ledger.close()
+    return counts
+
+
+def old_dict(threads, duration, replay_ratio, seed):
+    """예전 방식: user_db["money"] += amount, 재시도하면 한 번 더 반영"""
+    user_db = {"money": INITIAL, "transaction_history": []}
+    expected = [INITIAL]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def run(i):
+        rng = random.Random(seed * 1000 + i)
+        intended = 0
+        while time.monotonic() < deadline:
+            amount = rng.randrange(1, 100_000)
+            user_db["money"] += amount
+            user_db["transaction_history"].append({"change": amount, "balance": user_db["money"]})
+            intended += amount
+            if rng.random() < replay_ratio:  # 타임아웃 뒤 같은 툴 호출을 다시 보냄
+                user_db["money"] += amount
+                user_db["transaction_history"].append({"change": amount, "balance": user_db["money"]})
+        with lock:
+            expected[0] += intended
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    applied = sum(entry["change"] for entry in user_db["transaction_history"])
+    return {"expected": expected[0], "balance": user_db["money"], "history_sum": INITIAL + applied, "entries": len(user_db["transaction_history"])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="프로세스마다")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--switch-interval", type=float, default=1e-5, help="스레드 전환을 잦게 해서 경합을 드러냅니다")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    sys.setswitchinterval(args.switch_interval)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.db")
+        ledger = Ledger(path, allow_overdraft=False)
+        user_ids = [ledger.create_user(f"user{i}", balance=INITIAL) for i in range(args.users)]
+        initial_total = ledger.total_balance()
+
+        start = time.perf_counter()
+        if args.processes == 1:
+            results = [run_process(path, user_ids, args.duration, args.threads, args.seed)]
+        else:
+            with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+                results = pool.starmap(run_process, [
+                    (path, user_ids, args.duration, args.threads, args.seed + p) for p in range(args.processes)
+                ])
+        elapsed = time.perf_counter() - start
+        counts = new_counts()
+        for result in results:
+            for name, value in result.items():
+                counts[name] += value
+
+        expected_total = initial_total + counts["deposited"] - counts["withdrawn"]
+        actual_total = ledger.total_balance()
+        consistent = all(ledger.verify(user_id) for user_id in user_ids)
+        negative = sum(1 for user_id in user_ids if ledger.balance(user_id) < 0)
+        print(f"ledger      {args.processes} processes x {args.threads} threads, {args.users} users, {elapsed:.1f}s")
+        print(f"            ops {counts['ops']} ({counts['ops'] / elapsed:.0f}/s): transfers {counts['transfers']}, batches {counts['batches']}, "
+              f"replays {counts['replays']}, declined {counts['declined']}, unexpected errors {counts['failures']}")
+        print(f"            total {actual_total:,} vs expected {expected_total:,} -> {'conserved' if actual_total == expected_total else 'MISMATCH'}")
+        print(f"            per-user balance == history: {consistent}, negative balances: {negative}, "
+              f"replays that returned a different result: {counts['replay_mismatches']}")
+        ledger.close()
+
+    replay_ratio = counts["replays"] / max(1, counts["ops"] - counts["replays"])
+    old = old_dict(args.threads, min(args.duration, 3.0), replay_ratio, args.seed)
+    print(f"old dict    {args.threads} threads, {old['entries']} updates, same replay ratio ({replay_ratio:.0%})")
+    print(f"            double-applied by retries {old['history_sum'] - old['expected']:+,}, "
+          f"lost in read-modify-write races {old['balance'] - old['history_sum']:+,}")
+    ok = actual_total == expected_total and consistent and not negative and not counts["replay_mismatches"] and not counts["failures"]
+    sys.exit(0 if ok else 1)
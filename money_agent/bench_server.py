@@ -0,0 +1,134 @@
+# -------------------------------------
+# money_agent 서버 부하 테스트 (가짜 모델, 여러 세션이 동시에 대화)
+#   python bench_server.py --sessions 64 --duration 20 --inflight 1,8,64
+# -------------------------------------
+# 설정마다 server.py를 새 프로세스로 띄웁니다 (LLM_BACKEND=fake, 호출당 --latency 초, 요청당 모델 호출 2번).
+# 세션마다 앞 응답을 받고 나서 다음 메시지를 보냅니다 (입금/출금/잔액/내역). 일부는 같은 request_id로 한 번 더 보냅니다
+# (클라이언트 타임아웃 뒤 재시도). MAX_INFLIGHT=1은 예전 input() 루프처럼 요청을 하나씩 처리하는 경우입니다.
+# 끝나면 세션마다 원장 잔액 == 처음 잔액 + 보낸 입출금(재시도는 한 번만) 인지 확인합니다.
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_MONEY = 50000
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def start_server(args, inflight, tmp):
+    env = dict(
+        os.environ,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=str(args.latency),
+        AGENT_VERBOSE="0",
+        LEDGER_DB=os.path.join(tmp, f"ledger-{inflight}.db"),
+        MAX_INFLIGHT=str(inflight),
+        MAX_QUEUE=str(args.queue),
+    )
+    return subprocess.Popen(
+        [sys.executable, "server.py", "--port", str(args.port)],
+        env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, deadline):
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("server did not become ready")
+
+
+async def session_user(client, index, deadline, args, results):
+    rng = random.Random(index)
+    session = (await client.post("/sessions", json={"user": f"load{index}"})).json()
+    expected = START_MONEY
+    n = 0
+    while time.monotonic() < deadline:
+        n += 1
+        kind = rng.choice(["deposit", "deposit", "withdraw", "balance", "history"])
+        amount = rng.randrange(1, 50) * 100
+        text = {
+            "deposit": f"{amount}원 입금해줘",
+            "withdraw": f"{amount}원 출금해줘",
+            "balance": "잔액 알려줘",
+            "history": "최근 내역 보여줘",
+        }[kind]
+        request_id = f"{index}-{n}"
+        sends = 2 if rng.random() < args.retry_ratio else 1
+        results["retries"] += sends - 1
+        answered = None
+        for _ in range(sends):
+            start = time.perf_counter()
+            response = await client.post(f"/sessions/{session['session_id']}/messages", json={"text": text, "request_id": request_id})
+            if response.status_code != 200:
+                results["errors"][response.status_code] = results["errors"].get(response.status_code, 0) + 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            results["latencies"].append(time.perf_counter() - start)
+            answered = response.json()["response"]
+        # 두 번 보냈어도 한 번만 반영되어야 합니다
+        if answered is not None and kind in ("deposit", "withdraw") and "오류" not in answered:
+            expected += amount if kind == "deposit" else -amount
+        if args.think:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think)
+    user = (await client.get(f"/sessions/{session['session_id']}")).json()["user"]
+    results["mismatches"] += user["money"] != expected
+
+
+async def run(args, inflight):
+    limits = httpx.Limits(max_connections=args.sessions + 4, max_keepalive_connections=args.sessions + 4)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=300, limits=limits) as client:
+        await wait_ready(client, time.monotonic() + 120)
+        results = {"latencies": [], "errors": {}, "retries": 0, "mismatches": 0}
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            session_user(client, i, time.monotonic() + args.duration, args, results) for i in range(args.sessions)
+        ))
+        elapsed = time.perf_counter() - start
+        stats = (await client.get("/stats")).json()
+    return results, elapsed, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=64, help="동시에 대화하는 세션 수")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--inflight", default="1,8,64", help="쉼표로 구분한 MAX_INFLIGHT 목록")
+    parser.add_argument("--queue", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.2, help="가짜 모델 호출 한 번의 지연(초)")
+    parser.add_argument("--think", type=float, default=0.0, help="세션이 다음 메시지를 보내기 전 평균 생각 시간(초)")
+    parser.add_argument("--retry-ratio", type=float, default=0.05, help="같은 request_id로 한 번 더 보내는 비율")
+    parser.add_argument("--port", type=int, default=8731)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions, fake model {args.latency}s/call (2 calls per request), {args.duration}s per run")
+    with tempfile.TemporaryDirectory() as tmp:
+        for inflight in [int(value) for value in args.inflight.split(",")]:
+            server = start_server(args, inflight, tmp)
+            try:
+                results, elapsed, stats = asyncio.run(run(args, inflight))
+            finally:
+                server.terminate()
+                server.wait()
+            latencies = sorted(results["latencies"])
+            print(
+                f"MAX_INFLIGHT {inflight:>3}: {len(latencies) / elapsed:7.1f} req/s | "
+                f"p50 {percentile(latencies, 0.5) * 1e3:6.0f} ms, p95 {percentile(latencies, 0.95) * 1e3:6.0f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1e3:6.0f} ms | max waiting {stats['max_waiting']}, "
+                f"rejected {stats['rejected']}, errors {results['errors'] or 0} | "
+                f"retries {results['retries']} (deduplicated {stats['replays']}), balance mismatches {results['mismatches']}"
+            )
@@ -0,0 +1,60 @@
+# -------------------------------------
+# 로컬 가짜 모델 (GCP 없이 서버와 부하 테스트를 돌리기 위한 것)
+#   LLM_BACKEND=fake FAKE_LLM_LATENCY=0.2 python server.py
+# -------------------------------------
+# create_openai_functions_agent가 기대하는 대로 function_call을 담은 AIMessage를 돌려줍니다.
+#   "10000원 입금해줘" / "5천원 출금해줘" → update_user_money (금액은 intent_router.parse_amount로 읽습니다)
+#   "잔액 알려줘" / "얼마 있어?"           → get_user_info(money)
+#   "내역 보여줘"                           → get_transaction_history
+# 툴 결과(FunctionMessage)가 마지막 메시지이면 그 결과로 답합니다. 호출마다 latency 초(±25%)를 기다립니다.
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, FunctionMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from intent_router import INTENT_PATTERNS, parse_amount
+import asyncio
+import json
+import random
+import time
+
+
+def decide(messages):
+    last = messages[-1]
+    if isinstance(last, FunctionMessage):
+        return AIMessage(content=f"처리했어요. {last.content}")
+    text = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    amount = parse_amount(text)
+    if amount is not None and INTENT_PATTERNS["deposit"].search(text):
+        return _function_call("update_user_money", {"change": f"+{amount}"})
+    if amount is not None and INTENT_PATTERNS["withdraw"].search(text):
+        return _function_call("update_user_money", {"change": f"-{amount}"})
+    if "잔액" in text or "얼마" in text:
+        return _function_call("get_user_info", {"field": "money"})
+    if "내역" in text:
+        return _function_call("get_transaction_history", {})
+    return AIMessage(content="무엇을 도와드릴까요? 입금, 출금, 잔액, 내역을 말씀해 주세요.")
+
+
+def _function_call(name, arguments):
+    return AIMessage(content="", additional_kwargs={"function_call": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}})
+
+
+class FakeMoneyModel(BaseChatModel):
+    latency: float = 0.2
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-money"
+
+    def _delay(self):
+        return self.latency * random.uniform(0.75, 1.25)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=decide(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=decide(messages))])
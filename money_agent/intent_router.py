@@ -0,0 +1,188 @@
+# -------------------------------------
+# 요청 fast-path 파서 (Agent/모델 우회)
+# -------------------------------------
+# "잔액 알려줘", "만원 입금해줘", "5천원 출금해줘", "내 나이 몇 살이야" 처럼 뜻이 하나뿐인 요청을 툴 호출로 바로 바꿉니다.
+# 종류가 둘 이상 섞였거나(입금하고 잔액 알려줘), 부정/조건/과거형이거나, 금액이 없거나 여러 개면 None → Agent로 넘깁니다.
+# 입출금에 횟수/개수('두 번', '만원씩', '두 장')나 일정('내일', '매달')이 붙거나 금액에 부호('-5000원')가 있어도 Agent로 넘깁니다.
+# 입출금은 '해줘', '해주세요', '하기'처럼 시키는 말로 끝날 때만 바로 실행하고, 조회('입금 기록 보여줘')나
+# 지난 일('엄마가 만원 입금해줬어', '어제 만원 입금')로 읽힐 수 있으면 Agent로 넘깁니다.
+from collections import Counter
+from typing import NamedTuple
+import re
+import threading
+
+DIGITS = {"일": 1, "이": 2, "삼": 3, "사": 4, "오": 5, "육": 6, "칠": 7, "팔": 8, "구": 9}
+SMALL_UNITS = {"십": 10, "백": 100, "천": 1000}
+BIG_UNITS = {"만": 10 ** 4, "억": 10 ** 8, "조": 10 ** 12}
+
+# 숫자(1,000 / 1.5) 또는 한글 숫자와 단위의 묶음. 아라비아 숫자 바로 뒤에 한글 숫자가 오면('3일') 금액이 아닙니다
+_NUMBER = r"\d[\d,]*(?:\.\d+)?(?![\d일이삼사오육칠팔구])"
+_GROUP = rf"(?:(?:{_NUMBER}|[일이삼사오육칠팔구])?[십백천]|{_NUMBER}|[일이삼사오육칠팔구])+[만억조]?|[만억조]"
+AMOUNT_PATTERN = re.compile(rf"({_GROUP})((?:\s*(?:{_GROUP}))*)\s*(원)?")
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)?|[일이삼사오육칠팔구십백천만억조]")
+
+# 한 요청에 종류가 정확히 하나일 때만 fast-path를 사용합니다
+INTENT_PATTERNS = {
+    "deposit": re.compile(r"입금|넣어|넣을|저금|예금|충전"),
+    "withdraw": re.compile(r"출금|인출|빼|꺼내|찾아|지출"),
+    "money": re.compile(r"잔액|잔고|얼마\s*(있|남|야|예요|에요|인)|돈\s*(이|은)?\s*얼마"),
+    "name": re.compile(r"이름|성함"),
+    "age": re.compile(r"나이|몇\s*살"),
+    "transaction_history": re.compile(r"내역|거래\s*기록"),
+}
+# 바꾸라는 말, 부정('안 해'), 취소, 조건('~면'), 한도/기준 금액이 섞인 요청은 모델에게 맡깁니다
+UNSURE_PATTERN = re.compile(
+    r"않|(?:^|\s)안(?:\s|$)|말고|지\s*마|취소|못|바꿔|바꾸|변경|수정|만약"
+    r"|면(?=\s|$|[.,!?~])"  # 조건('출금되면 알려줘')
+    r"|한도|이상|이하|미만|초과|넘(?:으면|게|는)"  # 한도/기준 금액은 입출금할 금액이 아닙니다
+)
+# 입출금은 한 번 더 조심합니다: 질문, 제안, 과거형('입금했어')은 실행하라는 뜻이 아닐 수 있습니다
+UNSURE_CHANGE_PATTERN = re.compile(
+    r"\?|할까|해도|되나|될까|했|됐|었|았|였|줬|왔|봤|얼마|전부|모두|다\s*(빼|꺼내|찾)"
+    r"|기록|내역|조회|보여|확인|어제|그제|그저께|지난|아까|방금"
+)
+# 입출금을 바로 실행하려면 시키는 말로 끝나야 합니다 ('만원 입금'처럼 명사로 끝나면 기록인지 지시인지 모릅니다)
+COMMAND_PATTERN = re.compile(r"(?:해|해\s*줘|해\s*주세요|하기|할게|줘|주세요)\s*[.!~]*$")
+# 횟수/개수('만원씩 세 번', '만원짜리 두 장')는 금액을 곱해야 하고, 일정('내일', '매달')은 지금 실행할 일이 아닙니다
+COUNT_PATTERN = re.compile(r"씩|짜리|번|장|개|회|차례|(?:^|\s)(?:한|두|세|네|다섯|여섯|일곱|여덟|아홉|열)(?=\s|$)")
+# 부호가 붙은 금액('-5000원 입금')은 입금인지 출금인지 애매하므로 부호를 떼지 않고 Agent로 넘깁니다
+SIGNED_PATTERN = re.compile(r"[-+−－＋]\s*\d|마이너스|플러스")
+SCHEDULE_PATTERN = re.compile(
+    r"내일|모레|나중|이따|다음|매달|매월|매일|매주|마다|정기|자동|예약"
+    r"|뒤|후에|후(?=\s|$)|\d+\s*(?:일|주|달|개월|시간|분)|일주일|이틀|사흘|한\s*달"  # 상대 시간('3일 뒤에', '일주일 후에')
+)
+
+
+def parse_amount(text):
+    """'만원' → 10000, '5천원' → 5000, '3만 5천원' → 35000, '1,000원' → 1000, '백오십만원' → 1500000.
+
+    금액이 정확히 하나일 때만 돌려주고, 없거나 여러 개면 None. 한글로만 쓴 금액은 '원'으로 끝나야 합니다
+    ('이 돈'의 '이'를 2로 읽지 않도록).
+    """
+    amounts = []
+    for match in AMOUNT_PATTERN.finditer(text):
+        span = match.group(1) + match.group(2)
+        if not (match.group(3) or re.search(r"\d", span)):
+            continue
+        value = _korean_number(span)
+        if value is None:
+            return None
+        amounts.append(value)
+    return amounts[0] if len(amounts) == 1 else None
+
+
+def _korean_number(span):
+    total, section, number = 0, 0, None
+    for token in TOKEN_PATTERN.findall(span.replace(",", "").replace(" ", "")):
+        if token in SMALL_UNITS:
+            section += (1 if number is None else number) * SMALL_UNITS[token]
+            number = None
+        elif token in BIG_UNITS:
+            section += number or 0
+            total += (section or 1) * BIG_UNITS[token]
+            section, number = 0, None
+        else:
+            if number is not None:  # '5 3'처럼 숫자가 단위 없이 이어지면 금액이 아닙니다
+                return None
+            number = DIGITS[token] if token in DIGITS else float(token)
+    value = total + section + (number or 0)
+    return int(value) if value == int(value) and value > 0 else None
+
+
+class Intent(NamedTuple):
+    tool: str
+    args: dict
+
+
+class IntentRouter:
+    """뜻이 분명한 요청을 (툴 이름, 인자)로 바꿉니다. 애매하면 None."""
+
+    def route(self, text):
+        if UNSURE_PATTERN.search(text):
+            return None
+        kinds = [kind for kind, pattern in INTENT_PATTERNS.items() if pattern.search(text)]
+        if len(kinds) != 1:
+            return None
+        kind = kinds[0]
+        if kind in ("deposit", "withdraw"):
+            if not COMMAND_PATTERN.search(text.strip()):
+                return None
+            if UNSURE_CHANGE_PATTERN.search(text) or COUNT_PATTERN.search(text) or SCHEDULE_PATTERN.search(text):
+                return None
+            if SIGNED_PATTERN.search(text):
+                return None
+            amount = parse_amount(text)
+            if amount is None:
+                return None
+            return Intent("update_user_money", {"change": f"+{amount}" if kind == "deposit" else f"-{amount}"})
+        return Intent("get_user_info", {"field": kind})
+
+
+BALANCE_PATTERN = re.compile(r"현재 돈: (-?\d+)")
+
+
+def phrase(intent, output):
+    """툴 결과를 모델 없이 답으로 만듭니다."""
+    if output.startswith("오류"):
+        return f"처리하지 못했어요. {output}"
+    if intent.tool == "update_user_money":
+        change = int(intent.args["change"])
+        balance = BALANCE_PATTERN.search(output)
+        verb = "입금" if change > 0 else "출금"
+        if balance is None:
+            return f"{abs(change):,}원을 {verb}했어요. {output}"
+        return f"{abs(change):,}원을 {verb}했어요. 현재 잔액은 {int(balance.group(1)):,}원이에요."
+    field = intent.args["field"]
+    if field == "money":
+        return f"현재 잔액은 {int(output):,}원이에요."
+    if field == "name":
+        return f"이름은 {output}이에요."
+    if field == "age":
+        return f"나이는 {output}살이에요."
+    return f"최근 입출금 내역이에요. {output}"
+
+
+class RouterStats:
+    """fast-path 적중률과 절약한 시간(Agent 경로 평균 - fast-path 평균)을 집계합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast_count = 0
+        self.fast_seconds = 0.0
+        self.agent_count = 0
+        self.agent_seconds = 0.0
+        self.by_tool = Counter()
+
+    def reset(self):
+        with self._lock:
+            self.fast_count = self.agent_count = 0
+            self.fast_seconds = self.agent_seconds = 0.0
+            self.by_tool.clear()
+
+    def record_fast(self, intent, seconds):
+        with self._lock:
+            self.fast_count += 1
+            self.fast_seconds += seconds
+            self.by_tool[intent.args.get("field", intent.tool)] += 1
+
+    def record_agent(self, seconds):
+        with self._lock:
+            self.agent_count += 1
+            self.agent_seconds += seconds
+
+    def summary(self):
+        with self._lock:
+            total = self.fast_count + self.agent_count
+            fast_mean = self.fast_seconds / self.fast_count if self.fast_count else 0.0
+            agent_mean = self.agent_seconds / self.agent_count if self.agent_count else 0.0
+            saved_per_hit = max(agent_mean - fast_mean, 0.0) if self.agent_count else 0.0
+            return {
+                "hits": self.fast_count,
+                "fallbacks": self.agent_count,
+                "hit_rate": self.fast_count / total if total else 0.0,
+                "by_tool": dict(self.by_tool),
+                "fast_mean": fast_mean,
+                "agent_mean": agent_mean,
+                "saved_seconds": saved_per_hit * self.fast_count,
+            }
+
@@ -0,0 +1,298 @@
+# -------------------------------------
+# 입출금 원장 (SQLite, 여러 사용자)
+# -------------------------------------
+# users        : 사용자 정보와 현재 잔액(balance), 거래 수(tx_count). 잔액은 거래를 기록할 때 같은 트랜잭션 안에서 갱신합니다.
+# transactions : 추가만 가능한 거래 내역. 행마다 그 거래 직후의 잔액(running balance)을 함께 저장합니다.
+#                (user_id, ts) 색인 하나로 최근 내역, 페이지 넘기기, 기간 조회, 특정 시점의 잔액을 모두 처리합니다.
+# ts는 마이크로초 정수이고 사용자마다 엄격하게 증가합니다(같은 마이크로초에 두 번 기록하면 1씩 밀립니다).
+# 그래서 (user_id, ts)가 거래 하나를 가리키고, 거래 id를 페이지 커서로 쓸 수 있습니다.
+# idempotency_keys : 쓰기 요청의 키 → 그때의 결과. 같은 키로 다시 오면(재시도, 다시 보낸 툴 호출) 반영하지 않고 그 결과를 돌려줍니다.
+from datetime import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS users ("
+    " user_id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, age INTEGER,"
+    " balance INTEGER NOT NULL DEFAULT 0, tx_count INTEGER NOT NULL DEFAULT 0,"
+    " last_ts INTEGER NOT NULL DEFAULT 0, created_at REAL)",
+    "CREATE TABLE IF NOT EXISTS transactions ("
+    " id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(user_id),"
+    " ts INTEGER NOT NULL, change INTEGER NOT NULL, balance INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS transactions_user_ts ON transactions (user_id, ts)",
+    "CREATE TRIGGER IF NOT EXISTS transactions_no_update BEFORE UPDATE ON transactions "
+    "BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_no_delete BEFORE DELETE ON transactions "
+    "BEGIN SELECT RAISE(ABORT, 'transactions are append-only'); END",
+    "CREATE TABLE IF NOT EXISTS idempotency_keys (key TEXT PRIMARY KEY, request TEXT NOT NULL, result TEXT NOT NULL, created_at REAL)",
+    "CREATE INDEX IF NOT EXISTS idempotency_keys_created ON idempotency_keys (created_at)",
+]
+
+
+class InsufficientFunds(ValueError):
+    pass
+
+
+class IdempotencyConflict(ValueError):
+    """이미 쓴 키로 다른 내용의 요청이 왔을 때"""
+
+
+def to_micros(value):
+    """datetime, ISO 문자열('2025-01-31', '2025-01-31T12:00:00'), 유닉스 초 → 마이크로초 정수"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    return int(value * 1_000_000)
+
+
+def format_ts(micros):
+    return datetime.fromtimestamp(micros / 1_000_000).isoformat(timespec="seconds")
+
+
+def _transaction(row):
+    return {"id": row[0], "timestamp": format_ts(row[1]), "change": row[2], "balance": row[3]}
+
+
+class Ledger:
+    """사용자별 잔액과 추가만 가능한 거래 내역. 스레드 여러 개가 함께 써도 됩니다.
+
+    쓰기(record, record_batch, transfer)는 잔액 갱신과 거래 추가를 BEGIN IMMEDIATE 트랜잭션 하나로 처리하므로,
+    다른 스레드나 프로세스가 같은 파일을 써도 잔액과 내역이 어긋나지 않고, 중간에 실패하면 아무것도 반영되지 않습니다.
+    key를 주면 같은 키의 두 번째 요청부터는 반영하지 않고 처음 결과를 그대로 돌려줍니다. 키는 key_ttl 초 동안 기억합니다.
+    조회는 모두 색인을 타므로 내역이 수백만 건이어도 걸리는 시간이 거의 같습니다.
+    잔액보다 큰 출금은 예전 user_db처럼 받아 주고(잔액이 음수가 됨), allow_overdraft=False일 때만 InsufficientFunds로 거절합니다.
+    """
+
+    def __init__(self, path="ledger.db", allow_overdraft=True, key_ttl=24 * 3600.0, sweep_interval=60.0):
+        self.path = path
+        self.allow_overdraft = allow_overdraft
+        self.key_ttl = key_ttl
+        self.sweep_interval = sweep_interval
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self.replays = 0
+        self.expired_keys = 0
+
+    def _conn(self):
+        # 처음 쓸 때 파일을 만들고, fork된 프로세스는 자기 연결을 새로 엽니다
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._pid = os.getpid()
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- 사용자 ----------
+
+    def create_user(self, name, age=None, balance=0):
+        """새 사용자를 만들고 user_id를 돌려줍니다. 처음 잔액이 있으면 첫 거래로 남깁니다."""
+        def apply(db):
+            user_id = db.execute(
+                "INSERT INTO users (name, age, created_at) VALUES (?, ?, ?)", (name, age, time.time())
+            ).lastrowid
+            if balance:
+                self._append(db, user_id, balance)
+            return user_id
+        return self._write(apply)
+
+    def find_user(self, name):
+        with self._lock:
+            row = self._conn().execute("SELECT user_id FROM users WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def ensure_user(self, name, age=None, balance=0):
+        """이름으로 찾고, 없으면 만듭니다. 여러 프로세스가 동시에 불러도 사용자는 하나만 생깁니다."""
+        user_id = self.find_user(name)
+        if user_id is not None:
+            return user_id
+        try:
+            return self.create_user(name, age, balance)
+        except sqlite3.IntegrityError:
+            return self.find_user(name)
+
+    def user(self, user_id):
+        """{"user_id", "name", "age", "money", "transactions"} 또는 None"""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT user_id, name, age, balance, tx_count FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"user_id": row[0], "name": row[1], "age": row[2], "money": row[3], "transactions": row[4]}
+
+    def balance(self, user_id):
+        with self._lock:
+            row = self._conn().execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            raise KeyError(user_id)
+        return row[0]
+
+    # ---------- 기록 ----------
+
+    def _append(self, db, user_id, change):
+        # 트랜잭션 안에서만 부릅니다. 잔액과 ts를 먼저 올리고, 그 값으로 거래 행을 남깁니다
+        row = db.execute(
+            "UPDATE users SET balance = balance + ?, tx_count = tx_count + 1, last_ts = max(last_ts + 1, ?) "
+            "WHERE user_id = ? RETURNING balance, last_ts",
+            (change, to_micros(time.time()), user_id),
+        ).fetchone()
+        if row is None:
+            raise KeyError(user_id)
+        balance, ts = row
+        if balance < 0 and change < 0 and not self.allow_overdraft:
+            raise InsufficientFunds(f"잔액 부족 (잔액 {balance - change}, 요청 {change})")
+        transaction_id = db.execute(
+            "INSERT INTO transactions (user_id, ts, change, balance) VALUES (?, ?, ?, ?)",
+            (user_id, ts, change, balance),
+        ).lastrowid
+        return {"id": transaction_id, "timestamp": format_ts(ts), "change": change, "balance": balance}
+
+    def _replayed(self, db, key, request):
+        row = db.execute("SELECT request, result FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[0] != request:
+            raise IdempotencyConflict(f"키 {key!r}는 다른 요청에 이미 쓰였습니다")
+        self.replays += 1
+        return json.loads(row[1])
+
+    def _sweep_keys(self, db):
+        now = time.monotonic()
+        if now - self._swept_at < self.sweep_interval:
+            return
+        self._swept_at = now
+        cursor = db.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (time.time() - self.key_ttl,))
+        self.expired_keys += cursor.rowcount
+
+    def _write(self, apply, key=None, request=None):
+        """apply(db)를 트랜잭션 하나로 실행하고 결과를 돌려줍니다. 예외가 나면 모두 되돌립니다."""
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = None
+                if key is not None:
+                    self._sweep_keys(db)
+                    result = self._replayed(db, key, request)
+                if result is None:
+                    result = apply(db)
+                    if key is not None:
+                        db.execute(
+                            "INSERT INTO idempotency_keys (key, request, result, created_at) VALUES (?, ?, ?, ?)",
+                            (key, request, json.dumps(result, ensure_ascii=False), time.time()),
+                        )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return result
+
+    def record(self, user_id, change, key=None):
+        """입금(+)/출금(-) 하나를 기록하고 그 거래를 돌려줍니다. allow_overdraft=False에서 잔액이 모자라면 아무것도 바꾸지 않고 InsufficientFunds."""
+        change = int(change)
+        return self._write(lambda db: self._append(db, user_id, change), key, json.dumps(["record", user_id, change]))
+
+    def record_batch(self, changes, key=None):
+        """[(user_id, change), ...]를 순서대로 모두 반영하거나, 하나라도 실패하면 하나도 반영하지 않습니다. 거래 목록을 돌려줍니다."""
+        changes = [(user_id, int(change)) for user_id, change in changes]
+        return self._write(
+            lambda db: [self._append(db, user_id, change) for user_id, change in changes],
+            key, json.dumps(["batch", changes]),
+        )
+
+    def transfer(self, from_user, to_user, amount, key=None):
+        """from_user에서 to_user로 amount만큼 옮깁니다 (출금과 입금을 한 트랜잭션으로)."""
+        amount = int(amount)
+        if amount <= 0 or from_user == to_user:
+            raise ValueError("이체 금액은 양수이고 보내는 사람과 받는 사람이 달라야 합니다")
+        return self.record_batch([(from_user, -amount), (to_user, amount)], key)
+
+    # ---------- 조회 ----------
+
+    def history(self, user_id, limit=20, before=None, start=None, end=None):
+        """최신순 한 페이지. {"items": [...], "next": 다음 페이지의 before 또는 None}
+
+        before : 이전 페이지의 next (그 거래보다 오래된 것부터)
+        start  : 이 시각 이후(포함), end: 이 시각 이전(미포함). datetime, ISO 문자열, 유닉스 초
+        """
+        clauses, params = ["user_id = ?"], [user_id]
+        start, end = to_micros(start), to_micros(end)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        with self._lock:
+            db = self._conn()
+            if before is not None:
+                # 커서는 거래 id입니다. ts가 사용자마다 유일하므로 그 ts보다 앞선 것만 보면 됩니다
+                row = db.execute("SELECT ts FROM transactions WHERE id = ? AND user_id = ?", (before, user_id)).fetchone()
+                if row is None:
+                    raise KeyError(before)
+                clauses.append("ts < ?")
+                params.append(row[0])
+            rows = db.execute(
+                f"SELECT id, ts, change, balance FROM transactions WHERE {' AND '.join(clauses)} ORDER BY ts DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        items = [_transaction(row) for row in rows[:limit]]
+        return {"items": items, "next": items[-1]["id"] if len(rows) > limit else None}
+
+    def balance_at(self, user_id, when):
+        """그 시각의 잔액 (거래 행에 저장된 running balance로 한 번에 찾습니다)."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT balance FROM transactions WHERE user_id = ? AND ts <= ? ORDER BY ts DESC LIMIT 1",
+                (user_id, to_micros(when)),
+            ).fetchone()
+        return row[0] if row is not None else 0
+
+    def totals(self, user_id, start=None, end=None):
+        """기간 안의 거래 수, 입금 합계, 출금 합계(음수)"""
+        start, end = to_micros(start), to_micros(end)
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT count(*), coalesce(sum(max(change, 0)), 0), coalesce(sum(min(change, 0)), 0) "
+                "FROM transactions WHERE user_id = ? AND ts >= ? AND ts < ?",
+                (user_id, start if start is not None else 0, end if end is not None else 2 ** 62),
+            ).fetchone()
+        return {"count": row[0], "deposits": row[1], "withdrawals": row[2]}
+
+    def verify(self, user_id):
+        """잔액 == 거래 합계 == 마지막 거래의 running balance 인지 (전체 내역을 읽으므로 점검용)"""
+        with self._lock:
+            db = self._conn()
+            balance, tx_count = db.execute("SELECT balance, tx_count FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            count, total = db.execute(
+                "SELECT count(*), coalesce(sum(change), 0) FROM transactions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            last = db.execute(
+                "SELECT balance FROM transactions WHERE user_id = ? ORDER BY ts DESC LIMIT 1", (user_id,)
+            ).fetchone()
+        return balance == total == (last[0] if last else 0) and tx_count == count
+
+    def total_balance(self):
+        """모든 사용자의 잔액 합계"""
+        with self._lock:
+            return self._conn().execute("SELECT coalesce(sum(balance), 0) FROM users").fetchone()[0]
+
+    def stats(self):
+        return {"replays": self.replays, "expired_keys": self.expired_keys}
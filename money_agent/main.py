@@ -1,30 +1,85 @@
 # -------------------------------------
 # ✅ 1. 라이브러리 임포트
 # -------------------------------------
-from langchain.agents import tool, AgentExecutor, create_openai_functions_agent
-from langchain_google_vertexai import ChatVertexAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langgraph.graph import StateGraph, END
-from google.cloud import aiplatform
+# langchain.agents, langchain_google_vertexai, google.cloud.aiplatform, langgraph는 임포트에만 수 초가 걸리므로
+# 모듈 임포트 시점이 아니라 처음 Agent가 필요할 때(또는 입력을 기다리는 동안 워밍업 스레드에서) 가져옵니다
+from langchain_core.tools import tool
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import TypedDict
+from intent_router import IntentRouter, RouterStats, phrase
+from ledger import Ledger
+import asyncio
 import os
-from datetime import datetime
+import threading
+import time
+import uuid
+
+# LAZY_INIT=0 이면 예전처럼 임포트 중에 GCP 설정과 Agent 생성까지 마칩니다
+LAZY_INIT = os.environ.get("LAZY_INIT", "1") == "1"
+# WARMUP=1 이면 첫 입력을 기다리는 동안 백그라운드에서 Agent를 미리 만듭니다
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+# LLM_BACKEND=fake 이면 GCP 없이 로컬 가짜 모델(fake_llm.py)을 씁니다 (서버 부하 테스트용)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "vertex")
+# AGENT_VERBOSE=0 이면 AgentExecutor의 단계별 출력을 끕니다 (서버에서는 요청마다 출력이 쌓입니다)
+AGENT_VERBOSE = os.environ.get("AGENT_VERBOSE", "1") == "1"
+# INTENT_ROUTER=1 이면 "잔액 알려줘", "만원 입금해줘" 같은 분명한 요청은 Agent(모델 호출 2번) 없이 툴을 바로 부릅니다
+INTENT_ROUTER = os.environ.get("INTENT_ROUTER", "1") == "1"
 
 # -------------------------------------
-# ✅ 2. GCP 인증 및 환경 설정
+# ✅ 2. GCP 인증 및 환경 설정 (처음 Agent를 만들 때 한 번)
 # -------------------------------------
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../application_credentials.json"
-aiplatform.init(project=os.environ["PROJECT_NAME"], location=os.environ["LOCATION"])
+def init_vertex():
+    from google.cloud import aiplatform
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "../application_credentials.json"
+    aiplatform.init(project=os.environ["PROJECT_NAME"], location=os.environ["LOCATION"])
 
 # -------------------------------------
-# ✅ 3. 사용자 DB 및 입출금 내역 초기화
+# ✅ 3. 사용자 원장 (SQLite, 여러 사용자)
 # -------------------------------------
-user_db = {
-    "name": "홍길동",
-    "age": 30,
-    "money": 50000,
-    "transaction_history": []
-}
+# LEDGER_DB   원장 파일 (기본 ledger.db)
+# MONEY_USER  채팅 루프의 사용자 이름. 처음 보는 사용자는 예전 user_db와 같은 나이/잔액으로 시작합니다
+# LEDGER_ALLOW_OVERDRAFT=1  잔액보다 큰 출금도 받음 (예전 user_db와 같음). 0이면 잔액 부족으로 거절합니다
+LEDGER_DB = os.environ.get("LEDGER_DB", "ledger.db")
+MONEY_USER = os.environ.get("MONEY_USER", "홍길동")
+DEFAULT_AGE = 30
+DEFAULT_MONEY = 50000
+HISTORY_PAGE = 20
+
+ledger = Ledger(LEDGER_DB, allow_overdraft=os.environ.get("LEDGER_ALLOW_OVERDRAFT", "1") == "1")  # 파일은 처음 조회/기록할 때 엽니다
+# 툴이 다룰 사용자. 설정하지 않으면 MONEY_USER
+current_user = ContextVar("current_user", default=None)
+
+def active_user_id():
+    user_id = current_user.get()
+    if user_id is None:
+        user_id = ledger.ensure_user(MONEY_USER, age=DEFAULT_AGE, balance=DEFAULT_MONEY)
+    return user_id
+
+# 지금 처리 중인 사용자 요청(그래프 실행 한 번). 같은 request_id로 다시 실행하면(타임아웃 후 재시도 등)
+# 처음 실행 때 반영된 입출금은 원장의 idempotency key로 걸러져 다시 반영되지 않습니다.
+current_request = ContextVar("current_request", default=None)
+
+@contextmanager
+def money_request(request_id, user_id=None):
+    """툴이 이 요청의 id와 사용자(주지 않으면 MONEY_USER)로 동작하게 합니다. 서버에서는 세션마다 사용자가 다릅니다."""
+    previous_request, previous_user = current_request.get(), current_user.get()
+    current_request.set({"id": request_id, "seen": Counter()} if request_id else None)
+    current_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_request.set(previous_request)
+        current_user.set(previous_user)
+
+def idempotency_key(user_id, changes):
+    """요청 id + 사용자 + 변경 내용 + 이 요청 안에서 몇 번째인지. 한 요청에서 같은 입금을 두 번 하면 두 번 모두 반영됩니다."""
+    request = current_request.get()
+    if request is None:
+        return None
+    request["seen"][(user_id, changes)] += 1
+    return f"{request['id']}:{user_id}:{changes}:{request['seen'][(user_id, changes)]}"
 
 
 # -------------------------------------
@@ -33,46 +88,82 @@ user_db = {
 
 @tool
 def get_user_info(field: str) -> str:
-    """사용자의 정보를 반환합니다. 예: name, age, money, transaction_history"""
-    return str(user_db.get(field, "해당 정보 없음"))
+    """사용자의 정보를 반환합니다. 예: name, age, money, transaction_history (최근 내역만, 더 보려면 get_transaction_history)"""
+    user_id = active_user_id()
+    if field == "transaction_history":
+        page = ledger.history(user_id, limit=HISTORY_PAGE)
+        return str(page["items"])
+    info = ledger.user(user_id)
+    return str(info.get(field, "해당 정보 없음"))
 
 @tool
-def update_user_money(change: str) -> str:
-    """사용자의 돈을 입금(+)/출금(-)하고 기록합니다. 예: '+10000' 또는 '-5000'"""
+def get_transaction_history(start: str = "", end: str = "", before: int = 0, limit: int = HISTORY_PAGE) -> str:
+    """입출금 내역을 최신순으로 반환합니다.
+    start/end: 기간 (ISO 날짜, 예: '2025-01-01', end는 포함하지 않음), before: 이전 결과의 '다음 페이지' 값, limit: 최대 건수"""
     try:
-        amount = int(change)
-        user_db["money"] += amount
-
-        # 입출금 내역에 추가
-        user_db["transaction_history"].append({
-            "timestamp": datetime.now().isoformat(timespec="seconds"),
-            "change": amount,
-            "balance": user_db["money"]
-        })
+        page = ledger.history(
+            active_user_id(), limit=max(1, min(limit, 100)), before=before or None, start=start or None, end=end or None,
+        )
+    except Exception as e:
+        return f"오류 발생: {e}"
+    result = str(page["items"])
+    if page["next"] is not None:
+        result += f"\n다음 페이지: before={page['next']}"
+    return result
 
-        return f"변경 완료. 현재 돈: {user_db['money']}"
+@tool
+def update_user_money(change: str) -> str:
+    """사용자의 돈을 입금(+)/출금(-)하고 기록합니다. 예: '+10000' 또는 '-5000'
+    여러 건은 쉼표로 구분합니다. 예: '+10000, -3000' (모두 반영되거나 하나도 반영되지 않음)"""
+    try:
+        changes = [int(part) for part in change.split(",")]
+        user_id = active_user_id()
+        key = idempotency_key(user_id, ",".join(str(amount) for amount in changes))
+        if len(changes) == 1:
+            transaction = ledger.record(user_id, changes[0], key=key)
+        else:
+            transaction = ledger.record_batch([(user_id, amount) for amount in changes], key=key)[-1]
+        return f"변경 완료. 현재 돈: {transaction['balance']}"
     except Exception as e:
         return f"오류 발생: {e}"
 
 
+tools = [get_user_info, get_transaction_history, update_user_money]
+tools_by_name = {t.name: t for t in tools}
+
 # -------------------------------------
-# ✅ 5. LLM & Agent 설정
+# ✅ 5. LLM & Agent 설정 (처음 사용할 때 생성)
 # -------------------------------------
-llm = ChatVertexAI(
-    model_name="gemini-2.0-flash-001",
-    temperature=0.7
-)
+agent_executor = None
+
+def create_llm():
+    if LLM_BACKEND == "fake":
+        from fake_llm import FakeMoneyModel
+        return FakeMoneyModel(latency=float(os.environ.get("FAKE_LLM_LATENCY", "0.2")))
 
-tools = [get_user_info, update_user_money]
+    from langchain_google_vertexai import ChatVertexAI
 
-prompt = ChatPromptTemplate.from_messages([
-    ("system", "너는 사용자 정보와 입출금 내역을 관리하는 한국어 도우미야."),
-    ("human", "{input}"),
-    MessagesPlaceholder(variable_name="agent_scratchpad")
-])
+    init_vertex()
+    return ChatVertexAI(
+        model_name="gemini-2.0-flash-001",
+        temperature=0.7
+    )
 
-agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+def build_agent_executor():
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    llm = create_llm()
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "너는 사용자 정보와 입출금 내역을 관리하는 한국어 도우미야."),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+
+    agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=AGENT_VERBOSE)
 
 # -------------------------------------
 # ✅ 6. LangGraph 정의
@@ -80,27 +171,124 @@ agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
 class GraphState(TypedDict):
     user_input: str
     response: str
+    request_id: str  # 같은 요청을 다시 보낼 때 같은 값을 쓰면 입출금이 두 번 반영되지 않습니다
+    user_id: int  # 서버 세션의 사용자 (없으면 MONEY_USER)
+    chat_history: list  # 서버 세션의 이전 대화 (HumanMessage/AIMessage)
+    route: str  # router가 처리했으면 툴 이름, Agent로 넘겼으면 "agent"
 
-def agent_node(state: GraphState) -> GraphState:
-    result = agent_executor.invoke({"input": state["user_input"]})
+intent_router = IntentRouter()
+router_stats = RouterStats()
+
+def route_request(state):
+    return intent_router.route(state["user_input"]) if INTENT_ROUTER else None
+
+def run_intent(state, intent, start):
+    with money_request(state.get("request_id"), state.get("user_id")):
+        output = tools_by_name[intent.tool].invoke(intent.args)
+    router_stats.record_fast(intent, time.perf_counter() - start)
+    return {
+        "user_input": state["user_input"],
+        "response": f"[Agent 응답] {phrase(intent, output)}",
+        "route": intent.tool,
+    }
+
+def router_node(state: GraphState) -> GraphState:
+    """분명한 요청은 툴을 바로 부르고 답까지 만듭니다. 아니면 route="agent"로 Agent에 넘깁니다."""
+    start = time.perf_counter()
+    intent = route_request(state)
+    if intent is None:
+        return {"route": "agent"}
+    return run_intent(state, intent, start)
+
+async def arouter_node(state: GraphState) -> GraphState:
+    # 분류는 이벤트 루프에서 하고, 툴 호출은 스레드에서 합니다. 원장 쓰기는 잠금과 SQLite busy 대기(다른 프로세스의 쓰기)로
+    # 오래 걸릴 수 있어 루프에서 부르면 모든 세션이 멈춥니다
+    start = time.perf_counter()
+    intent = route_request(state)
+    if intent is None:
+        return {"route": "agent"}
+    return await asyncio.to_thread(run_intent, state, intent, start)
+
+def next_node(state):
+    return "agent" if state["route"] == "agent" else "done"
+
+def agent_inputs(state):
+    return {"input": state["user_input"], "chat_history": state.get("chat_history") or []}
+
+def agent_outputs(state, result):
     return {
         "user_input": state["user_input"],
         "response": f"[Agent 응답] {result['output']}"
     }
 
-builder = StateGraph(GraphState)
-builder.add_node("agent", agent_node)
-builder.set_entry_point("agent")
-builder.add_edge("agent", END)
-graph = builder.compile()
+def agent_node(state: GraphState) -> GraphState:
+    start = time.perf_counter()
+    with money_request(state.get("request_id"), state.get("user_id")):
+        result = agent_executor.invoke(agent_inputs(state))
+    router_stats.record_agent(time.perf_counter() - start)
+    return agent_outputs(state, result)
+
+async def aagent_node(state: GraphState) -> GraphState:
+    # graph.ainvoke 용: 모델 호출을 기다리는 동안 이벤트 루프가 다른 세션의 요청을 처리합니다
+    start = time.perf_counter()
+    with money_request(state.get("request_id"), state.get("user_id")):
+        result = await agent_executor.ainvoke(agent_inputs(state))
+    router_stats.record_agent(time.perf_counter() - start)
+    return agent_outputs(state, result)
+
+def build_graph():
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, END
+
+    builder = StateGraph(GraphState)
+    builder.add_node("router", RunnableLambda(router_node, afunc=arouter_node))
+    builder.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node))
+    builder.set_entry_point("router")
+    builder.add_conditional_edges("router", next_node, {"agent": "agent", "done": END})
+    builder.add_edge("agent", END)
+    return builder.compile()
+
+graph = None
+_init_lock = threading.Lock()
+startup_stats = {"init_seconds": None, "warmup_error": None}
+
+def get_graph():
+    """처음 호출될 때 GCP 설정, 모델, Agent, LangGraph를 만들고 이후에는 같은 그래프를 돌려줍니다."""
+    global agent_executor, graph
+    if graph is None:
+        with _init_lock:
+            if graph is None:
+                start = time.perf_counter()
+                agent_executor = build_agent_executor()
+                graph = build_graph()
+                startup_stats["init_seconds"] = time.perf_counter() - start
+    return graph
+
+def warm_up():
+    try:
+        get_graph()
+    except Exception as e:
+        # 실패해도 채팅 루프는 뜹니다. 첫 입력 때 get_graph()가 다시 시도하고 그때 오류가 드러납니다
+        startup_stats["warmup_error"] = repr(e)
+
+def start_warmup():
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+if not LAZY_INIT:
+    get_graph()
 
 # -------------------------------------
 # ✅ 7. 채팅 루프
 # -------------------------------------
-while True:
-    user_input = input("👤 입력 (종료하려면 'exit'): ")
-    if user_input.lower() in ["exit", "quit"]:
-        break
+if __name__ == "__main__":
+    if WARMUP:
+        start_warmup()
+    while True:
+        user_input = input("👤 입력 (종료하려면 'exit'): ")
+        if user_input.lower() in ["exit", "quit"]:
+            break
 
-    result = graph.invoke({"user_input": user_input})
-    print(result["response"])
+        result = get_graph().invoke({"user_input": user_input, "request_id": uuid.uuid4().hex})
+        print(result["response"])
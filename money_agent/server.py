@@ -0,0 +1,230 @@
+# -------------------------------------
+# money_agent HTTP 서버 (여러 채팅 세션을 한 프로세스에서 동시에)
+#   python server.py --port 8000
+#   LLM_BACKEND=fake AGENT_VERBOSE=0 python server.py      (GCP 없이 가짜 모델로)
+# -------------------------------------
+# POST /sessions                      {"user": "홍길동"} → {"session_id", "user_id"}  (처음 보는 사용자는 새로 만듭니다)
+# POST /sessions/{session_id}/messages {"text": "...", "request_id": "..."} → {"response", ...}
+#      request_id(또는 Idempotency-Key 헤더)를 같은 값으로 다시 보내면 입출금은 다시 반영되지 않습니다.
+# GET  /sessions/{session_id}          사용자 정보와 최근 대화
+# GET  /health, /ready, /stats
+# 요청마다 graph.ainvoke로 돌리므로 모델 응답을 기다리는 동안 다른 세션의 요청이 진행됩니다.
+#   MAX_INFLIGHT=32    동시에 도는 그래프 실행 수. 나머지는 도착 순서대로 대기합니다
+#   MAX_QUEUE=256      대기할 수 있는 요청 수. 넘치면 503 + Retry-After
+#   SESSION_QUEUE=4    한 세션에서 앞 요청이 끝나기를 기다릴 수 있는 요청 수. 넘치면 429
+#   HISTORY_TURNS=10   세션마다 모델에 함께 보내는 이전 대화 수
+#   SESSION_TTL=1800   이 시간(초) 동안 쓰지 않은 세션은 지웁니다
+from collections import deque
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+import uvicorn
+
+import main
+
+MAX_INFLIGHT = int(os.environ.get("MAX_INFLIGHT", "32"))
+MAX_QUEUE = int(os.environ.get("MAX_QUEUE", "256"))
+SESSION_QUEUE = int(os.environ.get("SESSION_QUEUE", "4"))
+HISTORY_TURNS = int(os.environ.get("HISTORY_TURNS", "10"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "1800"))
+
+
+class Overloaded(RuntimeError):
+    pass
+
+
+class RequestGate:
+    """동시에 도는 그래프 실행을 max_inflight개로 묶고, 나머지는 max_queue개까지 도착 순서대로 기다리게 합니다."""
+
+    def __init__(self, max_inflight, max_queue):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self.inflight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=2048)
+        self.waits = deque(maxlen=2048)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.waiting} requests already waiting")
+        start = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.waits.append(time.perf_counter() - start)
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+            self.served += 1
+            self.latencies.append(time.perf_counter() - start)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+        return {
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "served": self.served,
+            "rejected": self.rejected,
+            "wait_mean": sum(self.waits) / len(self.waits) if self.waits else 0.0,
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+        }
+
+
+gate = RequestGate(MAX_INFLIGHT, MAX_QUEUE)
+sessions = {}  # session_id → {"user_id", "history", "lock", "pending", "touched"}
+_swept_at = time.monotonic()
+
+
+def sweep_sessions():
+    global _swept_at
+    now = time.monotonic()
+    if now - _swept_at < 60:
+        return
+    _swept_at = now
+    for session_id in [key for key, session in sessions.items() if now - session["touched"] > SESSION_TTL and not session["pending"]]:
+        del sessions[session_id]
+
+
+def session_or_404(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"unknown session {session_id}")
+    session["touched"] = time.monotonic()
+    return session
+
+
+class NewSession(BaseModel):
+    user: str = main.MONEY_USER
+
+
+class Message(BaseModel):
+    text: str
+    request_id: str | None = None
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 요청을 받기 시작하는 동안 Agent와 그래프를 백그라운드 스레드에서 만듭니다 (WARMUP=1)
+    if main.WARMUP:
+        main.start_warmup()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request, error):
+    return JSONResponse(status_code=503, content={"detail": str(error)}, headers={"Retry-After": "1"})
+
+
+@app.post("/sessions")
+async def new_session(body: NewSession):
+    # 원장 조회/생성(블로킹)만 스레드에서 하고, sessions는 이벤트 루프에서만 건드립니다 (sweep 중 크기 변경 방지)
+    user_id = await asyncio.to_thread(main.ledger.ensure_user, body.user, age=main.DEFAULT_AGE, balance=main.DEFAULT_MONEY)
+    session_id = uuid.uuid4().hex
+    sessions[session_id] = {
+        "user_id": user_id,
+        "history": deque(maxlen=2 * HISTORY_TURNS),
+        "lock": asyncio.Lock(),
+        "pending": 0,
+        "touched": time.monotonic(),
+    }
+    sweep_sessions()
+    return {"session_id": session_id, "user_id": user_id}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = session_or_404(session_id)
+    return {
+        "session_id": session_id,
+        "user": await asyncio.to_thread(main.ledger.user, session["user_id"]),
+        "history": [{"role": message.type, "content": message.content} for message in session["history"]],
+    }
+
+
+@app.post("/sessions/{session_id}/messages")
+async def send_message(session_id: str, body: Message, idempotency_key: str | None = Header(default=None)):
+    session = session_or_404(session_id)
+    if session["pending"] >= SESSION_QUEUE:
+        raise HTTPException(status_code=429, detail="too many requests for this session")
+    request_id = body.request_id or idempotency_key or uuid.uuid4().hex
+    graph = main.graph or await asyncio.to_thread(main.get_graph)
+    session["pending"] += 1
+    try:
+        # 한 세션의 메시지는 순서대로 (이전 대화가 다음 요청의 입력이므로), 세션끼리는 gate 안에서 동시에
+        async with session["lock"]:
+            start = time.perf_counter()
+            async with gate.slot():
+                queued = time.perf_counter() - start
+                result = await graph.ainvoke({
+                    "user_input": body.text,
+                    "request_id": request_id,
+                    "user_id": session["user_id"],
+                    "chat_history": list(session["history"]),
+                })
+            session["history"].extend([HumanMessage(content=body.text), AIMessage(content=result["response"])])
+    finally:
+        session["pending"] -= 1
+        session["touched"] = time.monotonic()
+    return {
+        "session_id": session_id,
+        "request_id": request_id,
+        "response": result["response"],
+        "queued_ms": queued * 1e3,
+        "latency_ms": (time.perf_counter() - start) * 1e3,
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"pid": os.getpid(), "sessions": len(sessions)}
+
+
+@app.get("/ready")
+async def ready():
+    """Agent와 그래프가 준비됐으면 200, 아직이면 503"""
+    if main.graph is None:
+        raise HTTPException(status_code=503, detail=main.startup_stats.get("warmup_error") or "warming up")
+    return main.startup_stats
+
+
+@app.get("/stats")
+async def stats():
+    return {"sessions": len(sessions), **gate.stats(), **main.ledger.stats(), "router": main.router_stats.summary()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    # 세션과 대기열이 프로세스 메모리에 있으므로 워커는 하나입니다 (원장은 여러 프로세스가 함께 써도 됩니다)
+    uvicorn.run(app, host=args.host, port=args.port)